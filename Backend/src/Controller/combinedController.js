@@ -0,0 +1,66 @@
+import aiWorkerPool from '../services/aiWorkerPool.js';
+import uploadedDocument from '../services/uploadedDocument.js';
+import { formatAnalysisForFrontend } from './uploadController.js';
+import { formatHumanizedForFrontend } from './humanizeController.js';
+
+export const formatCombinedForFrontend = (result) => ({
+  data: formatAnalysisForFrontend(result.analysis),
+  ...formatHumanizedForFrontend(result.humanized || {})
+});
+
+// Risk analysis and plain-English version of one upload in a single pass:
+// the worker chunks the text once and asks for both in each request
+const analyzeAndHumanize = async (req, res) => {
+  try {
+    const file = uploadedDocument(req, ['text', 'contract_text']);
+    if (!file) {
+      return res.status(400).json({ error: 'Contract text is too short or missing' });
+    }
+
+    // Streaming mode: one NDJSON line per processed chunk, then a closing line
+    if (req.query.stream === '1') {
+      res.status(200).setHeader('Content-Type', 'application/x-ndjson');
+      const done = await aiWorkerPool.submit('combined', null, {
+        file,
+        timeoutMs: 180000,
+        onEvent: (event) => {
+          if (event.event === 'start') {
+            res.write(JSON.stringify({ totalChunks: event.total_chunks }) + '\n');
+          } else if (event.event === 'chunk') {
+            res.write(JSON.stringify({
+              data: formatAnalysisForFrontend(event),
+              humanizedText: event.humanized_text || '',
+              keyPoints: event.key_points || [],
+              chunk: event.chunk,
+              totalChunks: event.total_chunks
+            }) + '\n');
+          } else if (event.event === 'error') {
+            res.write(JSON.stringify({ warning: `Chunk ${event.chunk}: ${event.error}` }) + '\n');
+          }
+        }
+      });
+      res.end(JSON.stringify({ done: true, warnings: done.warnings || [], message: 'Contract analyzed and humanized successfully' }) + '\n');
+      return;
+    }
+
+    const result = await aiWorkerPool.submit('combined', null, { file, timeoutMs: 180000 });
+    return res.status(200).json({
+      ...formatCombinedForFrontend(result),
+      message: 'Contract analyzed and humanized successfully'
+    });
+  } catch (error) {
+    console.error('Error in analyzeAndHumanize:', error);
+    if (res.headersSent) {
+      return res.end(JSON.stringify({ done: true, error: error.message }) + '\n');
+    }
+    if (error.code === 'invalid_input') {
+      return res.status(400).json({ error: error.detail });
+    }
+    return res.status(500).json({
+      error: 'Failed to analyze and humanize contract',
+      message: error.message
+    });
+  }
+};
+
+export default analyzeAndHumanize;
@@ -1,130 +1,63 @@
-import mammoth from 'mammoth';
-import { PDFParse } from 'pdf-parse';
-import Tesseract from 'tesseract.js';
-import path from 'path';
-import { spawn } from 'child_process';
-import { fileURLToPath } from 'url';
+import aiWorkerPool from '../services/aiWorkerPool.js';
+import uploadedDocument from '../services/uploadedDocument.js';
 
-const __filename = fileURLToPath(import.meta.url);
-const __dirname = path.dirname(__filename);
-
-
-const humanizeWithAI = async (text) => {
+const humanizeWithAI = async (file) => {
     console.log("api hitting for humanizing with AI");
-  
-    return new Promise((resolve, reject) => {
-      const pythonScriptPath = path.join(__dirname, '../../../ai/humanizer.py');
-      console.log(`Python script path: ${pythonScriptPath}`);
-      
-      const pythonProcess = spawn('python', [pythonScriptPath], {
-        timeout: 120000 // 2 minute timeout
-      });
-
-      // Send contract text as JSON to Python script
-      const inputData = JSON.stringify({ contract_text: text });
-      console.log(`Sending ${text.length} characters to Python script`);
-      
-      pythonProcess.stdin.write(inputData);
-      pythonProcess.stdin.end();
-
-      let dataString = '';
-      let errorString = '';
-  
-      pythonProcess.stdout.on('data', (data) => {
-        dataString += data.toString();
-      });
-  
-      pythonProcess.stderr.on('data', (data) => {
-        const errMsg = data.toString();
-        console.error('PYTHON STDERR:', errMsg);
-        errorString += errMsg;
-      });
+    console.log(`Sending ${file.buffer.length} bytes to Python worker`);
 
-      pythonProcess.on('error', (error) => {
-        console.error('Failed to start Python process:', error);
-        reject(new Error(`Failed to start Python process: ${error.message}`));
-      });
-  
-      pythonProcess.on('close', (code) => {
-        console.log(`Python process closed with code ${code}`);
-        console.log('PYTHON STDOUT:', dataString);
-        
-        if (code !== 0) {
-          reject(new Error(`Python process exited with code ${code}: ${errorString || dataString}`));
-        } else {
-          try {
-            if (!dataString || dataString.trim().length === 0) {
-              reject(new Error('Python script returned empty output'));
-              return;
-            }
-            
-            const result = JSON.parse(dataString);
-            
-            // Check if Python returned an error
-            if (result.error) {
-              reject(new Error(`Python script error: ${result.error}`));
-              return;
-            }
-            
-            resolve(result);
-          } catch (e) {
-            console.error('Failed to parse JSON:', e.message);
-            console.error('Raw output:', dataString);
-            reject(
-              new Error(
-                `Failed to parse Python output: ${e.message}. Output was: ${dataString.substring(0, 500)}`
-              )
-            );
-          }
-        }
-      });
+    // Runs in a long-lived Python worker (see services/aiWorkerPool.js),
+    // which also extracts and normalizes the text of the upload
+    return aiWorkerPool.submit('humanize', null, {
+      file,
+      timeoutMs: 120000 // 2 minute timeout
     });
   };
   
 
+export const formatHumanizedForFrontend = (humanized) => ({
+  humanizedText: humanized.humanized_text || '',
+  keyPoints: humanized.key_points || [],
+  meta: {
+    originalLength: humanized.original_length,
+    simplifiedLength: humanized.simplified_length,
+    warnings: humanized.warnings || [],
+  },
+});
+
 const humanizeContract = async (req, res) => {
   try {
-    let contractText = '';
-
-    if (req.file) {
-      const mimeType = req.file.mimetype;
-
-      if (mimeType === 'application/pdf') {
-        const pdfParser = new PDFParse({ data: req.file.buffer });
-        const pdfData = await pdfParser.getText();
-        contractText = pdfData.text;
-        await pdfParser.destroy();
-      } else if (mimeType === 'application/vnd.openxmlformats-officedocument.wordprocessingml.document') {
-        const result = await mammoth.extractRawText({ buffer: req.file.buffer });
-        contractText = result.value;
-      } else if (mimeType.startsWith('image/')) {
-        const ocrResult = await Tesseract.recognize(req.file.buffer, 'eng');
-        contractText = ocrResult?.data?.text || '';
-      } else if (mimeType === 'text/plain') {
-        contractText = req.file.buffer.toString('utf-8');
-      }
-    }
-
-    contractText = req.body.contract_text || req.body.text || contractText;
+    const file = uploadedDocument(req, ['contract_text', 'text']);
 
-    if (!contractText) {
+    if (!file) {
         return res.status(400).json({ error: 'No contract text provided' });
     }
 
-    contractText = contractText
-      .replace(/\r\n/g, '\n')
-      .replace(/\n{2,}/g, '\n')
-      .replace(/[ \t]+/g, ' ')
-      .replace(/\f/g, '')
-      .trim();
-
-    console.log(`Contract text length: ${contractText.length} characters`);
-
-    if (!contractText || contractText.length < 10) {
-      return res.status(400).json({ error: 'Text is too short or missing' });
+    // Streaming mode: one NDJSON line per humanized chunk, then a closing line
+    if (req.query.stream === '1') {
+      res.status(200).setHeader('Content-Type', 'application/x-ndjson');
+      const done = await aiWorkerPool.submit('humanize', null, {
+        file,
+        timeoutMs: 120000,
+        onEvent: (event) => {
+          if (event.event === 'start') {
+            res.write(JSON.stringify({ totalChunks: event.total_chunks }) + '\n');
+          } else if (event.event === 'chunk') {
+            res.write(JSON.stringify({
+              humanizedText: event.humanized_text || '',
+              keyPoints: event.key_points || [],
+              chunk: event.chunk,
+              totalChunks: event.total_chunks
+            }) + '\n');
+          } else if (event.event === 'error') {
+            res.write(JSON.stringify({ warning: `Chunk ${event.chunk}: ${event.error}` }) + '\n');
+          }
+        }
+      });
+      res.end(JSON.stringify({ done: true, warnings: done.warnings || [], message: 'Text humanized successfully' }) + '\n');
+      return;
     }
 
-    const humanized = await humanizeWithAI(contractText);
+    const humanized = await humanizeWithAI(file);
     
     console.log('Humanization result received:', {
       hasHumanizedText: !!humanized.humanized_text,
@@ -134,13 +67,7 @@ const humanizeContract = async (req, res) => {
     });
 
     const response = {
-      humanizedText: humanized.humanized_text || '',
-      keyPoints: humanized.key_points || [],
-      meta: {
-        originalLength: humanized.original_length,
-        simplifiedLength: humanized.simplified_length,
-        warnings: humanized.warnings || [],
-      },
+      ...formatHumanizedForFrontend(humanized),
       message: 'Text humanized successfully',
     };
     
@@ -149,6 +76,12 @@ const humanizeContract = async (req, res) => {
     return res.status(200).json(response);
   } catch (error) {
     console.error('Error in humanizeContract:', error);
+    if (res.headersSent) {
+      return res.end(JSON.stringify({ done: true, error: error.message }) + '\n');
+    }
+    if (error.code === 'invalid_input') {
+      return res.status(400).json({ error: error.detail });
+    }
     return res.status(500).json({ 
       error: 'Failed to humanize contract',
       message: error.message,
@@ -157,5 +90,39 @@ const humanizeContract = async (req, res) => {
   }
 };
 
+// Plain-English versions of many short clauses (e.g. the flagged ones),
+// packed into as few model requests as their total size allows
+export const humanizeClauses = async (req, res) => {
+  try {
+    const clauses = req.body?.clauses;
+    if (!Array.isArray(clauses) || clauses.length === 0 || !clauses.every((c) => typeof c === 'string')) {
+      return res.status(400).json({ error: 'clauses must be a non-empty array of strings' });
+    }
+
+    const result = await aiWorkerPool.submit('humanize_clauses', null, {
+      clauses,
+      timeoutMs: 120000
+    });
+
+    return res.status(200).json({
+      data: result.clauses.map((item) => ({
+        humanizedText: item.humanized_text || '',
+        keyPoints: item.key_points || [],
+        error: item.error
+      })),
+      message: 'Clauses humanized successfully'
+    });
+  } catch (error) {
+    console.error('Error in humanizeClauses:', error);
+    if (error.code === 'invalid_input') {
+      return res.status(400).json({ error: error.detail });
+    }
+    return res.status(500).json({
+      error: 'Failed to humanize clauses',
+      message: error.message
+    });
+  }
+};
+
 export default humanizeContract;
 
@@ -0,0 +1,106 @@
+import uploadedDocument from '../services/uploadedDocument.js';
+import { submitJob, getJobStatus, getJobResult } from '../services/jobQueue.js';
+import { formatAnalysisForFrontend } from './uploadController.js';
+import { formatHumanizedForFrontend } from './humanizeController.js';
+import { formatCombinedForFrontend } from './combinedController.js';
+
+const JOB_TASKS = ['analyze', 'humanize', 'combined'];
+
+// One stored chunk event of a running job, shaped like the NDJSON lines of
+// the streaming endpoints
+const formatJobEvent = (task, event) => {
+  if (event.event === 'error') {
+    return { warning: `Chunk ${event.chunk}: ${event.error}`, chunk: event.chunk };
+  }
+  const chunk = { chunk: event.chunk, totalChunks: event.total_chunks };
+  if (task !== 'humanize') chunk.data = formatAnalysisForFrontend(event);
+  if (task !== 'analyze') {
+    chunk.humanizedText = event.humanized_text || '';
+    chunk.keyPoints = event.key_points || [];
+  }
+  return chunk;
+};
+
+const formatJobResult = (task, result) => {
+  if (task === 'humanize') return formatHumanizedForFrontend(result);
+  if (task === 'combined') return formatCombinedForFrontend(result);
+  return { data: formatAnalysisForFrontend(result) };
+};
+
+const sendJobError = (res, error) => {
+  console.error('Error in job request:', error.message);
+  if (error.code === 'not_found') {
+    return res.status(404).json({ error: error.detail });
+  }
+  if (error.code === 'invalid_input') {
+    return res.status(400).json({ error: error.detail });
+  }
+  return res.status(500).json({ error: 'Job request failed', message: error.message });
+};
+
+// Queues an upload for analysis ('analyze'), humanization ('humanize') or
+// both ('combined') and answers at once; poll GET /jobs/:id for progress
+// and fetch GET /jobs/:id/result once it is done
+export const createJob = async (req, res) => {
+  try {
+    const task = req.body?.task || 'analyze';
+    if (!JOB_TASKS.includes(task)) {
+      return res.status(400).json({ error: `task must be one of ${JOB_TASKS.join(', ')}` });
+    }
+    const file = uploadedDocument(req, ['text', 'contract_text']);
+    if (!file) {
+      return res.status(400).json({ error: 'Contract text is too short or missing' });
+    }
+
+    const job = await submitJob(task, file, { documentId: req.body?.document_id });
+    return res.status(202).json({
+      jobId: job.job_id,
+      status: job.status,
+      statusUrl: `/api/jobs/${job.job_id}`,
+      resultUrl: `/api/jobs/${job.job_id}/result`,
+      message: 'Job queued'
+    });
+  } catch (error) {
+    return sendJobError(res, error);
+  }
+};
+
+// Status and progress of a job, plus the chunks finished since `?after=`
+// (pass the previous response's `next` to only receive new ones)
+export const getJob = async (req, res) => {
+  try {
+    const after = parseInt(req.query.after || '0', 10) || 0;
+    const job = await getJobStatus(req.params.id, after);
+    return res.status(200).json({
+      jobId: job.id,
+      task: job.task,
+      status: job.status,
+      progress: { chunksDone: job.chunks_done, totalChunks: job.total_chunks },
+      partial: job.events.map((event) => formatJobEvent(job.task, event)),
+      next: job.next,
+      attempts: job.attempts,
+      error: job.error
+    });
+  } catch (error) {
+    return sendJobError(res, error);
+  }
+};
+
+// The stored result of a finished job: 200 with the same body as the
+// synchronous endpoint, 202 while the job is queued or running
+export const getJobOutcome = async (req, res) => {
+  try {
+    const job = await getJobResult(req.params.id);
+    if (job.status === 'done') {
+      return res.status(200).json({ ...formatJobResult(job.task, job.result), jobId: job.id, message: 'Job completed' });
+    }
+    if (job.status === 'failed') {
+      return res.status(job.code === 'invalid_input' ? 400 : 500).json({ jobId: job.id, status: job.status, error: job.error });
+    }
+    return res.status(202).json({ jobId: job.id, status: job.status });
+  } catch (error) {
+    return sendJobError(res, error);
+  }
+};
+
+export default createJob;
@@ -1,121 +1,60 @@
-import mammoth from 'mammoth';
-import { PDFParse } from 'pdf-parse';
-import Tesseract from 'tesseract.js';
-import path from 'path';
-import { spawn } from 'child_process';
-import { fileURLToPath } from 'url';
+import aiWorkerPool from '../services/aiWorkerPool.js';
+import uploadedDocument from '../services/uploadedDocument.js';
 
-const __filename = fileURLToPath(import.meta.url);
-const __dirname = path.dirname(__filename);
-
-async function analyzeWithAI(contractText) {
-    return new Promise((resolve, reject) => {
-
-      const pythonScript = path.join(__dirname, '../../../Ai/analyzer.py');
-      
-   
-      const python = spawn('python', [pythonScript]);
-      
-      let dataString = '';
-      let errorString = '';
-      
-
-      python.stdin.write(JSON.stringify({ text: contractText }));
-      python.stdin.end();
-      
-      python.stdout.on('data', (data) => {
-        const chunk = data.toString();
-  console.log("PYTHON STDOUT:", chunk);
-  dataString += chunk;
-        // dataString += data.toString();
-      });
-      
-
-      python.stderr.on('data', (data) => {
-        const chunk = data.toString();
-        console.log("PYTHON STDERR:", chunk);
-        errorString += chunk;
-        // errorString += data.toString();
-      });
-      
- 
-      python.on('close', (code) => {
-        if (code !== 0) {
-          reject(new Error(`Python process exited with code ${code}: ${errorString || dataString}`));
-        } else {
-          try {
-            if (!dataString || dataString.trim().length === 0) {
-              reject(new Error('Python script returned empty output'));
-              return;
-            }
-            const result = JSON.parse(dataString);
-            resolve(result);
-          } catch (e) {
-            reject(new Error(`Failed to parse Python output: ${e.message}. Output was: ${dataString.substring(0, 200)}`));
-          }
-        }
-      });
-    });
+async function analyzeWithAI(file, documentId) {
+    // Runs in a long-lived Python worker (see services/aiWorkerPool.js),
+    // which also extracts and normalizes the text of the upload
+    const result = await aiWorkerPool.submit('analyze', null, { file, documentId });
+    return result;
   }
-  function formatAnalysisForFrontend(rawAnalysis) {
+  export function formatAnalysisForFrontend(rawAnalysis) {
     if (!rawAnalysis?.analysis || !Array.isArray(rawAnalysis.analysis)) return [];
    console.log(rawAnalysis)
     return rawAnalysis.analysis.map((item) => ({
       clause: item.clause_text.trim(),
       riskScore: item.risk_score,
       explanation: item.explanation.trim(),
-      recommendation: item.recommendation.trim()
+      recommendation: item.recommendation.trim(),
+      // Character offsets (and page) of the clause in the submitted text
+      start: item.start,
+      end: item.end,
+      page: item.page
     }));
   }
 const analyzePDF = async (req,res)=>{
     console.log("analyzing pdf api hitting")
     try {
-        let contractText = "";
-        if (req.file) {
-            const mimeType = req.file.mimetype;
-      
-            if (mimeType === "application/pdf") {
-              const pdfParser = new PDFParse({ data: req.file.buffer });
-              const pdfData = await pdfParser.getText();
-              contractText = pdfData.text;
-              await pdfParser.destroy();
-            }
-            else if (
-                mimeType ===
-                "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-              ) {
-                const result = await mammoth.extractRawText({
-                  buffer: req.file.buffer
-                });
-                contractText = result.value;
-              }
-            else if (mimeType.startsWith("image/")) {
-              const ocrResult = await Tesseract.recognize(req.file.buffer, 'eng');
-              contractText = ocrResult?.data?.text || "";
-            }
-
-
-        }
-        if ( !contractText && req.body.text) {
-            contractText = req.body.text;
-            console.log(contractText)
-            if(contractText){
-              console.log("sucessfuly fetched contract text")
-            }
-       
-          }
-contractText = contractText.replace(/\r\n/g, '\n');
-contractText = contractText.replace(/\n{2,}/g, '\n');
-contractText = contractText.replace(/[ \t]+/g, ' ');
-contractText = contractText.replace(/\f/g, '');
-contractText = contractText.trim();
-
-          if (!contractText || contractText.trim().length < 50) {
+        const file = uploadedDocument(req, ['text']);
+        if (!file) {
             return res.status(400).json({
               error: "Contract text is too short or missing"
             });
           }
-    const analysis = await analyzeWithAI(contractText);
+    // Streaming mode: one NDJSON line per analyzed chunk, then a closing line
+    if (req.query.stream === '1') {
+      res.status(200).setHeader('Content-Type', 'application/x-ndjson');
+      const done = await aiWorkerPool.submit('analyze', null, {
+        file,
+        onEvent: (event) => {
+          if (event.event === 'start') {
+            res.write(JSON.stringify({ totalChunks: event.total_chunks }) + '\n');
+          } else if (event.event === 'chunk') {
+            res.write(JSON.stringify({
+              data: formatAnalysisForFrontend(event),
+              chunk: event.chunk,
+              totalChunks: event.total_chunks
+            }) + '\n');
+          } else if (event.event === 'error') {
+            res.write(JSON.stringify({ warning: `Chunk ${event.chunk}: ${event.error}` }) + '\n');
+          }
+        }
+      });
+      res.end(JSON.stringify({ done: true, warnings: done.warnings || [], message: "Contract analyzed successfully" }) + '\n');
+      return;
+    }
+    // Optional: resubmitting a revised contract under the same id only
+    // re-analyzes the clauses that changed
+    const analysis = await analyzeWithAI(file, req.body.document_id);
     console.log(analysis)
     const cleanAnalysis = formatAnalysisForFrontend(analysis);
     console.log(cleanAnalysis)
@@ -124,6 +63,13 @@ contractText = contractText.trim();
         console.log(
             error.message
         )
+        if (res.headersSent) {
+          res.end(JSON.stringify({ done: true, error: error.message }) + '\n');
+          return;
+        }
+        if (error.code === 'invalid_input') {
+          return res.status(400).json({ error: error.detail });
+        }
         res.status(500).send({
             message: error.message
         })
@@ -1,9 +1,17 @@
 import express from 'express';
 import upload from '../middlewares/uploadmiddleware.js';
 import analyzePDF from '../Controller/uploadController.js';
-import humanizeContract from '../Controller/humanizeController.js';
+import humanizeContract, { humanizeClauses } from '../Controller/humanizeController.js';
+import analyzeAndHumanize from '../Controller/combinedController.js';
+import createJob, { getJob, getJobOutcome } from '../Controller/jobController.js';
 
 const router = express.Router();
 router.post('/upload', upload.single('file'), analyzePDF )
 router.post('/humanize',upload.single('file'),humanizeContract)
+router.post('/humanize/clauses',humanizeClauses)
+router.post('/analyze-humanize',upload.single('file'),analyzeAndHumanize)
+// Asynchronous jobs for large contracts: submit, poll progress, fetch result
+router.post('/jobs',upload.single('file'),createJob)
+router.get('/jobs/:id',getJob)
+router.get('/jobs/:id/result',getJobOutcome)
 export default router;
@@ -10,12 +10,14 @@ const fileFilter = (req, file, cb) => {
     'image/jpeg',
     'image/jpg',
     'image/webp',
+    'text/plain',
+    'text/html',
   ];
 
   if (allowedTypes.includes(file.mimetype)) {
     cb(null, true);
   } else {
-    cb(new Error('Only PDF, DOCX, or image files (png/jpg/webp) are allowed!'), false);
+    cb(new Error('Only PDF, DOCX, text, HTML or image files (png/jpg/webp) are allowed!'), false);
   }
 };
 
@@ -1,6 +1,7 @@
 import express from 'express';
 import cors from 'cors';
 import contractRouter from './Routes/contractRoute.js';
+import { startJobRunner } from './services/jobQueue.js';
 const app = express();
 const port = 3000;
 
@@ -9,4 +10,5 @@ app.use(express.json());
 app.use("/api",contractRouter)
 app.listen(port, () => {
     console.log('Server is running on port 3000');
+    startJobRunner();
 });
\ No newline at end of file
@@ -0,0 +1,216 @@
+import path from 'path';
+import { randomUUID } from 'crypto';
+import { spawn } from 'child_process';
+import { fileURLToPath } from 'url';
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = path.dirname(__filename);
+
+const WORKER_SCRIPT = path.join(__dirname, '../../../ai/worker.py');
+const PYTHON_BIN = process.env.PYTHON_BIN || 'python';
+const POOL_SIZE = parseInt(process.env.AI_WORKERS || '2', 10);
+const MAX_JOBS_PER_WORKER = parseInt(process.env.AI_WORKER_MAX_JOBS || '100', 10);
+
+// One log line per job with the worker's per-stage timings (TELEMETRY=1 in ai/.env)
+const logTrace = (job, trace) => {
+  const stages = Object.entries(trace.stages || {})
+    .map(([name, stage]) => `${name}=${Math.round(stage.total_ms)}ms`)
+    .join(' ');
+  const tokens = trace.tokens || {};
+  console.log(`AI job ${job.task} trace=${trace.trace_id} ${Math.round(trace.duration_ms)}ms ${stages} tokens=${tokens.prompt || 0}/${tokens.completion || 0}`);
+};
+
+// Frames are a 4-byte big-endian length followed by UTF-8 JSON (see ai/worker.py)
+const frameHeader = (length) => {
+  const header = Buffer.alloc(4);
+  header.writeUInt32BE(length, 0);
+  return header;
+};
+
+const encodeFrame = (message) => {
+  const body = Buffer.from(JSON.stringify(message), 'utf-8');
+  return Buffer.concat([frameHeader(body.length), body]);
+};
+
+class PythonWorker {
+  constructor(onExit) {
+    this.jobsDone = 0;
+    this.current = null;
+    this.buffer = Buffer.alloc(0);
+    this.alive = true;
+
+    this.process = spawn(PYTHON_BIN, [WORKER_SCRIPT], { stdio: ['pipe', 'pipe', 'pipe'] });
+
+    this.process.stdout.on('data', (data) => {
+      this.buffer = Buffer.concat([this.buffer, data]);
+      this.drainFrames();
+    });
+
+    this.process.stderr.on('data', (data) => {
+      console.error('PYTHON STDERR:', data.toString());
+    });
+
+    this.process.on('error', (error) => {
+      console.error('Failed to start Python worker:', error);
+      this.fail(new Error(`Failed to start Python worker: ${error.message}`));
+      onExit(this);
+    });
+
+    this.process.on('close', (code) => {
+      this.fail(new Error(`Python worker exited with code ${code}`));
+      onExit(this);
+    });
+  }
+
+  drainFrames() {
+    while (this.buffer.length >= 4) {
+      const length = this.buffer.readUInt32BE(0);
+      if (this.buffer.length < 4 + length) return;
+
+      const body = this.buffer.subarray(4, 4 + length).toString('utf-8');
+      this.buffer = this.buffer.subarray(4 + length);
+
+      const job = this.current;
+      if (!job) continue;
+
+      let message;
+      try {
+        message = JSON.parse(body);
+      } catch (e) {
+        this.current = null;
+        clearTimeout(job.timer);
+        job.reject(new Error(`Failed to parse Python worker output: ${e.message}`));
+        job.done();
+        continue;
+      }
+
+      // Streaming jobs receive per-chunk events before the final result
+      if (message.event) {
+        if (job.onEvent) job.onEvent(message.event);
+        continue;
+      }
+
+      this.current = null;
+      clearTimeout(job.timer);
+      if (message.trace) logTrace(job, message.trace);
+      if (message.error) {
+        const error = new Error(`Python worker error: ${message.error}`);
+        // 'invalid_input': the upload itself was unreadable or too short
+        error.code = message.code;
+        error.detail = message.error;
+        job.reject(error);
+      } else {
+        job.resolve(message.result);
+      }
+      job.done();
+    }
+  }
+
+  run(job) {
+    this.current = job;
+    this.jobsDone += 1;
+    if (job.timeoutMs) {
+      job.timer = setTimeout(() => {
+        this.fail(new Error(`Python worker timed out after ${job.timeoutMs}ms`));
+        this.kill();
+      }, job.timeoutMs);
+    }
+    const message = { id: job.id, task: job.task, trace_id: job.traceId };
+    if (job.file) {
+      message.file = { mime_type: job.file.mimeType, filename: job.file.filename };
+    } else if (job.clauses) {
+      message.clauses = job.clauses;
+    } else {
+      message.text = job.text;
+    }
+    if (job.documentId) message.document_id = job.documentId;
+    if (job.onEvent) message.stream = true;
+    if (job.params) Object.assign(message, job.params);
+    this.process.stdin.write(encodeFrame(message));
+    if (job.file) {
+      // Raw file bytes follow the request frame; Python extracts the text
+      this.process.stdin.write(frameHeader(job.file.buffer.length));
+      this.process.stdin.write(job.file.buffer);
+    }
+  }
+
+  fail(error) {
+    this.alive = false;
+    const job = this.current;
+    this.current = null;
+    if (job) {
+      clearTimeout(job.timer);
+      job.reject(error);
+      job.done();
+    }
+  }
+
+  kill() {
+    this.alive = false;
+    this.process.stdin.end();
+    this.process.kill();
+  }
+}
+
+export class AIWorkerPool {
+  constructor(size = POOL_SIZE, maxJobsPerWorker = MAX_JOBS_PER_WORKER) {
+    this.size = size;
+    this.maxJobsPerWorker = maxJobsPerWorker;
+    this.workers = [];
+    this.queue = [];
+    this.nextId = 1;
+  }
+
+  spawnWorker() {
+    const worker = new PythonWorker((exited) => {
+      this.workers = this.workers.filter((w) => w !== exited);
+      this.dispatch();
+    });
+    this.workers.push(worker);
+    return worker;
+  }
+
+  // Run `task` ('analyze' | 'humanize' | 'extract') on `text` in the next
+  // free worker. Pass `file` ({ buffer, mimeType, filename }) instead of
+  // text to let the worker extract the text from the uploaded bytes, or
+  // `clauses` (an array of strings) for 'humanize_clauses'.
+  // `documentId` makes 'analyze' reuse findings from the previous version.
+  // `onEvent` streams per-chunk events; the promise then resolves with the
+  // final 'done' event. `traceId` ties the worker's timings to the request.
+  // `params` are sent as extra request fields (e.g. the job queue's 'job_id').
+  submit(task, text, { timeoutMs, documentId, onEvent, file, clauses, traceId, params } = {}) {
+    return new Promise((resolve, reject) => {
+      this.queue.push({
+        id: this.nextId++, task, text, timeoutMs, documentId, onEvent, file, clauses, params,
+        traceId: traceId || randomUUID().replace(/-/g, ''), resolve, reject
+      });
+      this.dispatch();
+    });
+  }
+
+  dispatch() {
+    while (this.queue.length > 0) {
+      let worker = this.workers.find((w) => w.alive && !w.current);
+      if (!worker) {
+        if (this.workers.length >= this.size) return;
+        worker = this.spawnWorker();
+      }
+
+      const job = this.queue.shift();
+      job.done = () => this.release(worker);
+      worker.run(job);
+    }
+  }
+
+  release(worker) {
+    // Recycle workers after a fixed number of jobs
+    if (worker.alive && worker.jobsDone >= this.maxJobsPerWorker) {
+      worker.kill();
+    }
+    this.dispatch();
+  }
+}
+
+const aiWorkerPool = new AIWorkerPool();
+
+export default aiWorkerPool;
@@ -0,0 +1,62 @@
+import path from 'path';
+import { spawn } from 'child_process';
+import { fileURLToPath } from 'url';
+import { AIWorkerPool } from './aiWorkerPool.js';
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = path.dirname(__filename);
+
+const JOBS_SCRIPT = path.join(__dirname, '../../../ai/jobs.py');
+const PYTHON_BIN = process.env.PYTHON_BIN || 'python';
+// Python processes running queued jobs (0 = run `python ai/jobs.py serve` separately)
+const JOB_WORKERS = parseInt(process.env.AI_JOB_WORKERS || '2', 10);
+const RESTART_DELAY_MS = 5000;
+// Queue operations only read or write one SQLite row, so they get their own
+// worker instead of waiting behind minutes-long requests in aiWorkerPool
+const CONTROL_TIMEOUT_MS = 30000;
+const controlPool = new AIWorkerPool(1);
+
+// Durable jobs (see ai/jobs.py): the upload is queued in SQLite and the
+// promise resolves with { job_id, status } as soon as it is stored
+export const submitJob = (task, file, { documentId } = {}) =>
+  controlPool.submit('job_submit', null, {
+    file,
+    documentId,
+    params: { job_task: task },
+    timeoutMs: CONTROL_TIMEOUT_MS
+  });
+
+// Progress of a job; `after` skips partial-result events already seen
+export const getJobStatus = (jobId, after = 0) =>
+  controlPool.submit('job_status', null, {
+    params: { job_id: jobId, after },
+    timeoutMs: CONTROL_TIMEOUT_MS
+  });
+
+export const getJobResult = (jobId) =>
+  controlPool.submit('job_result', null, {
+    params: { job_id: jobId },
+    timeoutMs: CONTROL_TIMEOUT_MS
+  });
+
+// Keeps `python ai/jobs.py serve` running; queued jobs survive restarts of
+// either side, and a job whose worker died is picked up again
+let runner = null;
+
+export const startJobRunner = () => {
+  if (JOB_WORKERS <= 0) return;
+  if (!runner) process.once('exit', () => runner?.kill());
+  runner = spawn(PYTHON_BIN, [JOBS_SCRIPT, 'serve', '--workers', String(JOB_WORKERS)], {
+    stdio: ['ignore', 'inherit', 'pipe']
+  });
+  runner.stderr.on('data', (data) => {
+    console.error('JOB RUNNER:', data.toString());
+  });
+  runner.on('error', (error) => {
+    console.error('Failed to start job runner:', error);
+  });
+  runner.on('close', (code) => {
+    console.error(`Job runner exited with code ${code}, restarting in ${RESTART_DELAY_MS}ms`);
+    setTimeout(startJobRunner, RESTART_DELAY_MS);
+  });
+};
@@ -0,0 +1,14 @@
+// The uploaded file of a request or, without one, text pasted into one of
+// `textFields` wrapped as a plain-text file. Either way the bytes go to the
+// Python worker unparsed; it extracts and normalizes the text
+// (see ai/extraction.py).
+const uploadedDocument = (req, textFields) => {
+  if (req.file) {
+    return { buffer: req.file.buffer, mimeType: req.file.mimetype, filename: req.file.originalname };
+  }
+  const text = textFields.map((field) => req.body?.[field]).find(Boolean);
+  if (!text) return null;
+  return { buffer: Buffer.from(text, 'utf-8'), mimeType: 'text/plain', filename: null };
+};
+
+export default uploadedDocument;
@@ -73,13 +73,33 @@ if (uploadedFile) {
 if (contractText.trim()) {
   formData.append("text", contractText);
 }
-const res = await api.post("/api/upload",formData,{
-  headers: { "Content-Type": "multipart/form-data" }
-})
-      
-console.log(res.data.data)
-console.log(res.data.message)
-setAnalysis(res.data.data);
+// Stream findings chunk by chunk so they show up before the whole
+// contract is done (NDJSON, see Backend uploadController)
+const res = await fetch(`${import.meta.env.VITE_BASE_URL}/api/upload?stream=1`, {
+  method: "POST",
+  body: formData
+});
+if (!res.ok || !res.body) throw new Error(`Request failed with status ${res.status}`);
+
+setAnalysis([]);
+const reader = res.body.getReader();
+const decoder = new TextDecoder();
+let buffered = '';
+while (true) {
+  const { value, done } = await reader.read();
+  if (done) break;
+  buffered += decoder.decode(value, { stream: true });
+  const lines = buffered.split('\n');
+  buffered = lines.pop();
+  for (const line of lines) {
+    if (!line.trim()) continue;
+    const message = JSON.parse(line);
+    if (message.error) throw new Error(message.error);
+    if (message.data?.length) {
+      setAnalysis((previous) => [...(previous || []), ...message.data]);
+    }
+  }
+}
 setAnalyzing(false);
     } 
     catch (error) {
@@ -1,22 +1,66 @@
 import os
 import sys
-import requests
 import json
-from dotenv import load_dotenv
-import re
-import time
+import uuid
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Load environment variables from .env file
-load_dotenv()
+# Run as a script: read .env before the settings below are evaluated
+if __name__ == "__main__":
+    try:
+        from .config import load_env
+    except ImportError:
+        from config import load_env
+    load_env()
+
+try:
+    from .result_cache import shared_cache, make_key
+    from .clause_index import shared_index
+    from .chunker import chunk_spans, chunk_regions, clause_runs, estimate_tokens, join_pieces, segment_clauses, split_long, token_budget
+    from .revisions import shared_store, fingerprint, locate
+    from .anchoring import AnchorIndex, SpanDeduper, page_of
+    from .backends import DEFAULT_MODEL
+    from .completions import model_chain, request_json
+    from . import risk_rules, telemetry
+except ImportError:
+    from result_cache import shared_cache, make_key
+    from clause_index import shared_index
+    from chunker import chunk_spans, chunk_regions, clause_runs, estimate_tokens, join_pieces, segment_clauses, split_long, token_budget
+    from revisions import shared_store, fingerprint, locate
+    from anchoring import AnchorIndex, SpanDeduper, page_of
+    from backends import DEFAULT_MODEL
+    from completions import model_chain, request_json
+    import risk_rules
+    import telemetry
 
 # --- Configuration ---
-API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not API_KEY:
-    raise ValueError("OPENROUTER_API_KEY not found. Please create a .env file and add your key.")
+# Requests go to the configured backend (LLM_BACKEND, see backends.py); the
+# API key and the .env file are read on first use (see config.py)
+MODEL = DEFAULT_MODEL
+# Tried in order when a model keeps failing (OPENROUTER_FALLBACK_MODELS)
+MODELS = model_chain(MODEL)
+
+# Number of chunks sent to the API concurrently. The shared rate limiter
+# (OPENROUTER_REQUESTS_PER_MINUTE / OPENROUTER_TOKENS_PER_MINUTE) decides
+# how fast they actually go out.
+MAX_WORKERS = int(os.getenv("OPENROUTER_MAX_WORKERS", "4"))
+TEMPERATURE = 0.7
+
+# Answer size limit, and the expected answer tokens per contract token
+# (findings quote their clauses); chunk sizes are chosen so answers fit
+MAX_OUTPUT_TOKENS = 4000
+OUTPUT_RATIO = 0.5
+
+# Local risk pre-filter: text segments whose risk-phrase score (summed rule
+# weights, see risk_rules.py) is below the threshold never reach the model.
+# 0 sends everything. ANALYSIS_MODE=rules-only makes no API calls at all.
+RISK_THRESHOLD = float(os.getenv("RISK_PREFILTER_THRESHOLD", "1"))
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "llm")
+PREFILTER_SEGMENT_CHARS = 2000
 
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
-MODEL = "meta-llama/llama-3.3-70b-instruct:free"
-# MODEL = "tngtech/deepseek-r1t2-chimera:free"
+# Fields of a finding kept in the near-duplicate clause index (see
+# clause_index.py); offsets and pages belong to one document
+INDEXED_FIELDS = ("clause_text", "risk_score", "explanation", "recommendation")
 
 # --- Prompt Engineering ---
 PROMPT_TEMPLATE = """
@@ -47,177 +91,639 @@ Example output:
 }}
 """
 
-def chunk_text(text, chunk_size=15000, overlap=500):
-    """
-    Split text into overlapping chunks to ensure clauses aren't cut off.
-    
-    Args:
-        text: The text to chunk
-        chunk_size: Maximum size of each chunk
-        overlap: Number of characters to overlap between chunks
-    
-    Returns:
-        List of text chunks
-    """
-    if len(text) <= chunk_size:
-        return [text]
-    
-    chunks = []
-    start = 0
-    
-    while start < len(text):
-        end = start + chunk_size
-        
-        # If this isn't the last chunk, try to break at a sentence or paragraph
-        if end < len(text):
-            # Look for sentence endings in the last 200 chars of the chunk
-            last_period = text.rfind('.', end - 200, end)
-            last_newline = text.rfind('\n', end - 200, end)
-            break_point = max(last_period, last_newline)
-            
-            if break_point > start:
-                end = break_point + 1
-        
-        chunks.append(text[start:end])
-        start = end - overlap  # Overlap to avoid missing clauses at boundaries
-    
-    return chunks
-
-def analyze_chunk(chunk, chunk_num, total_chunks):
+def analyze_chunk(chunk, chunk_num, total_chunks, on_item=None):
     """
     Analyze a single chunk of contract text.
+
+    The completion is streamed and parsed incrementally: `on_item(item)`,
+    if given, receives each risk item as soon as the model has finished
+    writing it, and malformed output is rejected as soon as it goes wrong.
+    Retries, backoff, model fallback and hedging happen in
+    completions.request_json.
     """
     sys.stderr.write(f"Analyzing chunk {chunk_num}/{total_chunks} ({len(chunk)} characters)...\n")
     
-    # Add delay between chunks to avoid rate limiting
-    if chunk_num > 1:
-        delay = 10  # Wait 10 seconds between chunks
-        sys.stderr.write(f"Waiting {delay} seconds to avoid rate limits...\n")
-        time.sleep(delay)
+    # Identical chunk + prompt + model was analyzed before: skip the API call
+    cache = shared_cache()
+    cache_key = make_key(PROMPT_TEMPLATE, ",".join(MODELS), TEMPERATURE, chunk)
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            telemetry.count("ai_cache_hits_total", stage="analyze")
+            sys.stderr.write(f"Chunk {chunk_num}: Cache hit ({len(cached.get('analysis', []))} risk items)\n")
+            return cached
     
     prompt = PROMPT_TEMPLATE.format(contract_text=chunk)
 
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
-
     payload = {
-        "model": MODEL,
         "messages": [
             {"role": "user", "content": prompt}
         ],
-        "max_tokens": 4000,
-        "temperature": 0.7
+        "max_tokens": MAX_OUTPUT_TOKENS,
+        "temperature": TEMPERATURE
     }
 
+    # Prompt token estimate plus the output allowance
+    estimated_tokens = estimate_tokens(prompt) + payload["max_tokens"]
+
     try:
-        response = requests.post(OPENROUTER_URL, headers=headers, json=payload, timeout=90)
-        response.raise_for_status()
-        
-        response_data = response.json()
-        
-        if "choices" not in response_data or len(response_data["choices"]) == 0:
-            sys.stderr.write(f"Chunk {chunk_num}: Invalid response structure\n")
-            return {"error": "Invalid API response structure", "raw_response": str(response_data)[:500]}
-        
-        ai_response = response_data["choices"][0]["message"]["content"]
-        
-        if not ai_response or ai_response.strip() == "":
-            if "error" in response_data:
-                return {"error": f"API Error: {response_data['error']}"}
-            return {"error": "AI returned empty response"}
+        parsed_result = request_json(
+            payload, MODELS,
+            stream_keys=("analysis",),
+            on_item=(lambda key, item: on_item(item)) if on_item is not None else None,
+            estimated_tokens=estimated_tokens,
+            label=f"Chunk {chunk_num}",
+        )
         
-        # Extract JSON from response
-        json_match = re.search(r'\{[\s\S]*"analysis"[\s\S]*\][\s\S]*\}', ai_response)
-        if json_match:
-            cleaned_text = json_match.group(0)
-        else:
-            cleaned_text = ai_response.strip().replace("```json", "").replace("```", "").strip()
-        
-        parsed_result = json.loads(cleaned_text)
+        if "error" in parsed_result:
+            sys.stderr.write(f"Chunk {chunk_num}: {parsed_result['error']}\n")
+            return parsed_result
         
         if "analysis" not in parsed_result:
             return {"error": "AI response missing 'analysis' field"}
         
         sys.stderr.write(f"Chunk {chunk_num}: Found {len(parsed_result.get('analysis', []))} risk items\n")
+        if cache is not None:
+            cache.set(cache_key, parsed_result)
+        remember_clauses(chunk, parsed_result["analysis"])
         return parsed_result
         
-    except json.JSONDecodeError as e:
-        sys.stderr.write(f"Chunk {chunk_num}: JSON decode error: {e}\n")
-        return {"error": f"Invalid JSON: {str(e)}"}
-    except requests.exceptions.Timeout:
-        sys.stderr.write(f"Chunk {chunk_num}: Request timed out\n")
-        return {"error": "Request timed out"}
-    except requests.exceptions.RequestException as e:
-        sys.stderr.write(f"Chunk {chunk_num}: Request failed: {e}\n")
-        return {"error": f"API request failed: {str(e)}"}
     except Exception as e:
         sys.stderr.write(f"Chunk {chunk_num}: Unexpected error: {e}\n")
         return {"error": f"Unexpected error: {str(e)}"}
 
-def run(text_content):
+def clause_namespace():
+    """Findings are only reused between clauses analyzed with the same prompt, models and temperature."""
+    return make_key(PROMPT_TEMPLATE, ",".join(MODELS), TEMPERATURE, "")
+
+def clause_segments(text):
+    """Clauses of the text, long ones cut into ~PREFILTER_SEGMENT_CHARS pieces."""
+    return [
+        piece
+        for start, end in segment_clauses(text)
+        for piece in split_long(text, start, end, PREFILTER_SEGMENT_CHARS)
+    ]
+
+def remember_clauses(chunk, items):
+    """
+    Store the findings of every clause of an analyzed chunk in the
+    near-duplicate clause index, so similar clauses of later contracts are
+    served without a model call (see reuse_similar()). Clauses without
+    findings are stored too, but the index only serves them for a short
+    time (see ClauseIndex): the model may have missed something.
+    """
+    index = shared_index()
+    if index is None or not isinstance(items, list):
+        return
+    segments = clause_segments(chunk)
+    segment_starts = [start for start, _ in segments]
+    findings = [[] for _ in segments]
+    anchors = AnchorIndex(chunk)
+    taken = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        # A sentence repeated in several clauses belongs to each of them once
+        found = anchors.locate(item.get("clause_text", ""), taken=taken) or anchors.locate(item.get("clause_text", ""))
+        if found is not None:
+            taken.add(found)
+        if found is None:
+            # Unknown owner: storing the chunk's clauses without it would hide the finding
+            return
+        owner = bisect_right(segment_starts, found[0]) - 1
+        findings[owner].append({key: item[key] for key in INDEXED_FIELDS if key in item})
+    index.add_many(
+        [(chunk[start:end], found) for (start, end), found in zip(segments, findings)],
+        clause_namespace(),
+    )
+
+def reuse_similar(text_content, segments, keep):
+    """
+    Serve kept segments that nearly duplicate an analyzed clause from the
+    clause index instead of the model.
+
+    Stored findings are reused with this contract's wording: each is
+    located in the segment and its clause_text replaced by the text found
+    there. A segment whose stored findings can't all be located is left
+    for the model.
+
+    Returns:
+        (keep, reused) - segment indexes still to analyze, and
+        {segment index: findings} for the segments served from the index
+    """
+    index = shared_index()
+    if index is None or not keep:
+        return keep, {}
+    
+    namespace = clause_namespace()
+    anchors = AnchorIndex(text_content)
+    remaining = []
+    reused = {}
+    for i in keep:
+        start, end = segments[i]
+        match = index.lookup(text_content[start:end], namespace)
+        if match is not None:
+            findings = []
+            for item in match[1]:
+                found = anchors.locate(item.get("clause_text", ""), near=(start, end))
+                if found is None:
+                    break
+                findings.append(dict(item, clause_text=text_content[found[0]:found[1]]))
+            else:
+                reused[i] = findings
+                continue
+        remaining.append(i)
+    
+    if reused:
+        telemetry.count("ai_cache_hits_total", value=len(reused), stage="similar_clause")
+        sys.stderr.write(f"Clause index served {len(reused)}/{len(keep)} segment(s)\n")
+    return remaining, reused
+
+def reuse_or_analyze(spans, reused):
+    """
+    process_chunk for iter_spans(): the stored result for spans served by
+    the clause index (see plan_spans()), analyze_chunk() for the others.
+    """
+    def process_chunk(chunk, chunk_num, total_chunks):
+        result = reused.get(spans[chunk_num - 1])
+        if result is None:
+            return analyze_chunk(chunk, chunk_num, total_chunks)
+        sys.stderr.write(f"Chunk {chunk_num}: {len(result['analysis'])} risk item(s) from similar clauses\n")
+        return result
+    return process_chunk
+
+def packed_spans(chunks):
+    """
+    Spans and pieces for chunks of chunker.chunk_regions(): each chunk is
+    identified by the span from its first to its last piece, and
+    {span: pieces} holds the chunks packed from more than one piece.
+    """
+    spans = [(pieces[0][0], pieces[-1][1]) for pieces in chunks]
+    return spans, {span: pieces for span, pieces in zip(spans, chunks) if len(pieces) > 1}
+
+def span_text(text_content, span, pieces=None):
+    """The text sent for a chunk span (its pieces joined, for a packed chunk)."""
+    parts = pieces.get(span) if pieces else None
+    if parts is not None:
+        return join_pieces(text_content, parts)
+    return text_content[span[0]:span[1]]
+
+def iter_spans(text_content, spans, process_chunk=None, pieces=None):
+    """
+    Analyze (start, end) spans of the contract concurrently and yield each
+    result as soon as its chunk completes.
+
+    Args:
+        text_content: The full text of the contract.
+        spans: The chunks to send, as offsets into text_content.
+        process_chunk: Function called as (chunk, chunk_num, total_chunks)
+            for every span; defaults to analyze_chunk.
+        pieces: {span: pieces} for chunks packed from separate parts of
+            the text (see packed_spans()).
+
+    Yields:
+        (chunk_num, result) tuples in completion order.
+    """
+    total_chunks = len(spans)
+    if not total_chunks:
+        return
+    process_chunk = process_chunk or analyze_chunk
+    
+    def analyze_span(chunk_num):
+        return process_chunk(span_text(text_content, spans[chunk_num - 1], pieces), chunk_num, total_chunks)
+    
+    workers = max(1, min(MAX_WORKERS, total_chunks))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        # Chunks run in pool threads but belong to the caller's trace
+        analyze_span = telemetry.bind(analyze_span)
+        futures = {executor.submit(analyze_span, n): n for n in range(1, total_chunks + 1)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # Stop queued chunks if the consumer goes away early
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def analyze_spans(text_content, spans, pieces=None):
+    """
+    Analyze (start, end) spans of the contract concurrently.
+
+    Returns:
+        List of per-chunk results (analysis or error dicts), in span order.
+    """
+    results = [None] * len(spans)
+    for chunk_num, result in iter_spans(text_content, spans, pieces=pieces):
+        results[chunk_num - 1] = result
+    return results
+
+def dedup_findings(items, deduper=None):
+    """
+    Remove duplicate risk items (might occur at chunk boundaries or when the
+    model paraphrases the same clause). Items anchored with "start"/"end"
+    offsets are compared by span overlap.
+
+    Args:
+        items: Risk items to filter.
+        deduper: SpanDeduper holding items already emitted; updated in place
+            so the same one can be passed for every chunk of a streamed analysis.
+    """
+    if deduper is None:
+        deduper = SpanDeduper()
+    return [item for item in items if deduper.add(item)]
+
+def prefilter_spans(text_content, matches):
+    """
+    Chunk only the parts of the contract that look risky.
+
+    The text is cut into clauses (long ones into ~2000-character pieces),
+    each piece is scored with the local risk-phrase rules, and pieces
+    scoring at least RISK_THRESHOLD are kept. Kept pieces that nearly
+    duplicate a clause analyzed before are served from the clause index
+    (see reuse_similar()); runs of the others are packed into chunks for
+    the model, several runs per chunk as the budget allows.
+
+    Returns:
+        (spans, pieces, reused, kept, total) - chunk spans, {span: pieces}
+        for packed chunks (see packed_spans()), {span: result} for the runs
+        of segments served from the clause index, plus kept/total segment
+        counts
+    """
+    segments = clause_segments(text_content)
+    keep = [i for i, (start, end) in enumerate(segments) if risk_rules.score_span(matches, start, end) >= RISK_THRESHOLD]
+    remaining, reused_segments = reuse_similar(text_content, segments, keep)
+    regions = clause_runs(segments, remaining)
+    budget = chunk_budget(sum(estimate_tokens(text_content[start:end]) for start, end in regions))
+    spans, pieces = packed_spans(chunk_regions(text_content, regions, max_tokens=budget))
+    
+    # Adjacent served segments (segments tile the text) become one span
+    reused = {}
+    run = None
+    for i in sorted(reused_segments):
+        start, end = segments[i]
+        if run is not None and run[1] == start:
+            result = reused.pop(run)
+            run = (run[0], end)
+        else:
+            result, run = {"analysis": []}, (start, end)
+        result["analysis"].extend(reused_segments[i])
+        reused[run] = result
+    return spans, pieces, reused, len(keep), len(segments)
+
+def chunk_budget(text_tokens, workers=MAX_WORKERS):
+    """Chunk size for `text_tokens` of contract text (see chunker.token_budget)."""
+    return token_budget(MODEL, text_tokens, MAX_OUTPUT_TOKENS, OUTPUT_RATIO, workers)
+
+def plan_spans(text_content, matches):
+    """
+    Split into clause-aligned chunks sized for the model's token budget,
+    leaving out segments the local pre-filter considers benign and serving
+    near-duplicates of clauses analyzed before from the clause index.
+
+    Args:
+        text_content: The full text of the contract.
+        matches: risk_rules.scan() of the text (unused when RISK_THRESHOLD is 0).
+
+    Returns:
+        (spans, pieces, reused) - every chunk span in document order,
+        {span: pieces} for chunks packed from separate parts of the text
+        (see packed_spans()) and {span: result} for the spans served from
+        the clause index
+    """
+    with telemetry.span("chunk", chars=len(text_content)):
+        if RISK_THRESHOLD > 0 or shared_index() is not None:
+            spans, pieces, reused, kept, total = prefilter_spans(text_content, matches)
+            if RISK_THRESHOLD > 0:
+                sys.stderr.write(f"Risk pre-filter kept {kept}/{total} segment(s)\n")
+            spans = sorted(spans + list(reused))
+        else:
+            spans, pieces, reused = chunk_spans(text_content, chunk_budget(estimate_tokens(text_content))), {}, {}
+    sys.stderr.write(f"Split into {len(spans)} chunk(s)\n")
+    return spans, pieces, reused
+
+def anchor_in_chunk(index, item, near, taken):
+    """
+    Anchor a finding inside the chunk it was reported for. A quote found at
+    several places (the same sentence in two clauses) goes to the best one
+    no other finding of the chunk has taken; a repeated finding falls back
+    to its taken place, where the deduper drops it.
+    """
+    if index.anchor(item, near=near, taken=taken):
+        return True
+    return index.anchor(item, near=near)
+
+def chunk_event(result, chunk_num, spans, index, deduper, pieces=None):
+    """
+    Turn one chunk's result into a run_iter() "chunk" or "error" event,
+    anchoring its findings with `index` (inside the chunk's pieces for a
+    packed chunk) and dropping those `deduper` has already seen.
+    """
+    total_chunks = len(spans)
+    if "error" in result:
+        return {"event": "error", "chunk": chunk_num, "total_chunks": total_chunks, "error": result["error"]}
+    
+    items = result["analysis"] if isinstance(result.get("analysis"), list) else []
+    items = [item for item in items if isinstance(item, dict)]
+    with telemetry.span("merge", chunk=chunk_num):
+        span = spans[chunk_num - 1]
+        near = pieces.get(span, span) if pieces else span
+        taken = set()
+        for item in items:
+            anchor_in_chunk(index, item, near, taken)
+        new_items = dedup_findings(items, deduper)
+    return {"event": "chunk", "chunk": chunk_num, "total_chunks": total_chunks, "analysis": new_items}
+
+def run_iter(text_content, page_starts=None, rules_only=None):
+    """
+    Streaming version of run(): yields findings as each chunk completes.
+
+    Segments without risk vocabulary are skipped by the local pre-filter.
+    With `rules_only` (default: ANALYSIS_MODE == "rules-only") findings come
+    from the risk-phrase rules alone and no API call is made.
+
+    Every finding is anchored to the source: "start"/"end" character offsets
+    of the quoted clause in text_content, plus "page" when `page_starts`
+    (sorted offsets where each page begins) is given.
+
+    Yields dictionaries with an "event" key:
+        {"event": "start", "total_chunks": n}
+        {"event": "chunk", "chunk": i, "total_chunks": n, "analysis": [...]}
+            (only findings not already yielded by an earlier chunk)
+        {"event": "error", "chunk": i, "total_chunks": n, "error": "..."}
+        {"event": "done", "total_findings": k, "warnings": [...]}
+    or a single {"event": "error", "error": "..."} for invalid input.
+    """
+    if not text_content or not text_content.strip():
+        yield {"event": "error", "error": "Input text is empty or contains only whitespace."}
+        return
+    
+    sys.stderr.write(f"Processing contract with {len(text_content)} characters\n")
+    
+    if rules_only is None:
+        rules_only = ANALYSIS_MODE == "rules-only"
+    matches = risk_rules.scan(text_content) if rules_only or RISK_THRESHOLD > 0 else []
+    
+    if rules_only:
+        items = dedup_findings(risk_rules.rule_findings(text_content, matches))
+        for item in items:
+            page = page_of(page_starts, item["start"])
+            if page is not None:
+                item["page"] = page
+        sys.stderr.write(f"Rules-only analysis: {len(items)} risk item(s)\n")
+        yield {"event": "start", "total_chunks": 1}
+        yield {"event": "chunk", "chunk": 1, "total_chunks": 1, "analysis": items}
+        yield {"event": "done", "total_findings": len(items), "warnings": []}
+        return
+    
+    spans, pieces, reused = plan_spans(text_content, matches)
+    yield {"event": "start", "total_chunks": len(spans)}
+    
+    index = AnchorIndex(text_content, page_starts)
+    deduper = SpanDeduper()
+    total_findings = 0
+    errors = []
+    
+    for chunk_num, result in iter_spans(text_content, spans, reuse_or_analyze(spans, reused), pieces):
+        event = chunk_event(result, chunk_num, spans, index, deduper, pieces)
+        if event["event"] == "error":
+            errors.append(f"Chunk {chunk_num}: {result['error']}")
+        else:
+            total_findings += len(event["analysis"])
+        yield event
+    
+    sys.stderr.write(f"Total unique risk items found: {total_findings}\n")
+    yield {"event": "done", "total_findings": total_findings, "warnings": errors}
+
+def run(text_content, page_starts=None, rules_only=None):
     """
     Analyzes the contract text using the OpenRouter API with Llama.
     Automatically chunks large contracts and combines results.
 
     Args:
         text_content:  The full text of the contract. 
+        page_starts: Optional character offsets where each page begins,
+            used to add a "page" to every finding.
+        rules_only: Use only the local risk-phrase rules (no API calls).
 
     Returns:
         A dictionary containing the structured analysis or an error. 
     """
+    return collect(run_iter(text_content, page_starts, rules_only))
+
+def collect(events):
+    """
+    Build run()'s result from run_iter() events: the findings of every
+    chunk in document order, plus warnings for chunks that failed.
+    """
+    findings_by_chunk = {}
+    errors = []
+    
+    for event in events:
+        if event["event"] == "chunk":
+            findings_by_chunk[event["chunk"]] = event["analysis"]
+        elif event["event"] == "error":
+            if "chunk" not in event:
+                return {"error": event["error"]}
+            errors.append(f"Chunk {event['chunk']}: {event['error']}")
+    
+    # Document order: by chunk, then by position inside the chunk
+    unique_analyses = [
+        item
+        for n in sorted(findings_by_chunk)
+        for item in sorted(findings_by_chunk[n], key=lambda item: item.get("start", 0))
+    ]
+    
+    # If all chunks failed, return error
+    if errors and not unique_analyses:
+        return {"error": f"Analysis failed: {'; '.join(errors)}"}
+    
+    # Include warnings if some chunks failed
+    result = {"analysis": unique_analyses}
+    if errors:
+        result["warnings"] = errors
+    
+    return result
+
+async def arun(text_content, page_starts=None, rules_only=None, tenant=None,
+               priority="interactive", scheduler=None, weight=1.0):
+    """
+    Asyncio version of run(). The chunks are queued on the fair scheduler
+    (see scheduler.py), so many documents of many tenants can be analyzed
+    concurrently from one event loop without a long document holding all
+    request slots.
+
+    Args:
+        text_content, page_starts, rules_only: As for run().
+        tenant: Tenant the requests are billed to (default: DEFAULT_TENANT).
+        priority: "interactive" or "batch".
+        scheduler: Scheduler to use (default: shared_scheduler()).
+        weight: Share of this document among the tenant's documents in
+            flight (see Scheduler.submit()).
+
+    Returns:
+        The same dictionary as run().
+    """
+    if rules_only is None:
+        rules_only = ANALYSIS_MODE == "rules-only"
+    if rules_only or not text_content or not text_content.strip():
+        # No API calls to schedule
+        return run(text_content, page_starts, rules_only)
+    
+    sys.stderr.write(f"Processing contract with {len(text_content)} characters\n")
+    matches = risk_rules.scan(text_content) if RISK_THRESHOLD > 0 else []
+    spans, pieces, reused = plan_spans(text_content, matches)
+    
+    # asyncio is only imported by callers of the async API
+    import asyncio
+    try:
+        from .scheduler import DEFAULT_TENANT, shared_scheduler
+    except ImportError:
+        from scheduler import DEFAULT_TENANT, shared_scheduler
+    
+    scheduler = scheduler or shared_scheduler()
+    request_id = uuid.uuid4().hex
+    total_chunks = len(spans)
+    # Spans served from the clause index take no request slot
+    pending = [(n, span, span_text(text_content, span, pieces)) for n, span in enumerate(spans, 1) if span not in reused]
+    answers = await asyncio.gather(*(
+        scheduler.submit(analyze_chunk, chunk, n, total_chunks,
+                         tenant=tenant or DEFAULT_TENANT, request_id=request_id, priority=priority,
+                         cost=estimate_tokens(len(chunk)), weight=weight)
+        for n, _, chunk in pending
+    ))
+    results = dict(reused)
+    results.update((span, answer) for (_, span, _), answer in zip(pending, answers))
+    
+    index = AnchorIndex(text_content, page_starts)
+    deduper = SpanDeduper()
+    return collect([chunk_event(results[span], n, spans, index, deduper, pieces) for n, span in enumerate(spans, 1)])
+
+def run_revision(text_content, document_id, page_starts=None):
+    """
+    Analyzes a new version of a previously analyzed contract.
+
+    Every clause is fingerprinted and compared with the clauses stored for
+    `document_id`. Findings of unchanged clauses are reused (re-anchored to
+    the new text); only inserted or modified clauses are sent to the model.
+    The first call for a document analyzes everything.
+
+    Args:
+        text_content: The full text of the new contract version.
+        document_id: Identifier shared by all versions of the contract.
+        page_starts: Optional character offsets where each page begins.
+
+    Returns:
+        A dictionary like run(), plus a "revision" summary.
+    """
     if not text_content or not text_content.strip():
         return {"error": "Input text is empty or contains only whitespace."}
     
-    sys.stderr.write(f"Processing contract with {len(text_content)} characters\n")
+    store = shared_store()
+    previous = store.load(document_id)
     
-    # Split into chunks if text is large
-    chunks = chunk_text(text_content, chunk_size=15000, overlap=500)
-    total_chunks = len(chunks)
+    clauses = segment_clauses(text_content)
+    fingerprints = [fingerprint(text_content[start:end]) for start, end in clauses]
     
-    sys.stderr.write(f"Split into {total_chunks} chunk(s)\n")
+    matches = risk_rules.scan(text_content) if RISK_THRESHOLD > 0 else []
     
-    # Analyze each chunk
-    all_analyses = []
-    errors = []
+    # Findings per clause fingerprint for this version
+    current = {}
+    changed = []
+    for i, ((start, end), clause_fp) in enumerate(zip(clauses, fingerprints)):
+        if clause_fp not in previous:
+            if RISK_THRESHOLD > 0 and risk_rules.score_span(matches, start, end) < RISK_THRESHOLD:
+                # New but benign according to the local pre-filter
+                current[clause_fp] = []
+            else:
+                changed.append(i)
+            continue
+        reanchored = []
+        for item in previous[clause_fp]:
+            found = locate(text_content, item.get("clause_text", ""), start, end)
+            if found:
+                item = dict(item, clause_text=text_content[found[0]:found[1]])
+            reanchored.append(item)
+        current[clause_fp] = reanchored
     
-    for i, chunk in enumerate(chunks, 1):
-        result = analyze_chunk(chunk, i, total_chunks)
-        
+    sys.stderr.write(f"Revision of '{document_id}': {len(changed)} clause(s) of {len(clauses)} need analysis\n")
+    
+    # Group runs of adjacent changed clauses, then pack the runs into chunks
+    with telemetry.span("chunk", chars=len(text_content)):
+        regions = clause_runs(clauses, changed)
+        budget = chunk_budget(sum(estimate_tokens(text_content[start:end]) for start, end in regions))
+        chunks = chunk_regions(text_content, regions, max_tokens=budget)
+        spans, pieces = packed_spans(chunks)
+    
+    results = analyze_spans(text_content, spans, pieces) if spans else []
+    
+    clause_starts = [start for start, _ in clauses]
+    anchors = AnchorIndex(text_content)
+    errors = []
+    for n, (parts, result) in enumerate(zip(chunks, results), 1):
         if "error" in result:
-            errors.append(f"Chunk {i}: {result['error']}")
-            # Continue processing other chunks even if one fails
+            # Leave these clauses out of the store so the next version retries them
+            errors.append(f"Chunk {n}: {result['error']}")
             continue
         
-        if "analysis" in result and isinstance(result["analysis"], list):
-            all_analyses.extend(result["analysis"])
+        first = bisect_right(clause_starts, parts[0][0]) - 1
+        for part_start, part_end in parts:
+            for i in range(bisect_right(clause_starts, part_start) - 1, bisect_left(clause_starts, part_end)):
+                current.setdefault(fingerprints[i], [])
+        
+        # Like chunk_event(): a sentence quoted twice belongs to two clauses
+        taken = set()
+        for item in result.get("analysis", []) if isinstance(result.get("analysis"), list) else []:
+            found = anchors.locate(item.get("clause_text", ""), near=parts, taken=taken) \
+                or anchors.locate(item.get("clause_text", ""), near=parts)
+            if found is not None:
+                taken.add(found)
+            owner = bisect_right(clause_starts, found[0]) - 1 if found else first
+            current[fingerprints[owner]].append(item)
     
-    # If all chunks failed, return error
-    if errors and not all_analyses:
+    if errors and not current:
         return {"error": f"Analysis failed: {'; '.join(errors)}"}
     
-    # Remove duplicate risk items (might occur at chunk boundaries)
-    unique_analyses = []
-    seen_clauses = set()
+    store.save(document_id, current)
     
-    for item in all_analyses:
-        # Use first 100 chars of clause text as identifier
-        clause_id = item.get("clause_text", "")[:100].strip()
-        if clause_id and clause_id not in seen_clauses:
-            seen_clauses.add(clause_id)
-            unique_analyses.append(item)
+    # Emit findings in document order, each with the clause it belongs to
+    owned = []
+    emitted = set()
+    for (start, end), clause_fp in zip(clauses, fingerprints):
+        if clause_fp in current and clause_fp not in emitted:
+            emitted.add(clause_fp)
+            owned.extend(((start, end), item) for item in current[clause_fp])
+    # Anchor copies: the stored findings must not carry offsets of this version.
+    # Each is searched in its own clause first, so a sentence shared by two
+    # clauses keeps both findings
+    with telemetry.span("merge"):
+        index = AnchorIndex(text_content, page_starts)
+        all_analyses = []
+        taken = set()
+        for span, item in owned:
+            item = dict(item)
+            if not anchor_in_chunk(index, item, span, taken):
+                index.anchor(item)
+            all_analyses.append(item)
+        unique_analyses = dedup_findings(all_analyses)
     
     sys.stderr.write(f"Total unique risk items found: {len(unique_analyses)}\n")
     
-    # Include warnings if some chunks failed
-    result = {"analysis": unique_analyses}
+    result = {
+        "analysis": unique_analyses,
+        "revision": {
+            "clauses": len(clauses),
+            "reused": sum(1 for clause_fp in fingerprints if clause_fp in previous),
+            "analyzed": len(changed),
+            "chunks": len(spans)
+        }
+    }
     if errors:
         result["warnings"] = errors
     
     return result
 
 # Main execution block - reads from stdin and outputs to stdout
+# (pass --ndjson to stream per-chunk events instead of one final object,
+# --rules-only to analyze with the local risk rules and no API calls)
 if __name__ == "__main__":
     try:
         # Read JSON input from stdin
@@ -226,16 +732,28 @@ if __name__ == "__main__":
             print(json.dumps({"error": "No input provided"}))
             sys.exit(1)
         
-        # Parse the JSON input
+        # Parse the JSON input; only the parsed text is kept from here on
         parsed_input = json.loads(input_data)
+        del input_data
         contract_text = parsed_input.get("text", "")
         
         if not contract_text:
             print(json.dumps({"error": "No text field in input"}))
             sys.exit(1)
         
-        # Run the analysis
-        result = run(contract_text)
+        # Optional page map (offsets where each page begins) for "page" fields
+        page_starts = parsed_input.get("page_starts")
+        rules_only = True if "--rules-only" in sys.argv[1:] else None
+        
+        # NDJSON mode: one JSON event per line as each chunk completes
+        if "--ndjson" in sys.argv[1:]:
+            for event in run_iter(contract_text, page_starts, rules_only):
+                print(json.dumps(event), flush=True)
+            sys.exit(0)
+
+        # Run the analysis (incrementally when the caller names the document)
+        document_id = parsed_input.get("document_id")
+        result = run_revision(contract_text, document_id, page_starts) if document_id else run(contract_text, page_starts, rules_only)
         
         # Output the result as JSON to stdout
         print(json.dumps(result))
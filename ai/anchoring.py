@@ -0,0 +1,220 @@
+import re
+from bisect import bisect_left, bisect_right
+
+WORD = re.compile(r"\w+")
+
+# Words per anchor n-gram. Four words are rare enough in a contract to be
+# nearly unique, yet short enough to survive a paraphrased clause opening.
+GRAM_SIZE = 4
+
+# At most this many n-grams of a clause are looked up
+MAX_PROBES = 32
+
+# Chunk indexes kept for repeated lookups in the same chunk
+MAX_REGIONS = 4
+
+# How far (in words) votes for the same clause start may drift when the
+# model dropped or inserted a word
+DRIFT = 3
+
+
+def page_of(page_starts, offset):
+    """1-based page containing `offset`, or None without page data."""
+    if not page_starts:
+        return None
+    return max(1, bisect_right(page_starts, offset))
+
+
+class _GramIndex:
+    """Word n-grams of text[start:end] for each range, with the words' absolute offsets."""
+
+    def __init__(self, text, ranges):
+        self.word_starts = []
+        self.word_ends = []
+        self.grams = {}
+
+        words = []
+        for start, end in ranges:
+            first = len(words)
+            for match in WORD.finditer(text, start, end):
+                self.word_starts.append(match.start())
+                self.word_ends.append(match.end())
+                words.append(match.group().lower())
+            # No n-gram spans two ranges
+            for i in range(first, len(words) - GRAM_SIZE + 1):
+                self.grams.setdefault(tuple(words[i:i + GRAM_SIZE]), []).append(i)
+
+
+class AnchorIndex:
+    """
+    Word n-gram index over a document, used to map text quoted by the model
+    back to character offsets (and pages) of the source.
+
+    Indexes are built lazily, in a single pass over the part of the
+    document being searched: the chunk a finding was reported for (`near`)
+    or, without one, the whole document. The text itself is never copied,
+    so anchoring the findings of a multi-megabyte contract chunk by chunk
+    only needs memory for one chunk's index at a time. Each lookup costs
+    O(words in the quoted clause), independent of document size.
+
+    Args:
+        text: The document text.
+        page_starts: Optional sorted character offsets where each page
+            begins (page 1 first). Enables the "page" field of anchors.
+    """
+
+    def __init__(self, text, page_starts=None):
+        self.text = text
+        self.page_starts = list(page_starts) if page_starts else None
+        self._regions = {}  # ranges -> _GramIndex, oldest first
+
+    def _ranges(self, near):
+        """`near` as a tuple of (start, end) ranges clamped to the text."""
+        if near is None:
+            return ((0, len(self.text)),)
+        if isinstance(near[0], int):
+            near = (near,)
+        return tuple((max(0, start), min(len(self.text), end)) for start, end in near)
+
+    def _index(self, near):
+        bounds = self._ranges(near)
+        index = self._regions.get(bounds)
+        if index is None:
+            index = self._regions[bounds] = _GramIndex(self.text, bounds)
+            while len(self._regions) > MAX_REGIONS:
+                del self._regions[next(iter(self._regions))]
+        return index
+
+    def page_of(self, offset):
+        """1-based page containing `offset`, or None without page data."""
+        return page_of(self.page_starts, offset)
+
+    def locate(self, clause_text, near=None, taken=None):
+        """
+        Find where `clause_text` occurs in the document.
+
+        Args:
+            clause_text: Text quoted by the model (may be slightly altered).
+            near: Optional (start, end) range, or list of ranges, to search
+                instead of the whole document: the chunk (or the pieces of a
+                packed chunk) the clause was reported for.
+            taken: Optional spans already given to other findings. A text
+                occurring several times (the same sentence in two clauses)
+                is then located at its best match not in `taken`, and None
+                is returned if every match is taken.
+
+        Returns:
+            (start, end) character offsets, or None if it can't be anchored.
+        """
+        words = [w.lower() for w in WORD.findall(clause_text)]
+        if len(words) < GRAM_SIZE:
+            return self._locate_short(clause_text, near, taken)
+        index = self._index(near)
+
+        positions = range(len(words) - GRAM_SIZE + 1)
+        step = max(1, len(positions) // MAX_PROBES)
+
+        # Every matching n-gram votes for a clause start position
+        votes = {}
+        for offset in positions[::step]:
+            for doc_pos in index.grams.get(tuple(words[offset:offset + GRAM_SIZE]), ()):
+                votes.setdefault(doc_pos - offset, []).append(doc_pos)
+        if not votes:
+            return None
+
+        def support(candidate):
+            return sum(len(votes.get(candidate + d, ())) for d in range(-DRIFT, DRIFT + 1))
+
+        def span_of(candidate):
+            matched = [p for d in range(-DRIFT, DRIFT + 1) for p in votes.get(candidate + d, ())]
+            return index.word_starts[min(matched)], index.word_ends[max(matched) + GRAM_SIZE - 1]
+
+        best = max(votes, key=support)
+        if not taken:
+            return span_of(best)
+        # Other copies of the text match about as well as the best one
+        top = support(best)
+        for candidate in sorted(votes, key=lambda c: (-support(c), c)):
+            if support(candidate) * 2 < top:
+                break
+            span = span_of(candidate)
+            if span not in taken:
+                return span
+        return None
+
+    def _locate_short(self, clause_text, near, taken=None):
+        needle = clause_text.strip()
+        if not needle:
+            return None
+        # Case-insensitive search without a lowercased copy of the document
+        pattern = re.compile(re.escape(needle), re.IGNORECASE)
+        for start, end in self._ranges(near):
+            for found in pattern.finditer(self.text, start, end):
+                if not taken or found.span() not in taken:
+                    return found.span()
+        return None
+
+    def anchor(self, item, near=None, taken=None):
+        """
+        Add "start", "end" (and "page") to a finding in place.
+
+        Args:
+            near, taken: As for locate(). The span found is added to
+                `taken`.
+
+        Returns:
+            True if the finding could be anchored.
+        """
+        span = self.locate(item.get("clause_text", ""), near, taken)
+        if span is None:
+            return False
+        item["start"], item["end"] = span
+        if taken is not None:
+            taken.add(span)
+        page = self.page_of(span[0])
+        if page is not None:
+            item["page"] = page
+        return True
+
+
+class SpanDeduper:
+    """
+    Incremental duplicate filter for findings.
+
+    Anchored findings are duplicates when their spans overlap by at least
+    `min_overlap` of the shorter span; findings without offsets fall back to
+    comparing the first 100 characters of their clause text. Each check is
+    O(log n + overlapping spans).
+    """
+
+    def __init__(self, min_overlap=0.5):
+        self.min_overlap = min_overlap
+        self._starts = []
+        self._spans = []
+        self._max_length = 0
+        self._clause_ids = set()
+
+    def add(self, item):
+        """Record `item`; returns False if it duplicates an earlier one."""
+        start, end = item.get("start"), item.get("end")
+        if start is None or end is None:
+            clause_id = item.get("clause_text", "")[:100].strip()
+            if not clause_id or clause_id in self._clause_ids:
+                return False
+            self._clause_ids.add(clause_id)
+            return True
+
+        # Only spans starting after start - max_length can overlap this one
+        lo = bisect_left(self._starts, start - self._max_length)
+        hi = bisect_left(self._starts, end)
+        for other_start, other_end in self._spans[lo:hi]:
+            overlap = min(end, other_end) - max(start, other_start)
+            shorter = min(end - start, other_end - other_start) or 1
+            if overlap > 0 and overlap / shorter >= self.min_overlap:
+                return False
+
+        index = bisect_left(self._starts, start)
+        self._starts.insert(index, start)
+        self._spans.insert(index, (start, end))
+        self._max_length = max(self._max_length, end - start)
+        return True
@@ -0,0 +1,285 @@
+"""
+Chat completion backends.
+
+A backend sends one chat completion request and returns the streamed
+response; completions.request_json() does everything around it (retries,
+circuit breakers, fallback models, hedging, parsing). The pipeline modules
+never see URLs or headers:
+
+  - OpenRouterBackend: the hosted OpenRouter API (the default). Keep-alive
+    connection pool, API key from OPENROUTER_API_KEY, optionally
+    gzip-compressed request bodies (LLM_COMPRESS_REQUESTS).
+  - OpenAICompatibleBackend: any server speaking the OpenAI chat
+    completions protocol, e.g. a local vLLM / llama.cpp / Ollama server on
+    the same host, which takes WAN latency out of every chunk.
+  - StubBackend: deterministic canned answers produced in-process (see
+    mock_openrouter.canned_content), for load tests without a network.
+
+The process-wide backend is chosen with LLM_BACKEND ("openrouter",
+"openai" or "stub"); see shared_backend().
+"""
+import gzip
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+try:
+    from .config import api_key
+except ImportError:
+    from config import api_key
+
+# --- Configuration ---
+BACKEND = os.getenv("LLM_BACKEND", "openrouter")
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+# Model of every pipeline stage; local servers name their models differently
+DEFAULT_MODEL = os.getenv("LLM_MODEL", "meta-llama/llama-3.3-70b-instruct:free")
+# DEFAULT_MODEL = "tngtech/deepseek-r1t2-chimera:free"
+
+# OpenAI-compatible server: base URL (".../v1" or the full
+# ".../chat/completions" endpoint) and optional API key
+BASE_URL = os.getenv("LLM_BASE_URL", "http://127.0.0.1:8000/v1")
+BASE_API_KEY = os.getenv("LLM_API_KEY", "")
+
+# Connections kept open per backend: enough for every worker thread plus
+# hedged duplicates
+POOL_SIZE = max(int(os.getenv("OPENROUTER_MAX_WORKERS", "4")), 10)
+
+# With LLM_COMPRESS_REQUESTS=1, request bodies of at least COMPRESS_MIN_BYTES
+# are sent gzip-compressed (OpenRouter only); prompts are plain text and
+# shrink about 3x. Off by default: not every endpoint reads compressed bodies
+COMPRESS = os.getenv("LLM_COMPRESS_REQUESTS", "0").lower() in ("1", "true", "yes")
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_LEVEL = 6
+# A 400 answer whose body matches this is about the compressed body, not the request
+ENCODING_ERROR = re.compile(r"gzip|compress|content[- ]encoding|decod", re.IGNORECASE)
+
+
+class Backend:
+    """
+    Sends chat completion requests.
+
+    send() returns a streamed, requests-like response: status_code,
+    headers, iter_lines(), json() and use as a context manager (see
+    llm_stream.iter_content). Transport failures raise
+    requests.exceptions.RequestException.
+    """
+
+    name = "backend"
+
+    def send(self, payload, timeout):
+        """
+        Send one request.
+
+        Args:
+            payload: Chat completion body, including "model" and "stream".
+            timeout: (connect, read) timeouts in seconds.
+        """
+        raise NotImplementedError
+
+    def describe(self):
+        """Name and endpoint, for logs and worker stats."""
+        return {"backend": self.name}
+
+
+class OpenAICompatibleBackend(Backend):
+    """
+    Server speaking the OpenAI chat completions protocol, over one
+    keep-alive connection pool shared by all threads, so chunks and
+    repeated jobs in a long-lived worker reuse their TCP/TLS connections.
+
+    Args:
+        url: Chat completions endpoint, or a base URL ending in "/v1".
+        api_key: Bearer token, or a function returning it; None sends no
+            Authorization header.
+        headers: Extra request headers.
+        compress: Send bodies of COMPRESS_MIN_BYTES or more gzip-compressed.
+            A server that rejects them (HTTP 415, or 400 naming the
+            encoding) gets the request again uncompressed, and no
+            compressed bodies afterwards.
+        pool_size: Connections kept open.
+    """
+
+    name = "openai"
+
+    def __init__(self, url=BASE_URL, api_key=None, headers=None, compress=False, pool_size=POOL_SIZE):
+        url = url.rstrip("/")
+        self.url = url if url.endswith("/chat/completions") else url + "/chat/completions"
+        self.api_key = api_key
+        self.headers = dict(headers or {})
+        self.compress = compress
+        self.pool_size = pool_size
+        self._session = None
+        self._lock = threading.Lock()
+
+    def session(self):
+        """
+        The backend's requests.Session, created on first use. requests is
+        imported here to keep it out of the start-up path.
+        """
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def request_headers(self):
+        headers = {"Content-Type": "application/json", **self.headers}
+        key = self.api_key() if callable(self.api_key) else self.api_key
+        if key:
+            headers["Authorization"] = f"Bearer {key}"
+        return headers
+
+    def send(self, payload, timeout):
+        body = json.dumps(payload).encode("utf-8")
+        headers = self.request_headers()
+        compressed = self.compress and len(body) >= COMPRESS_MIN_BYTES
+        if compressed:
+            headers["Content-Encoding"] = "gzip"
+            data = gzip.compress(body, COMPRESS_LEVEL)
+        else:
+            data = body
+        response = self.session().post(self.url, data=data, headers=headers, stream=True, timeout=timeout)
+        if compressed and self._rejects_encoding(response):
+            # The server can't read compressed bodies: stop compressing
+            response.close()
+            self.compress = False
+            sys.stderr.write(f"{self.name}: HTTP {response.status_code} for a compressed request body; "
+                             "sending uncompressed bodies from now on\n")
+            del headers["Content-Encoding"]
+            response = self.session().post(self.url, data=body, headers=headers, stream=True, timeout=timeout)
+        return response
+
+    @staticmethod
+    def _rejects_encoding(response):
+        """Did the server refuse the request for its Content-Encoding?"""
+        if response.status_code == 415:
+            return True
+        # Error bodies are short; reading one leaves it cached for the caller
+        return response.status_code == 400 and bool(ENCODING_ERROR.search(response.text or ""))
+
+    def describe(self):
+        return {"backend": self.name, "url": self.url, "compress": self.compress}
+
+
+class OpenRouterBackend(OpenAICompatibleBackend):
+    """The OpenRouter API, authenticated with OPENROUTER_API_KEY (read on first request)."""
+
+    name = "openrouter"
+
+    def __init__(self, url=OPENROUTER_URL, compress=COMPRESS, pool_size=POOL_SIZE):
+        super().__init__(url, api_key=api_key, compress=compress, pool_size=pool_size)
+
+
+class StubResponse:
+    """In-memory stand-in for a streamed requests.Response."""
+
+    def __init__(self, status_code=200, headers=None, lines=(), body=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.encoding = None
+        self._lines = lines
+        self._body = body
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self._lines)
+
+    def json(self):
+        return self._body
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class StubBackend(Backend):
+    """
+    Deterministic in-process backend: answers every prompt with the canned
+    JSON of mock_openrouter.canned_content(), streamed as server-sent
+    events, without sockets or threads.
+
+    Args:
+        latency: Seconds to wait before answering each request.
+        canned: Optional {prompt substring: response content} overrides.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=0.0, canned=None):
+        self.latency = latency
+        self.canned = canned
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def send(self, payload, timeout):
+        try:
+            from .mock_openrouter import canned_content, stream_events
+        except ImportError:
+            from mock_openrouter import canned_content, stream_events
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        prompt = payload.get("messages", [{}])[-1].get("content", "")
+        content = canned_content(prompt, self.canned)
+        if not payload.get("stream"):
+            return StubResponse(headers={"Content-Type": "application/json"},
+                                body={"choices": [{"message": {"content": content}}]})
+        lines = [line for event in stream_events(prompt, content) for line in event.decode("utf-8").split("\n")]
+        return StubResponse(headers={"Content-Type": "text/event-stream"}, lines=lines)
+
+    def describe(self):
+        return {"backend": self.name, "requests": self.requests}
+
+
+def create_backend(name=BACKEND):
+    """
+    Backend for a LLM_BACKEND value.
+
+    Raises:
+        ValueError: Unknown backend name.
+    """
+    if name == "openrouter":
+        return OpenRouterBackend()
+    if name == "openai":
+        return OpenAICompatibleBackend(BASE_URL, api_key=BASE_API_KEY or None)
+    if name == "stub":
+        return StubBackend(latency=float(os.getenv("LLM_STUB_LATENCY", "0")))
+    raise ValueError(f"Unknown LLM_BACKEND: {name}")
+
+
+_shared_backend = None
+_shared_lock = threading.Lock()
+
+
+def shared_backend():
+    """
+    Process-wide backend configured from the environment: LLM_BACKEND,
+    plus LLM_BASE_URL / LLM_API_KEY for "openai" and LLM_STUB_LATENCY
+    for "stub".
+    """
+    global _shared_backend
+    with _shared_lock:
+        if _shared_backend is None:
+            _shared_backend = create_backend()
+        return _shared_backend
+
+
+def configure_shared_backend(backend):
+    """Replace the process-wide backend, e.g. with a stub for a load test."""
+    global _shared_backend
+    with _shared_lock:
+        _shared_backend = backend
@@ -0,0 +1,205 @@
+"""
+Batch analysis of many contracts.
+
+Usage:
+    python batch.py contracts/ -o results.jsonl
+    python batch.py manifest.jsonl -o results.jsonl --workers 8
+
+INPUT is either a directory (every file below it with a format extraction.py
+reads: .pdf, .docx, .txt, .md, .html, images) or a JSONL manifest whose lines look like one of:
+    {"id": "acme-tos", "path": "contracts/acme.pdf"}
+    {"id": "globex-tos", "url": "https://globex.example/terms"}
+    {"id": "inline-1", "text": "..."}
+
+Each finished document is appended to the output as one JSON line. The ids
+of documents analyzed without an error are recorded in a checkpoint file,
+so re-running the same command after a crash, or after transient model or
+network errors, processes what is left plus the documents that failed.
+A document that succeeds on a re-run gets a new line after its error line.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Run as a script: read .env before the settings below are evaluated
+if __name__ == "__main__":
+    try:
+        from .config import load_env
+    except ImportError:
+        from config import load_env
+    load_env()
+
+try:
+    from . import analyzer, extraction, text_extractor
+    from .rate_limiter import configure_shared_limiter
+except ImportError:
+    import analyzer
+    import extraction
+    import text_extractor
+    from rate_limiter import configure_shared_limiter
+
+
+def discover(source):
+    """
+    List the documents to process.
+
+    Returns:
+        List of dicts with an "id" and one of "path", "url" or "text".
+    """
+    if os.path.isdir(source):
+        documents = []
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in extraction.EXTENSIONS:
+                    path = os.path.join(root, name)
+                    documents.append({"id": os.path.relpath(path, source), "path": path})
+        return sorted(documents, key=lambda d: d["id"])
+
+    documents = []
+    with open(source, encoding="utf-8") as manifest:
+        for line_no, line in enumerate(manifest, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if not any(key in entry for key in ("path", "url", "text")):
+                raise ValueError(f"Manifest line {line_no}: needs 'path', 'url' or 'text'")
+            entry.setdefault("id", entry.get("path") or entry.get("url") or f"line-{line_no}")
+            documents.append(entry)
+    return documents
+
+
+def extract(document):
+    """
+    Get the text of one manifest entry. Files go through
+    extraction.extract(), like uploads.
+
+    Returns:
+        (text, page_starts); text is None if extraction failed, and
+        page_starts is None for inline text and URLs.
+    """
+    if "text" in document:
+        return document["text"], None
+    if "url" in document:
+        return text_extractor.from_url(document["url"]), None
+
+    extracted = extraction.extract(document["path"], document.get("mime_type"))
+    if "error" in extracted:
+        sys.stderr.write(f"Batch: {document['id']}: {extracted['error']}\n")
+        return None, None
+    return extracted["text"], extracted["page_starts"]
+
+
+def load_checkpoint(path):
+    """Ids of documents a previous run analyzed without an error."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as checkpoint:
+        return {line.rstrip("\n") for line in checkpoint if line.strip()}
+
+
+def process(document):
+    """Extract and analyze one document. Never raises."""
+    started = time.monotonic()
+    record = {"id": document["id"]}
+    try:
+        text, page_starts = extract(document)
+        if not text or not text.strip():
+            record["error"] = "No text could be extracted"
+        else:
+            record["characters"] = len(text)
+            result = analyzer.run(text, page_starts=page_starts)
+            record.update(result)
+    except Exception as e:
+        record["error"] = f"Unexpected error: {str(e)}"
+    record["elapsed"] = round(time.monotonic() - started, 3)
+    return record
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_batch(source, output, checkpoint=None, workers=4):
+    """
+    Analyze every document in `source`, appending results to `output`.
+
+    Returns:
+        Summary dictionary (counts, throughput and latency percentiles).
+    """
+    checkpoint = checkpoint or output + ".checkpoint"
+    documents = discover(source)
+    finished = load_checkpoint(checkpoint)
+    pending = [d for d in documents if d["id"] not in finished]
+
+    sys.stderr.write(f"Batch: {len(documents)} document(s), {len(documents) - len(pending)} already done, "
+                     f"{len(pending)} to process with {workers} worker(s)\n")
+
+    lock = threading.Lock()
+    latencies = []
+    characters = 0
+    failed = 0
+    started = time.monotonic()
+
+    with open(output, "a", encoding="utf-8") as out, open(checkpoint, "a", encoding="utf-8") as ckpt, \
+            ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(process, document) for document in pending]
+        for done, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            with lock:
+                # Result first, then checkpoint: a crash in between only
+                # repeats this document, it never loses it
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+                # Failed documents stay pending: the next run retries them
+                if "error" not in record:
+                    ckpt.write(record["id"] + "\n")
+                    ckpt.flush()
+
+            latencies.append(record["elapsed"])
+            characters += record.get("characters", 0)
+            if "error" in record:
+                failed += 1
+            sys.stderr.write(f"Batch: [{done}/{len(pending)}] {record['id']} "
+                             f"({'failed' if 'error' in record else 'ok'}, {record['elapsed']:.1f}s)\n")
+
+    wall = time.monotonic() - started
+    return {
+        "documents": len(documents),
+        "skipped": len(documents) - len(pending),
+        "processed": len(pending),
+        "failed": failed,
+        "wall_seconds": round(wall, 3),
+        "documents_per_minute": round(len(pending) / wall * 60, 2) if wall > 0 else 0.0,
+        "characters_per_second": round(characters / wall, 1) if wall > 0 else 0.0,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_max": max(latencies) if latencies else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze a directory or JSONL manifest of contracts")
+    parser.add_argument("input", help="Directory of documents or a JSONL manifest")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: OUTPUT.checkpoint)")
+    parser.add_argument("--workers", type=int, default=4, help="Documents processed concurrently")
+    parser.add_argument("--requests-per-minute", type=float,
+                        help="Global request quota shared by all workers")
+    parser.add_argument("--tokens-per-minute", type=float,
+                        help="Global token quota shared by all workers")
+    args = parser.parse_args()
+
+    if args.requests_per_minute is not None or args.tokens_per_minute is not None:
+        configure_shared_limiter(args.requests_per_minute, args.tokens_per_minute)
+
+    summary = run_batch(args.input, args.output, checkpoint=args.checkpoint, workers=args.workers)
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,368 @@
+"""
+Offline performance benchmarks.
+
+Runs every stage of the pipeline on synthetic contracts of increasing size
+against a local stub server (mock_openrouter.py), so no API key, network
+or quota is needed, and writes the timings as JSON for comparison across
+commits.
+
+Usage:
+    python benchmark.py [-o results.json] [--sizes 1000,10000,100000,1000000]
+                        [--repeat 5] [--latency 0.05] [--jitter 0.02]
+                        [--error-rate 0.0] [--compare baseline.json]
+                        [--tolerance 0.25] [--memory]
+
+With --compare the exit status is 1 when any stage's p50 is slower than
+the baseline by more than --tolerance (a fraction).
+
+--memory also runs each end-to-end pipeline once per size in a fresh
+process and reports how far its peak RSS grew above the baseline (the
+interpreter plus the contract text). Growth should stay close to flat as
+the contract gets larger: chunks are offsets into the one text buffer,
+prompts live only while their request is sent, and findings are anchored
+against one chunk at a time.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+# Configure the clients before they are imported: stub credentials, no
+# caches (every run must do the work) and no client-side rate limit
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+os.environ["RESULT_CACHE_DISABLED"] = "1"
+os.environ["CLAUSE_INDEX_DISABLED"] = "1"
+os.environ["PAGE_CACHE_DISABLED"] = "1"
+os.environ["FETCH_CACHE_DISABLED"] = "1"
+
+try:
+    from .mock_openrouter import start_stub
+except ImportError:
+    from mock_openrouter import start_stub
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# Page-by-page PDF parsing is slow; larger sizes only measure text formats
+MAX_PDF_CHARS = 100_000
+
+# Timings this short are mostly noise and are not compared
+MIN_COMPARABLE_MS = 1.0
+
+# Pipelines measured by --memory
+MEMORY_STAGES = ("analyze", "simplify", "combined")
+
+BENIGN_CLAUSES = [
+    "The Services are provided to the Customer in accordance with the service description in force on the Effective Date.",
+    "Each party shall comply with all applicable laws and regulations in the performance of this Agreement.",
+    "Invoices are payable within thirty (30) days of the invoice date by bank transfer to the account stated on the invoice.",
+    "The Customer shall designate a contact person who is authorized to make decisions on its behalf.",
+    "Notices under this Agreement shall be in writing and delivered to the addresses set out above.",
+    "Headings are for convenience only and do not affect the interpretation of this Agreement.",
+]
+RISKY_CLAUSES = [
+    "We may suspend or terminate your account at our sole discretion, without notice, for any reason.",
+    "All fees are non-refundable, including fees paid for periods after termination.",
+    "You agree to indemnify and hold us harmless from any claims arising from your use of the Services.",
+    "Any dispute shall be resolved by binding arbitration and you waive your right to a jury trial.",
+    "This Agreement renews automatically for successive one-year terms unless cancelled.",
+    "We reserve the right to modify these terms at any time; changes are effective immediately upon posting.",
+]
+HEADINGS = ["DEFINITIONS", "SERVICES", "FEES AND PAYMENT", "TERM AND TERMINATION", "LIABILITY",
+            "CONFIDENTIALITY", "DATA PROTECTION", "GENERAL PROVISIONS"]
+
+
+def synthetic_contract(size, seed=0, risky_ratio=0.15):
+    """
+    Deterministic contract-like text of about `size` characters: headed,
+    numbered sections of sub-clauses, a share of them risky.
+    """
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    section = 0
+    while length < size:
+        section += 1
+        heading = f"{section}. {HEADINGS[(section - 1) % len(HEADINGS)]}\n"
+        parts.append(heading)
+        length += len(heading)
+        for sub in range(1, rng.randint(3, 7)):
+            pool = RISKY_CLAUSES if rng.random() < risky_ratio else BENIGN_CLAUSES
+            clause = f"{section}.{sub} {rng.choice(pool)} {rng.choice(BENIGN_CLAUSES)}\n"
+            parts.append(clause)
+            length += len(clause)
+            if length >= size:
+                break
+    return "".join(parts)[:size]
+
+
+def synthetic_pdf(text, lines_per_page=50, width=95):
+    """Minimal PDF (Helvetica text, one line per 95 characters) of `text`."""
+    lines = []
+    for paragraph in text.split("\n"):
+        lines.extend(paragraph[i:i + width] for i in range(0, max(len(paragraph), 1), width))
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    def escape(line):
+        return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None]
+    kids = []
+    font_ref = 3 + 2 * len(pages)
+    for i, page in enumerate(pages):
+        content = "BT /F1 10 Tf 12 TL 40 770 Td " + " ".join(f"({escape(line)}) Tj T*" for line in page) + " ET"
+        kids.append(f"{len(objects) + 1} 0 R")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects) + 2} 0 R >>")
+        objects.append(f"<< /Length {len(content.encode('latin-1', 'replace'))} >>\nstream\n{content}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} /Resources << /Font << /F1 {font_ref} 0 R >> >> >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1", "replace")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def measure(stage, size, func, repeat):
+    """Run `func` `repeat` times and summarize the timings."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    p50 = percentile(timings, 50)
+    result = {
+        "stage": stage,
+        "size": size,
+        "runs": repeat,
+        "mean_ms": round(sum(timings) / repeat * 1000, 3),
+        "p50_ms": round(p50 * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "chars_per_sec": round(size / p50) if p50 > 0 else None,
+    }
+    sys.stderr.write(f"{stage:<12} {size:>9} chars  p50 {result['p50_ms']:>10.2f} ms  p95 {result['p95_ms']:>10.2f} ms\n")
+    return result
+
+
+def canned_analysis(items):
+    """A model answer with `items` findings, as the parser receives it."""
+    return json.dumps({"analysis": [
+        {"clause_text": f"Clause {i}: {RISKY_CLAUSES[i % len(RISKY_CLAUSES)]}", "risk_score": 7,
+         "explanation": "The other party may act without telling you.", "recommendation": "Negotiate a notice period."}
+        for i in range(items)
+    ]})
+
+
+def run_benchmarks(sizes, repeat, stub):
+    try:
+        from . import analyzer, chunker, combined, extraction, humanizer, risk_rules
+        from .anchoring import AnchorIndex, SpanDeduper
+        from .backends import OpenAICompatibleBackend, configure_shared_backend
+        from .llm_stream import JsonStreamParser
+        from .rate_limiter import configure_shared_limiter
+    except ImportError:
+        import analyzer
+        import chunker
+        import combined
+        import extraction
+        import humanizer
+        import risk_rules
+        from anchoring import AnchorIndex, SpanDeduper
+        from backends import OpenAICompatibleBackend, configure_shared_backend
+        from llm_stream import JsonStreamParser
+        from rate_limiter import configure_shared_limiter
+
+    configure_shared_backend(OpenAICompatibleBackend(stub.url))
+    configure_shared_limiter(requests_per_minute=0, tokens_per_minute=0)
+
+    results = []
+    for size in sizes:
+        text = synthetic_contract(size)
+        # Slow end-to-end stages run fewer times on big inputs
+        e2e_repeat = max(1, repeat if size <= 100_000 else repeat // 3)
+
+        results.append(measure("chunking", size, lambda: chunker.chunk_spans(text, model=analyzer.MODEL), repeat))
+        results.append(measure("risk_scan", size, lambda: risk_rules.scan(text), repeat))
+
+        raw = text.encode("utf-8")
+        results.append(measure("extract_text", size, lambda: extraction.extract(raw, "text/plain"), repeat))
+        if size <= MAX_PDF_CHARS:
+            pdf = synthetic_pdf(text)
+            results.append(measure("extract_pdf", size, lambda: extraction.extract(pdf, "application/pdf"), repeat))
+
+        # One finding per ~500 characters, as in a risky contract
+        response = canned_analysis(max(1, size // 500))
+
+        def parse():
+            parser = JsonStreamParser(("analysis",))
+            for i in range(0, len(response), 16):
+                parser.feed(response[i:i + 16])
+            parser.close()
+        results.append(measure("parsing", len(response), parse, repeat))
+
+        findings = [dict(item, clause_text=item["clause_text"].split(": ", 1)[1])
+                    for item in json.loads(response)["analysis"]]
+
+        def dedup():
+            index = AnchorIndex(text)
+            deduper = SpanDeduper()
+            for item in findings:
+                item = dict(item)
+                index.anchor(item)
+                deduper.add(item)
+        results.append(measure("anchor_dedup", size, dedup, repeat))
+
+        results.append(measure("analyze_e2e", size, lambda: analyzer.run(text), e2e_repeat))
+        results.append(measure("simplify_e2e", size, lambda: humanizer.simplify(text), e2e_repeat))
+        results.append(measure("combined_e2e", size, lambda: combined.run(text), e2e_repeat))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print p50 changes against a baseline report; returns the regressions."""
+    previous = {(r["stage"], r["size"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get((result["stage"], result["size"]))
+        if not before or max(before["p50_ms"], result["p50_ms"]) < MIN_COMPARABLE_MS:
+            continue
+        change = result["p50_ms"] / before["p50_ms"] - 1
+        marker = "  REGRESSION" if change > tolerance else ""
+        print(f"{result['stage']:<12} {result['size']:>9}  {before['p50_ms']:>10.2f} -> {result['p50_ms']:>10.2f} ms  ({change:+.0%}){marker}")
+        if change > tolerance:
+            regressions.append(result)
+    return regressions
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def memory_probe(stage, size, url):
+    """Run one pipeline on a synthetic contract and report its peak RSS growth."""
+    try:
+        from . import analyzer, combined, humanizer
+        from .backends import OpenAICompatibleBackend, configure_shared_backend
+        from .rate_limiter import configure_shared_limiter
+    except ImportError:
+        import analyzer
+        import combined
+        import humanizer
+        from backends import OpenAICompatibleBackend, configure_shared_backend
+        from rate_limiter import configure_shared_limiter
+
+    configure_shared_backend(OpenAICompatibleBackend(url))
+    configure_shared_limiter(requests_per_minute=0, tokens_per_minute=0)
+
+    text = synthetic_contract(size)
+    baseline = peak_rss_mb()
+    pipeline = {"analyze": analyzer.run, "simplify": humanizer.simplify, "combined": combined.run}[stage]
+    result = pipeline(text)
+    return {
+        "stage": f"memory_{stage}",
+        "size": size,
+        "ok": "error" not in result,
+        "baseline_mb": round(baseline, 1),
+        "peak_mb": round(peak_rss_mb(), 1),
+        "growth_mb": round(peak_rss_mb() - baseline, 1),
+    }
+
+
+def run_memory_benchmarks(sizes, stub):
+    """Run memory_probe() for every stage and size, each in a fresh process."""
+    results = []
+    for size in sizes:
+        for stage in MEMORY_STAGES:
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--memory-probe", stage, str(size), "--stub-url", stub.url],
+                capture_output=True, text=True)
+            try:
+                result = json.loads(completed.stdout.strip().splitlines()[-1])
+            except (IndexError, ValueError):
+                sys.stderr.write(f"memory_{stage} {size}: probe failed\n{completed.stderr[-2000:]}\n")
+                continue
+            sys.stderr.write(f"memory_{stage:<9} {size:>9} chars  peak +{result['growth_mb']:>7.1f} MB"
+                             f"  (baseline {result['baseline_mb']:.1f} MB)\n")
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a local stub server")
+    parser.add_argument("-o", "--output", default="benchmark-results.json", help="Where to write the JSON report")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated contract sizes in characters")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per stage and size")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub latency per request (s)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Stub latency jitter (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub 429/5xx answers")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p50 slowdown (fraction)")
+    parser.add_argument("--memory", action="store_true", help="Also measure peak RSS growth per pipeline")
+    parser.add_argument("--memory-probe", nargs=2, metavar=("STAGE", "SIZE"), help=argparse.SUPPRESS)
+    parser.add_argument("--stub-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.memory_probe:
+        stage, size = args.memory_probe
+        print(json.dumps(memory_probe(stage, int(size), args.stub_url)))
+        return 0
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    stub = start_stub(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    started = time.time()
+    results = run_benchmarks(sizes, max(1, args.repeat), stub)
+    memory = run_memory_benchmarks(sizes, stub) if args.memory else None
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": int(started),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"sizes": sizes, "repeat": args.repeat, "latency": args.latency,
+                   "jitter": args.jitter, "error_rate": args.error_rate},
+        "stub_requests": stub.requests,
+        "results": results,
+    }
+    if memory is not None:
+        report["memory"] = memory
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2)
+    print(f"Wrote {len(results)} measurements to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
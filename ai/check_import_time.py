@@ -0,0 +1,93 @@
+"""
+Import-time budget check.
+
+Imports each entry module in a fresh interpreter with `-X importtime`
+(without OPENROUTER_API_KEY, which importing must not require) and fails
+when its cumulative import time exceeds the budget, or when it pulls in a
+module that is only needed later (requests, PyPDF2, bs4, dotenv).
+
+Usage:
+    python check_import_time.py [--runs 5] [--scale 1.0] [MODULE ...]
+
+Each module's best time over --runs runs is compared with its budget
+multiplied by --scale (raise it on slow machines). Exit status 1 when any
+check fails. The test suite (python -m pytest in ai/) runs it too, with
+--scale from IMPORT_TIME_SCALE.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Cumulative import time budgets in milliseconds
+BUDGETS_MS = {
+    "worker": 40,
+    "analyzer": 70,
+    "humanizer": 70,
+    "extraction": 60,
+    "text_extractor": 50,
+}
+
+# Imported on first use only (see config.py, backends.OpenAICompatibleBackend.session,
+# fetcher.html_to_text, text_extractor.iter_pdf_pages)
+DEFERRED_MODULES = ["requests", "urllib3", "PyPDF2", "bs4", "dotenv"]
+
+
+def import_time(module):
+    """
+    Import `module` in a fresh interpreter.
+
+    Returns:
+        (cumulative import time in ms, deferred modules that got imported)
+    """
+    env = {key: value for key, value in os.environ.items() if key != "OPENROUTER_API_KEY"}
+    code = (f"import sys, json, {module}; "
+            f"print(json.dumps([m for m in {DEFERRED_MODULES!r} if m in sys.modules]))")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                               cwd=HERE, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr.strip()}")
+
+    cumulative = None
+    for line in completed.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:"):
+            continue
+        parts = [part.strip() for part in line[len("import time:"):].split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            cumulative = int(parts[1]) / 1000
+    return cumulative, json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if importing the AI modules gets slow")
+    parser.add_argument("modules", nargs="*", default=list(BUDGETS_MS), help="Modules to check")
+    parser.add_argument("--runs", type=int, default=5, help="Imports per module; the best counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for every budget")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        budget = BUDGETS_MS.get(module, max(BUDGETS_MS.values())) * args.scale
+        try:
+            runs = [import_time(module) for _ in range(max(1, args.runs))]
+        except RuntimeError as e:
+            print(f"FAIL {module}: {e}")
+            failed = True
+            continue
+
+        best = min(ms for ms, _ in runs)
+        deferred = sorted({name for _, names in runs for name in names})
+        ok = best <= budget and not deferred
+        failed = failed or not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {module:<15} {best:7.1f} ms (budget {budget:.0f} ms)"
+              + (f"  imports {', '.join(deferred)} at start-up" if deferred else ""))
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
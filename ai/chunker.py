@@ -0,0 +1,229 @@
+import os
+import re
+
+try:
+    from . import model_profiles
+except ImportError:
+    import model_profiles
+
+# Rough average for English legal text; good enough for budgeting chunks
+CHARS_PER_TOKEN = 4.0
+
+# Token estimate for text: BPE vocabularies of the Llama 3 / DeepSeek kind
+# spend about 1.3 tokens per English word plus one per punctuation mark
+# (clause numbers such as "4.2.1" cost several tokens in few characters)
+TOKENS_PER_WORD = 1.3
+PUNCTUATION = ".,;:()\"'/-"
+# Words are counted this many characters at a time, so a large text is
+# never split into one list of all its words
+ESTIMATE_SLAB_CHARS = 65536
+
+# Room reserved for the prompt template and the model's answer
+PROMPT_OVERHEAD_TOKENS = 600
+OUTPUT_TOKENS = 4000
+
+# Contract tokens per request when the text size isn't known or adaptive
+# chunking is off (see model_profiles). Larger chunks save requests but
+# make the model skip clauses, so this stays well below the context.
+DEFAULT_CHUNK_TOKENS = int(os.getenv("CHUNK_TOKEN_BUDGET", "3750"))
+
+# A clause starts at the beginning of a line with a section marker:
+#   "Section 4", "Article 12", "Clause 3.1"   - named sections
+#   "1.", "4.2", "4.2.1", "3)"                - numbered clauses
+#   "(a)", "(iv)"                             - lettered sub-clauses
+#   "LIMITATION OF LIABILITY"                 - all-caps headings
+CLAUSE_START = re.compile(
+    r"^[ \t]*(?:"
+    r"(?i:section|article|clause)\s+[0-9IVXLC]+"
+    r"|\d{1,3}(?:\.\d{1,3})*[.)][ \t]"
+    r"|\d{1,3}(?:\.\d{1,3})+[ \t]"
+    r"|\([a-z0-9]{1,4}\)[ \t]"
+    r"|[A-Z][A-Z0-9 ,&'/-]{3,60}[ \t]*$"
+    r")",
+    re.MULTILINE,
+)
+
+# Between the pieces of a chunk packed from separate parts of the text
+PIECE_SEPARATOR = "\n\n[...]\n\n"
+
+# Places where an over-long clause may be cut, best first
+SENTENCE_END = re.compile(r"[.;:!?][\"')\]]*\s+|\n")
+
+
+def estimate_tokens(text):
+    """
+    Fast local token estimate for a string (from its words and punctuation)
+    or for a length in characters.
+    """
+    if isinstance(text, int):
+        return int(text / CHARS_PER_TOKEN) + 1
+    marks = sum(map(text.count, PUNCTUATION))
+    words = sum(len(text[i:i + ESTIMATE_SLAB_CHARS].split()) for i in range(0, len(text), ESTIMATE_SLAB_CHARS))
+    return int(words * TOKENS_PER_WORD) + marks + 1
+
+
+def token_budget(model=None, text_tokens=None, output_tokens=OUTPUT_TOKENS, output_ratio=None, workers=1):
+    """
+    Number of contract tokens to put in one request for `model`.
+
+    Given the size of the text (text_tokens) and of the expected answer
+    (output_ratio answer tokens per contract token), the budget minimizes
+    the predicted processing time for the model's measured speed and keeps
+    answers within output_tokens (see model_profiles.plan_chunk_tokens).
+    Otherwise it is CHUNK_TOKEN_BUDGET, capped by the context window.
+
+    Args:
+        model: Model name used to look up its profile
+        text_tokens: Size of the text that will be chunked
+        output_tokens: The request's max_tokens
+        output_ratio: Expected answer tokens per contract token
+        workers: Chunks processed concurrently
+    """
+    if text_tokens is not None and output_ratio and model_profiles.ADAPTIVE:
+        return model_profiles.plan_chunk_tokens(model, text_tokens, output_tokens, output_ratio,
+                                                PROMPT_OVERHEAD_TOKENS, workers)
+    context = model_profiles.profile(model).context_tokens
+    return max(256, min(DEFAULT_CHUNK_TOKENS, context - output_tokens - PROMPT_OVERHEAD_TOKENS))
+
+
+def segment_clauses(text):
+    """
+    Split text into clauses at numbered sections, sub-clauses and headings.
+
+    Args:
+        text: The full contract text
+
+    Returns:
+        List of (start, end) spans that cover the text end to end
+    """
+    starts = [0]
+    for match in CLAUSE_START.finditer(text):
+        if match.start() > starts[-1]:
+            starts.append(match.start())
+    ends = starts[1:] + [len(text)]
+    return list(zip(starts, ends))
+
+
+def split_long(text, start, end, max_chars):
+    """Cut a clause longer than `max_chars` at sentence ends (or whitespace)."""
+    while end - start > max_chars:
+        limit = start + max_chars
+        cut = -1
+        # Last sentence end inside the allowed window
+        for match in SENTENCE_END.finditer(text, start + max_chars // 2, limit):
+            cut = match.end()
+        if cut == -1:
+            cut = text.rfind(" ", start + max_chars // 2, limit) + 1
+        if cut <= start:
+            cut = limit
+        yield start, cut
+        start = cut
+    yield start, end
+
+
+def chunk_spans(text, max_tokens=None, model=None):
+    """
+    Pack whole clauses into chunks that fit a token budget.
+
+    Chunks never overlap and never split a clause unless the clause alone is
+    larger than the budget, in which case it is cut at sentence boundaries.
+
+    Args:
+        text: The full contract text
+        max_tokens: Token budget per chunk (defaults to token_budget(model))
+        model: Model name used to look up the default budget
+
+    Returns:
+        List of (start, end) spans into `text`
+    """
+    chars_per_token = len(text) / estimate_tokens(text)
+    max_chars = int((max_tokens or token_budget(model)) * chars_per_token)
+    if len(text) <= max_chars:
+        return [(0, len(text))]
+
+    chunks = []
+    chunk_start = chunk_end = None
+    for clause_start, clause_end in segment_clauses(text):
+        for start, end in split_long(text, clause_start, clause_end, max_chars):
+            if chunk_start is None:
+                chunk_start, chunk_end = start, end
+            elif end - chunk_start <= max_chars:
+                chunk_end = end
+            else:
+                chunks.append((chunk_start, chunk_end))
+                chunk_start, chunk_end = start, end
+
+    chunks.append((chunk_start, chunk_end))
+    return chunks
+
+
+def chunk_regions(text, regions, max_tokens=None, model=None):
+    """
+    Pack the given regions of the text (e.g. runs of clauses that still need
+    analysis) into chunks that fit a token budget.
+
+    Regions are packed in document order, so scattered short clauses share
+    one request instead of taking one each; a region larger than the budget
+    is cut like chunk_spans() cuts a text. Regions are never cut to fill
+    the rest of a chunk, so each piece keeps its whole clauses.
+
+    Args:
+        text: The full contract text
+        regions: Sorted, non-overlapping (start, end) spans to cover
+        max_tokens: Token budget per chunk (defaults to token_budget(model))
+        model: Model name used to look up the default budget
+
+    Returns:
+        List of chunks, each a list of (start, end) pieces of `text` in
+        document order, sent as one text joined by PIECE_SEPARATOR (see
+        join_pieces())
+    """
+    if not regions:
+        return []
+    chars = sum(end - start for start, end in regions)
+    tokens = sum(estimate_tokens(text[start:end]) for start, end in regions)
+    max_chars = int((max_tokens or token_budget(model)) * chars / tokens)
+
+    chunks = []
+    size = 0
+    for region_start, region_end in regions:
+        region = text[region_start:region_end]
+        for s, e in chunk_spans(region, max_tokens, model):
+            start, end = region_start + s, region_start + e
+            if chunks and chunks[-1][-1][1] == start and size + end - start <= max_chars:
+                chunks[-1][-1] = (chunks[-1][-1][0], end)
+                size += end - start
+            elif chunks and size + len(PIECE_SEPARATOR) + end - start <= max_chars:
+                chunks[-1].append((start, end))
+                size += len(PIECE_SEPARATOR) + end - start
+            else:
+                chunks.append([(start, end)])
+                size = end - start
+    return chunks
+
+
+def join_pieces(text, pieces):
+    """The text sent for a chunk of chunk_regions()."""
+    return PIECE_SEPARATOR.join(text[start:end] for start, end in pieces)
+
+
+def clause_runs(clauses, selected):
+    """
+    Merge the selected clause indexes into runs of adjacent clauses.
+
+    Args:
+        clauses: (start, end) spans from segment_clauses()
+        selected: Sorted clause indexes
+
+    Returns:
+        List of (start, end) regions
+    """
+    regions = []
+    previous = None
+    for i in selected:
+        if previous is not None and i == previous + 1:
+            regions[-1] = (regions[-1][0], clauses[i][1])
+        else:
+            regions.append(clauses[i])
+        previous = i
+    return regions
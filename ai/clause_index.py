@@ -0,0 +1,405 @@
+"""
+Near-duplicate clause index.
+
+Terms of service reuse the same boilerplate (limitation of liability,
+arbitration, termination) with another company's name or a reworded
+phrase, which the exact-text result cache never matches. This index keeps
+the findings the model returned for every analyzed clause and serves them
+for clauses that are nearly the same:
+
+  - A clause is normalized (case, enumeration and party names, see
+    clause_words()) and cut into overlapping word 3-grams ("shingles").
+  - Its MinHash signature estimates the Jaccard similarity of two clauses'
+    shingle sets: the fraction of equal signature values. It is computed
+    by one-permutation hashing with optimal densification (Shrivastava,
+    ICML 2017): each shingle is hashed once into one of NUM_HASHES bins,
+    each bin keeps its minimum, and an empty bin copies the first
+    non-empty bin of its own fixed random probe sequence. That is as
+    accurate as NUM_HASHES independent hash functions while hashing each
+    shingle once.
+  - Locality-sensitive hashing: the signature is cut into BANDS bands of
+    ROWS values and each band is hashed to a bucket. Only clauses sharing
+    at least one bucket are compared, so a lookup reads a few indexed rows
+    however many clauses the index holds.
+
+A candidate is a hit when its estimated similarity reaches THRESHOLD. With
+16 bands of 8 rows, clauses that are 80% similar share a bucket with
+probability 0.95, 90% similar ones with probability 0.9999.
+
+Run `python clause_index.py` to check that rebranded boilerplate matches
+and clauses with the parties swapped do not.
+
+Entries live in SQLite (in memory with path=None). A clause nearly equal
+to a stored one updates that entry instead of adding another, so repeated
+boilerplate takes one row, and the least recently used entries are evicted
+beyond max_entries.
+
+A clause stored without findings is only served for benign_ttl seconds:
+one model miss must not mark it and its near-duplicates benign forever.
+Once expired it is analyzed again and the new answer replaces the entry,
+while an empty answer never replaces stored findings.
+"""
+import functools
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+
+try:
+    from .revisions import strip_enumeration
+except ImportError:
+    from revisions import strip_enumeration
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "clauses.sqlite3")
+
+# --- Configuration ---
+# Estimated Jaccard similarity from which a stored clause's findings are reused
+THRESHOLD = float(os.getenv("CLAUSE_SIMILARITY_THRESHOLD", "0.8"))
+NUM_HASHES = 128
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+SHINGLE_WORDS = 3
+# Shorter clauses (headings, "Definitions.") say too little to be matched
+MIN_WORDS = 8
+# At most this many candidates are compared per lookup
+MAX_CANDIDATES = 32
+
+# Words, plus the punctuation after which a capitalized word starts a sentence
+_TOKEN = re.compile(r"\w+|[.!?;:]")
+# Stands in for the n-th distinct run of capitalized words inside a sentence
+_NAME = "<name{}>"
+# Defined party roles are kept as words: they say who owes what to whom
+_ROLES = frozenset((
+    "customer", "client", "user", "member", "subscriber", "buyer", "purchaser",
+    "provider", "vendor", "supplier", "seller", "company", "contractor",
+    "licensor", "licensee", "lessor", "lessee", "landlord", "tenant",
+    "employer", "employee", "party", "parties",
+))
+
+# The signature keeps the low 32 bits of each bin's minimum
+_LOW_BITS = (1 << 32) - 1
+
+
+@functools.lru_cache(maxsize=None)
+def _probe_sequences():
+    """Fixed pseudo-random bins each empty bin borrows from, in order."""
+    sequences = []
+    for i in range(NUM_HASHES):
+        digest = b"".join(hashlib.blake2b(f"probe-{i}-{j}".encode("ascii")).digest() for j in range(4))
+        sequences.append([byte % NUM_HASHES for byte in digest])
+    return sequences
+
+
+def clause_words(text):
+    """
+    Normalized words of a clause, from which shingles() are cut.
+
+    Case, whitespace, punctuation and leading enumeration are dropped, and
+    each run of capitalized words inside a sentence ("Acme Corp.") becomes
+    one placeholder word, numbered by the name's first appearance, so the
+    same boilerplate issued by different companies gives the same words.
+    Party roles ("Customer", "Licensor") stay words: a clause with the
+    parties swapped does not give the same words.
+    """
+    words = []
+    names = {}
+    run = []
+
+    def end_run():
+        if run and all(word in _ROLES for word in run):
+            words.extend(run)
+        elif run:
+            words.append(_NAME.format(names.setdefault(" ".join(run), len(names))))
+        run.clear()
+
+    sentence_start = True
+    for token in _TOKEN.findall(strip_enumeration(text.lstrip())):
+        if token in ".!?;:":
+            end_run()
+            sentence_start = True
+            continue
+        if token[0].isupper() and not sentence_start:
+            run.append(token.lower())
+        else:
+            end_run()
+            words.append(token.lower())
+        sentence_start = False
+    end_run()
+    return words
+
+
+def shingles(text):
+    """
+    Hashed word 3-grams of a clause's normalized words (see clause_words()).
+
+    Returns:
+        Set of 64-bit integers; empty for clauses under MIN_WORDS words.
+    """
+    words = clause_words(text)
+    if len(words) < MIN_WORDS:
+        return set()
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def signature(text):
+    """MinHash signature of a clause (array of NUM_HASHES values), or None if it is too short."""
+    hashes = shingles(text)
+    if not hashes:
+        return None
+    bins = [None] * NUM_HASHES
+    for x in hashes:
+        b, value = x % NUM_HASHES, x // NUM_HASHES
+        if bins[b] is None or value < bins[b]:
+            bins[b] = value
+    probes = _probe_sequences()
+    values = []
+    for i, value in enumerate(bins):
+        if value is None:
+            value = next((bins[b] for b in probes[i] if bins[b] is not None), None)
+            if value is None:
+                value = next(v for v in bins[i:] + bins[:i] if v is not None)
+        values.append(value & _LOW_BITS)
+    return array("I", values)
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of the clauses behind two signatures."""
+    return sum(1 for x, y in zip(first, second) if x == y) / NUM_HASHES
+
+
+def buckets(sig, namespace=""):
+    """
+    LSH bucket of each band of a signature. The namespace is hashed in, so
+    clauses analyzed with another prompt or model never meet.
+    """
+    raw = sig.tobytes()
+    width = len(raw) // BANDS
+    prefix = namespace.encode("utf-8")
+    return [
+        int.from_bytes(
+            hashlib.blake2b(prefix + bytes([band]) + raw[band * width:(band + 1) * width], digest_size=8).digest(),
+            "big", signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+class ClauseIndex:
+    """
+    MinHash/LSH index from clauses to the findings the model returned for them.
+
+    Args:
+        path: SQLite file. None keeps the index in memory.
+        max_entries: Stored clauses beyond which the least recently used
+            ones are evicted.
+        threshold: Minimum estimated similarity of a hit.
+        benign_ttl: Seconds a clause stored without findings is served.
+            0 or less means forever.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, max_entries=1_000_000, threshold=THRESHOLD, benign_ttl=24 * 3600):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.benign_ttl = benign_ttl
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "writes": 0, "merged": 0, "evictions": 0}
+
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS clauses ("
+            " id INTEGER PRIMARY KEY, signature BLOB NOT NULL, findings TEXT NOT NULL, accessed REAL NOT NULL,"
+            " written REAL NOT NULL DEFAULT 0)"
+        )
+        if "written" not in [row[1] for row in self._db.execute("PRAGMA table_info(clauses)")]:
+            # Older indexes: their benign entries count as expired
+            self._db.execute("ALTER TABLE clauses ADD COLUMN written REAL NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS clauses_accessed ON clauses(accessed)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " bucket INTEGER NOT NULL, clause_id INTEGER NOT NULL, PRIMARY KEY (bucket, clause_id)) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS buckets_clause ON buckets(clause_id)")
+        self._entries = self._db.execute("SELECT COUNT(*) FROM clauses").fetchone()[0]
+
+    def _expired(self, findings, written, now):
+        return findings == "[]" and self.benign_ttl > 0 and now - written > self.benign_ttl
+
+    def _nearest(self, sig, keys, now=None):
+        """
+        (similarity, id, findings) of the most similar stored clause sharing
+        a bucket, or None. Given `now`, benign entries expired by then are
+        skipped.
+        """
+        marks = ",".join("?" * len(keys))
+        ids = [row[0] for row in self._db.execute(
+            f"SELECT DISTINCT clause_id FROM buckets WHERE bucket IN ({marks}) LIMIT ?", (*keys, MAX_CANDIDATES)
+        )]
+        best = None
+        if not ids:
+            return best
+        marks = ",".join("?" * len(ids))
+        for clause_id, stored, findings, written in self._db.execute(
+            f"SELECT id, signature, findings, written FROM clauses WHERE id IN ({marks})", ids
+        ):
+            if now is not None and self._expired(findings, written, now):
+                continue
+            score = similarity(sig, array("I", stored))
+            if score >= self.threshold and (best is None or score > best[0]):
+                best = (score, clause_id, findings)
+        return best
+
+    def lookup(self, text, namespace=""):
+        """
+        Findings stored for the clause most similar to `text`.
+
+        Returns:
+            (similarity, findings), or None when no stored clause reaches
+            the threshold.
+        """
+        sig = signature(text)
+        if sig is None:
+            return None
+        keys = buckets(sig, namespace)
+        now = time.time()
+        with self._lock:
+            best = self._nearest(sig, keys, now)
+            if best is None:
+                self._counters["misses"] += 1
+                return None
+            score, clause_id, findings = best
+            self._db.execute("UPDATE clauses SET accessed = ? WHERE id = ?", (now, clause_id))
+            self._counters["hits"] += 1
+        return score, json.loads(findings)
+
+    def add_many(self, clauses, namespace=""):
+        """
+        Store (text, findings) pairs in one transaction. A clause nearly
+        equal to a stored one replaces that entry's findings, unless it has
+        none and the entry has some; clauses too short to match are skipped.
+        """
+        entries = []
+        for text, findings in clauses:
+            sig = signature(text)
+            if sig is not None:
+                entries.append((sig, buckets(sig, namespace), json.dumps(findings)))
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for sig, keys, findings in entries:
+                    nearest = self._nearest(sig, keys)
+                    if nearest is not None:
+                        if findings == "[]" and nearest[2] != "[]":
+                            # A miss doesn't erase what another analysis found
+                            self._db.execute("UPDATE clauses SET accessed = ? WHERE id = ?", (now, nearest[1]))
+                        else:
+                            self._db.execute("UPDATE clauses SET findings = ?, accessed = ?, written = ? WHERE id = ?",
+                                             (findings, now, now, nearest[1]))
+                        self._counters["merged"] += 1
+                        continue
+                    clause_id = self._db.execute(
+                        "INSERT INTO clauses (signature, findings, accessed, written) VALUES (?, ?, ?, ?)",
+                        (sig.tobytes(), findings, now, now),
+                    ).lastrowid
+                    self._db.executemany("INSERT OR IGNORE INTO buckets (bucket, clause_id) VALUES (?, ?)",
+                                         [(key, clause_id) for key in keys])
+                    self._entries += 1
+                    self._counters["writes"] += 1
+                if self._entries > self.max_entries:
+                    self._evict()
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def add(self, text, findings, namespace=""):
+        """Store the findings of one clause (see add_many())."""
+        self.add_many([(text, findings)], namespace)
+
+    def _evict(self):
+        # Least recently used entries, down to 90% of the budget
+        excess = self._entries - int(self.max_entries * 0.9)
+        evicted = [row for row in self._db.execute("SELECT id FROM clauses ORDER BY accessed LIMIT ?", (excess,))]
+        self._db.executemany("DELETE FROM buckets WHERE clause_id = ?", evicted)
+        self._db.executemany("DELETE FROM clauses WHERE id = ?", evicted)
+        self._entries -= len(evicted)
+        self._counters["evictions"] += len(evicted)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._db.execute("DELETE FROM buckets")
+            self._db.execute("DELETE FROM clauses")
+            self._entries = 0
+
+    def stats(self):
+        """Hit/miss counters plus the number of stored clauses."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = self._entries
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            return stats
+
+
+_shared_index = None
+_shared_lock = threading.Lock()
+
+
+def shared_index():
+    """
+    Process-wide index configured from the environment:
+    CLAUSE_INDEX_PATH (empty string keeps the index in memory only),
+    CLAUSE_INDEX_MAX_ENTRIES and CLAUSE_INDEX_BENIGN_TTL. Returns None when
+    CLAUSE_INDEX_DISABLED is set.
+    """
+    global _shared_index
+    if os.getenv("CLAUSE_INDEX_DISABLED"):
+        return None
+    with _shared_lock:
+        if _shared_index is None:
+            _shared_index = ClauseIndex(
+                path=os.getenv("CLAUSE_INDEX_PATH", DEFAULT_INDEX_PATH) or None,
+                max_entries=int(os.getenv("CLAUSE_INDEX_MAX_ENTRIES", "1000000")),
+                benign_ttl=float(os.getenv("CLAUSE_INDEX_BENIGN_TTL", str(24 * 3600))),
+            )
+        return _shared_index
+
+
+def _self_check():
+    """Matching checks on hand-written clauses; returns the failures."""
+    indemnity = ("The {0} shall indemnify and hold harmless the {1} against all claims, "
+                 "losses and damages arising from the {0}'s use of the services.")
+    cases = [
+        ("rebranded", indemnity.format("Customer", "Acme Corp."), indemnity.format("Customer", "Globex Inc."), True),
+        ("swapped parties", indemnity.format("Customer", "Provider"), indemnity.format("Provider", "Customer"), False),
+    ]
+    failures = []
+    for name, first, second, expected in cases:
+        score = similarity(signature(first), signature(second))
+        if (score >= THRESHOLD) != expected:
+            failures.append(f"{name}: similarity {score:.2f}, expected {'a match' if expected else 'no match'}")
+    return failures
+
+
+if __name__ == "__main__":
+    import sys
+
+    problems = _self_check()
+    for problem in problems:
+        sys.stderr.write(f"FAIL {problem}\n")
+    if not problems:
+        print("ok   clause matching")
+    sys.exit(1 if problems else 0)
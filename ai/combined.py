@@ -0,0 +1,317 @@
+"""
+Single-pass analysis + humanization.
+
+When both the risk analysis and the plain-English version of a document
+are wanted, the text is chunked once and each chunk is sent with one
+prompt that asks for both the "analysis" list and the "humanized_text" /
+"key_points". Chunks without any risk vocabulary (see the analyzer's local
+pre-filter) are only humanized. The merge step then builds the two result
+shapes analyzer.run() and humanizer.simplify() return, so one upload costs
+roughly half the requests and wall-clock time of running both pipelines.
+
+Model, endpoint, temperature and concurrency are the analyzer's.
+"""
+import json
+import sys
+
+# Run as a script: read .env before the settings below are evaluated
+if __name__ == "__main__":
+    try:
+        from .config import load_env
+    except ImportError:
+        from config import load_env
+    load_env()
+
+try:
+    from . import analyzer, humanizer, risk_rules, telemetry
+    from .anchoring import AnchorIndex, SpanDeduper
+    from .chunker import chunk_spans, estimate_tokens, token_budget
+    from .completions import request_json
+    from .result_cache import make_key, shared_cache
+except ImportError:
+    import analyzer
+    import humanizer
+    import risk_rules
+    import telemetry
+    from anchoring import AnchorIndex, SpanDeduper
+    from chunker import chunk_spans, estimate_tokens, token_budget
+    from completions import request_json
+    from result_cache import make_key, shared_cache
+
+# Room for the findings and the rewritten chunk in one answer, and the
+# expected answer tokens per contract token
+MAX_OUTPUT_TOKENS = 6000
+OUTPUT_RATIO = 1.5
+
+COMBINED_PROMPT_TEMPLATE = """
+You are an AI Contract Analyzer and Legal Translator. Your goal is to help a non-lawyer understand a legal document. Do two things with the contract text below.
+
+1. Identify any clauses that are risky, unfair, or predatory. For each one provide:
+   - `clause_text`: The exact, word-for-word text of the risky clause.
+   - `risk_score`: A score from 1 (low risk) to 10 (high risk).
+   - `explanation`: A clear, simple explanation of why the clause is risky.
+   - `recommendation`: A suggested action or negotiation point.
+
+2. Rewrite the whole text in plain language. Replace legal jargon with simple words, break long sentences into shorter ones, explain what each clause means in practice, keep the same meaning, and use "you" and "we" instead of "the party" and "the other party".
+
+Contract text:
+---
+{contract_text}
+---
+
+IMPORTANT: Return ONLY a valid JSON object. Use \\n for newlines in strings. Do not include any text before or after the JSON.
+If no risky clauses are found, "analysis" is an empty list.
+
+Return your response as a JSON object with this structure:
+{{
+  "analysis": [
+    {{
+      "clause_text": "<exact text of the risky clause>",
+      "risk_score": <1-10>,
+      "explanation": "<why it is risky>",
+      "recommendation": "<what to do about it>"
+    }}
+  ],
+  "original_length": <number of words in original>,
+  "simplified_length": <number of words in simplified version>,
+  "humanized_text": "<the full simplified text here - use \\n for line breaks>",
+  "key_points": [
+    "<most important thing to know>",
+    "<second most important thing>",
+    "<third most important thing>"
+  ]
+}}
+"""
+
+
+def combined_chunk(chunk, chunk_num, total_chunks, on_item=None):
+    """
+    Analyze and humanize one chunk with a single request.
+
+    Args:
+        chunk: The text chunk.
+        chunk_num: Current chunk number (1-indexed).
+        total_chunks: Total number of chunks.
+        on_item: Optional callback receiving each risk item as soon as the
+            model has finished writing it.
+
+    Returns:
+        Dictionary with "analysis", "humanized_text", "key_points" and the
+        word counts, or {"error": ...}.
+    """
+    sys.stderr.write(f"Analyzing and humanizing chunk {chunk_num}/{total_chunks} ({len(chunk)} characters)...\n")
+
+    cache = shared_cache()
+    cache_key = make_key(COMBINED_PROMPT_TEMPLATE, ",".join(analyzer.MODELS), analyzer.TEMPERATURE, chunk)
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            telemetry.count("ai_cache_hits_total", stage="combined")
+            sys.stderr.write(f"Chunk {chunk_num}: Cache hit\n")
+            return cached
+
+    prompt = COMBINED_PROMPT_TEMPLATE.format(contract_text=chunk)
+    payload = {
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": MAX_OUTPUT_TOKENS,
+        "temperature": analyzer.TEMPERATURE
+    }
+
+    try:
+        parsed_result = request_json(
+            payload, analyzer.MODELS,
+            stream_keys=("analysis",),
+            on_item=(lambda key, item: on_item(item)) if on_item is not None else None,
+            estimated_tokens=estimate_tokens(prompt) + payload["max_tokens"],
+            label=f"Chunk {chunk_num}",
+        )
+    except Exception as e:
+        sys.stderr.write(f"Chunk {chunk_num}: Unexpected error: {e}\n")
+        return {"error": f"Unexpected error: {str(e)}"}
+
+    if "error" in parsed_result:
+        sys.stderr.write(f"Chunk {chunk_num}: {parsed_result['error']}\n")
+        return parsed_result
+    if "analysis" not in parsed_result:
+        return {"error": "AI response missing 'analysis' field"}
+    if "humanized_text" not in parsed_result:
+        return {"error": "AI response missing 'humanized_text' field"}
+
+    sys.stderr.write(f"Chunk {chunk_num}: Found {len(parsed_result.get('analysis', []))} risk items and humanized\n")
+    if cache is not None:
+        cache.set(cache_key, parsed_result)
+    return parsed_result
+
+
+def run_iter(text_content, page_starts=None):
+    """
+    Streaming combined pipeline: yields each chunk's findings and plain
+    text as soon as the chunk completes (in completion order).
+
+    Yields dictionaries with an "event" key:
+        {"event": "start", "total_chunks": n}
+        {"event": "chunk", "chunk": i, "total_chunks": n, "analysis": [...],
+         "humanized_text": "...", "key_points": [...],
+         "original_length": w, "simplified_length": w}
+            (analysis and key_points only hold items not yielded before;
+            findings are anchored like analyzer.run_iter's)
+        {"event": "error", "chunk": i, "total_chunks": n, "error": "..."}
+        {"event": "done", "total_findings": k, "chunks_done": c, "warnings": [...]}
+    or a single {"event": "error", "error": "..."} for invalid input.
+    """
+    if not text_content or not text_content.strip():
+        yield {"event": "error", "error": "Input text is empty or contains only whitespace."}
+        return
+
+    sys.stderr.write(f"Analyzing and humanizing contract with {len(text_content)} characters\n")
+
+    # Every chunk is humanized, so the whole text is chunked; the local
+    # pre-filter only decides which chunks also need the analysis
+    with telemetry.span("chunk", chars=len(text_content)):
+        # Benign chunks get a humanizer-only answer, which must fit too
+        text_tokens = estimate_tokens(text_content)
+        budget = min(token_budget(analyzer.MODEL, text_tokens, MAX_OUTPUT_TOKENS, OUTPUT_RATIO, analyzer.MAX_WORKERS),
+                     humanizer.chunk_budget(text_tokens, analyzer.MAX_WORKERS))
+        spans = chunk_spans(text_content, budget)
+        threshold = analyzer.RISK_THRESHOLD
+        matches = risk_rules.scan(text_content) if threshold > 0 else []
+        benign = {
+            n for n, (start, end) in enumerate(spans, 1)
+            if threshold > 0 and risk_rules.score_span(matches, start, end) < threshold
+        }
+    total_chunks = len(spans)
+
+    sys.stderr.write(f"Split into {total_chunks} chunk(s), {len(benign)} without risk vocabulary\n")
+    yield {"event": "start", "total_chunks": total_chunks}
+
+    def process_chunk(chunk, chunk_num, total):
+        if chunk_num in benign:
+            return dict(humanizer.humanize_chunk(chunk, chunk_num, total), analysis=[])
+        return combined_chunk(chunk, chunk_num, total)
+
+    index = AnchorIndex(text_content, page_starts)
+    deduper = SpanDeduper()
+    seen_points = set()
+    total_findings = 0
+    chunks_done = 0
+    errors = []
+
+    for chunk_num, result in analyzer.iter_spans(text_content, spans, process_chunk):
+        if "error" in result:
+            errors.append(f"Chunk {chunk_num}: {result['error']}")
+            yield {"event": "error", "chunk": chunk_num, "total_chunks": total_chunks, "error": result["error"]}
+            continue
+
+        with telemetry.span("merge", chunk=chunk_num):
+            items = result["analysis"] if isinstance(result.get("analysis"), list) else []
+            items = [dict(item) for item in items if isinstance(item, dict)]
+            taken = set()
+            for item in items:
+                analyzer.anchor_in_chunk(index, item, spans[chunk_num - 1], taken)
+            new_items = analyzer.dedup_findings(items, deduper)
+            key_points = result["key_points"] if isinstance(result.get("key_points"), list) else []
+            key_points = humanizer.dedup_key_points([p for p in key_points if isinstance(p, str)], seen_points)
+
+        total_findings += len(new_items)
+        chunks_done += 1
+        yield {
+            "event": "chunk",
+            "chunk": chunk_num,
+            "total_chunks": total_chunks,
+            "analysis": new_items,
+            "humanized_text": result.get("humanized_text") or "",
+            "key_points": key_points,
+            "original_length": result.get("original_length", 0),
+            "simplified_length": result.get("simplified_length", 0)
+        }
+
+    sys.stderr.write(f"Combined: {total_findings} risk item(s), {chunks_done} chunk(s) humanized\n")
+    yield {"event": "done", "total_findings": total_findings, "chunks_done": chunks_done, "warnings": errors}
+
+
+def run(text_content, page_starts=None):
+    """
+    Analyzes and humanizes the contract text in one pass.
+
+    Args:
+        text_content: The full text of the contract.
+        page_starts: Optional character offsets where each page begins,
+            used to add a "page" to every finding.
+
+    Returns:
+        {"analysis": <analyzer.run() result>, "humanized": <humanizer.simplify()
+        result>}, each with its own "warnings", or {"error": ...} if nothing
+        could be processed.
+    """
+    return collect(run_iter(text_content, page_starts), text_content)
+
+
+def collect(events, text_content):
+    """
+    Build run()'s result from run_iter() events: findings and plain text
+    of every chunk in document order, plus warnings for chunks that failed.
+    """
+    chunks = {}
+    errors = []
+
+    for event in events:
+        if event["event"] == "chunk":
+            chunks[event["chunk"]] = event
+        elif event["event"] == "error":
+            if "chunk" not in event:
+                return {"error": event["error"]}
+            errors.append(f"Chunk {event['chunk']}: {event['error']}")
+
+    if errors and not chunks:
+        return {"error": f"Analysis failed: {'; '.join(errors)}"}
+
+    # Document order: by chunk, then by position inside the chunk
+    ordered = [chunks[n] for n in sorted(chunks)]
+    analysis = {
+        "analysis": [
+            item
+            for event in ordered
+            for item in sorted(event["analysis"], key=lambda item: item.get("start", 0))
+        ]
+    }
+
+    humanized_text = "\n\n".join(event["humanized_text"] for event in ordered)
+    original_words = sum(e["original_length"] for e in ordered if isinstance(e["original_length"], int))
+    simplified_words = sum(e["simplified_length"] for e in ordered if isinstance(e["simplified_length"], int))
+    humanized = {
+        "original_length": original_words if original_words > 0 else len(text_content.split()),
+        "simplified_length": simplified_words if simplified_words > 0 else len(humanized_text.split()),
+        "humanized_text": humanized_text,
+        "key_points": [point for event in ordered for point in event["key_points"]]
+    }
+
+    if errors:
+        analysis["warnings"] = errors
+        humanized["warnings"] = errors
+    return {"analysis": analysis, "humanized": humanized}
+
+
+# Reads {"text": "...", "page_starts": [...]} from stdin, writes the result to
+# stdout (pass --ndjson to stream per-chunk events instead)
+if __name__ == "__main__":
+    try:
+        parsed_input = json.loads(sys.stdin.read() or "{}")
+        contract_text = parsed_input.get("text", "")
+        if not contract_text:
+            print(json.dumps({"error": "No text field in input"}))
+            sys.exit(1)
+
+        if "--ndjson" in sys.argv[1:]:
+            for event in run_iter(contract_text, parsed_input.get("page_starts")):
+                print(json.dumps(event), flush=True)
+            sys.exit(0)
+
+        print(json.dumps(run(contract_text, parsed_input.get("page_starts"))))
+    except json.JSONDecodeError as e:
+        print(json.dumps({"error": f"Failed to parse input JSON: {e}"}))
+        sys.exit(1)
+    except Exception as e:
+        print(json.dumps({"error": f"Unexpected error: {e}"}))
+        sys.exit(1)
@@ -0,0 +1,348 @@
+"""
+Request layer for chat completions.
+
+request_json() sends one prompt through a backend (see backends.py) and
+returns the parsed JSON answer. Around each request it applies:
+
+  - jittered exponential backoff for transient failures (429, 5xx,
+    timeouts, dropped connections, malformed output),
+  - a circuit breaker per model, so a failing model is skipped for a while
+    instead of costing every chunk its full retry budget,
+  - an ordered list of models to fall back to, and
+  - optional hedging: when a request takes longer than the model's recent
+    p95 latency, a duplicate is sent and whichever answers first wins.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+try:
+    from . import model_profiles, telemetry
+    from .backends import shared_backend
+    from .chunker import CHARS_PER_TOKEN
+    from .llm_stream import JsonStreamParser, MalformedResponse, StreamError, read_json
+    from .rate_limiter import parse_retry_after, shared_limiter
+except ImportError:
+    import model_profiles
+    import telemetry
+    from backends import shared_backend
+    from chunker import CHARS_PER_TOKEN
+    from llm_stream import JsonStreamParser, MalformedResponse, StreamError, read_json
+    from rate_limiter import parse_retry_after, shared_limiter
+
+# --- Configuration ---
+# Retries per model; the wait before retry n is random in [0, min(cap, base * 2^n)]
+MAX_RETRIES = int(os.getenv("OPENROUTER_MAX_RETRIES", "3"))
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+# Streamed responses: the read timeout is the longest silence between tokens
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = float(os.getenv("OPENROUTER_READ_TIMEOUT", "60"))
+
+# A model is skipped for BREAKER_RESET seconds after this many consecutive failures
+BREAKER_FAILURES = int(os.getenv("OPENROUTER_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("OPENROUTER_BREAKER_RESET", "30"))
+
+# Models tried, in order, after the caller's own model has failed
+FALLBACK_MODELS = [m.strip() for m in os.getenv("OPENROUTER_FALLBACK_MODELS", "").split(",") if m.strip()]
+
+# Hedging sends a duplicate request once a request is slower than the
+# model's recent p95 latency (needs HEDGE_MIN_SAMPLES measurements first)
+HEDGE_ENABLED = os.getenv("OPENROUTER_HEDGE", "").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.5
+LATENCY_WINDOW = 200
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+FATAL_STATUS = {401, 402, 403}
+
+
+class RequestFailed(Exception):
+    """
+    One attempt failed.
+
+    Attributes:
+        retryable: Another attempt may succeed.
+        fatal: No model can succeed (e.g. the API key was rejected).
+        status: HTTP status, if the provider answered.
+        retry_after: Delay requested by the provider, in seconds.
+    """
+
+    def __init__(self, message, retryable=True, fatal=False, status=None, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.fatal = fatal
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Closed while requests succeed; open (rejecting requests) for
+    `reset_after` seconds after `failure_threshold` consecutive failures;
+    then half-open, letting a single probe request decide.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_after=BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def allow(self):
+        """May a request be sent now?"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._probing and time.monotonic() - self._opened_at >= self.reset_after:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if self._probing else "open"
+
+
+class LatencyTracker:
+    """Recent successful request latencies of one model."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        """Latency at the given percentile, or None without enough samples."""
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+_breakers = {}
+_latencies = {}
+_registry_lock = threading.Lock()
+_hedge_pool = None
+
+
+def breaker(model):
+    """Process-wide circuit breaker of a model."""
+    with _registry_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker()
+        return _breakers[model]
+
+
+def latency(model):
+    """Process-wide latency tracker of a model."""
+    with _registry_lock:
+        if model not in _latencies:
+            _latencies[model] = LatencyTracker()
+        return _latencies[model]
+
+
+def model_chain(model):
+    """`model` followed by the configured fallback models."""
+    return [model] + [m for m in FALLBACK_MODELS if m != model]
+
+
+def backoff(attempt):
+    """Full-jitter exponential backoff delay before retry `attempt` (0-based)."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def _attempt(backend, payload, stream_keys, on_item, responses):
+    """Send one streamed request and parse its answer. Raises RequestFailed."""
+    import requests
+    model = payload["model"]
+    sent = time.perf_counter()
+    try:
+        # "http" ends with the response headers; reading the body is "stream"
+        with telemetry.span("http", model=model):
+            response = backend.send(payload, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        responses.append(response)
+        with response:
+            if response.status_code >= 400:
+                status = response.status_code
+                raise RequestFailed(
+                    f"API request failed: HTTP {status}",
+                    retryable=status in RETRYABLE_STATUS,
+                    fatal=status in FATAL_STATUS,
+                    status=status,
+                    retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                )
+            parser = JsonStreamParser(stream_keys)
+            try:
+                with telemetry.span("stream", model=model):
+                    result = read_json(response, on_item=on_item, parser=parser)
+                # Keep the model's speed profile current for chunk sizing
+                model_profiles.observe(model, parser.received / CHARS_PER_TOKEN,
+                                       (parser.first_output or sent) - sent, time.perf_counter() - sent)
+                return result
+            finally:
+                prompt_chars = sum(len(m.get("content") or "") for m in payload.get("messages", []))
+                telemetry.add_tokens(model, prompt=int(prompt_chars / CHARS_PER_TOKEN),
+                                     completion=int(parser.received / CHARS_PER_TOKEN))
+    except MalformedResponse as e:
+        raise RequestFailed(f"Invalid JSON: {e}")
+    except StreamError as e:
+        raise RequestFailed(f"API Error: {e}")
+    except requests.exceptions.Timeout:
+        raise RequestFailed("Request timed out")
+    except requests.exceptions.RequestException as e:
+        raise RequestFailed(f"API request failed: {e}")
+
+
+def _hedged(backend, payload, stream_keys, on_item, delay, estimated_tokens):
+    """
+    Run an attempt; if it hasn't finished after `delay` seconds (and the
+    rate limit allows), race a duplicate against it.
+    """
+    global _hedge_pool
+    with _registry_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+    # Only the first attempt to produce an item streams items to the caller
+    claim_lock = threading.Lock()
+    claimed = []
+
+    def forward(index):
+        if on_item is None:
+            return None
+
+        def callback(key, item):
+            with claim_lock:
+                if not claimed:
+                    claimed.append(index)
+            if claimed[0] == index:
+                on_item(key, item)
+        return callback
+
+    responses = [[], []]
+    attempt = telemetry.bind(_attempt)
+    futures = [_hedge_pool.submit(attempt, backend, payload, stream_keys, forward(0), responses[0])]
+    done, _ = wait(futures, timeout=delay)
+    if not done and shared_limiter().try_acquire(estimated_tokens):
+        sys.stderr.write(f"Hedging request to {payload['model']} after {delay:.1f}s\n")
+        futures.append(_hedge_pool.submit(attempt, backend, payload, stream_keys, forward(1), responses[1]))
+
+    pending = set(futures)
+    first_error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                # Stop the slower duplicate from streaming any further
+                for other in pending:
+                    for response in responses[futures.index(other)]:
+                        response.close()
+                return future.result()
+            first_error = first_error or future.exception()
+    raise first_error
+
+
+def request_json(payload, models, stream_keys=(), on_item=None, estimated_tokens=0, label="Request",
+                 backend=None):
+    """
+    Send a chat completion and return its parsed JSON answer.
+
+    Args:
+        payload: Request body without "model"; "stream" is forced on.
+        models: Models to try in order (see model_chain()).
+        stream_keys / on_item: See llm_stream.read_json(). With hedging,
+            items come from whichever attempt produced one first.
+        estimated_tokens: Token estimate passed to the rate limiter.
+        label: Prefix for log lines, e.g. "Chunk 3".
+        backend: Backend to send with (default: shared_backend()).
+
+    Returns:
+        The parsed object, or {"error": "..."} once every model has failed.
+    """
+    backend = backend or shared_backend()
+    limiter = shared_limiter()
+    errors = []
+    last_error = None
+
+    for model in models:
+        model_breaker = breaker(model)
+        body = dict(payload, model=model, stream=True)
+        last_error = None
+
+        for attempt in range(MAX_RETRIES + 1):
+            if not model_breaker.allow():
+                last_error = last_error or RequestFailed(f"Circuit open for {model}")
+                break
+
+            with telemetry.span("rate_limit"):
+                waited = limiter.acquire(estimated_tokens)
+            if waited > 0:
+                sys.stderr.write(f"{label}: Waited {waited:.1f}s for rate limit\n")
+
+            started = time.monotonic()
+            try:
+                delay = latency(model).percentile(HEDGE_PERCENTILE) if HEDGE_ENABLED else None
+                if delay is not None:
+                    result = _hedged(backend, body, stream_keys, on_item, max(HEDGE_MIN_DELAY, delay), estimated_tokens)
+                else:
+                    result = _attempt(backend, body, stream_keys, on_item, [])
+            except RequestFailed as e:
+                last_error = e
+                telemetry.count("ai_requests_total", model=model, outcome=str(e.status or "error"))
+                if e.status == 429:
+                    # Rate limited: pause every worker for the time the provider asks for
+                    retry_after = e.retry_after if e.retry_after is not None else 2 ** (attempt + 2)
+                    limiter.penalize(retry_after)
+                    sys.stderr.write(f"{label}: Rate limited, retrying in {retry_after:.1f}s\n")
+                else:
+                    model_breaker.record_failure()
+                if not e.retryable or attempt == MAX_RETRIES:
+                    break
+                if e.status != 429:
+                    delay = e.retry_after if e.retry_after is not None else backoff(attempt)
+                    sys.stderr.write(f"{label}: {e}; retrying {model} in {delay:.1f}s\n")
+                    time.sleep(delay)
+                continue
+
+            latency(model).add(time.monotonic() - started)
+            model_breaker.record_success()
+            telemetry.count("ai_requests_total", model=model, outcome="ok")
+            return result
+
+        errors.append(f"{model}: {last_error}")
+        if last_error is not None and last_error.fatal:
+            break
+        sys.stderr.write(f"{label}: {model} failed ({last_error})\n")
+
+    if len(errors) == 1 and last_error is not None:
+        return {"error": str(last_error)}
+    return {"error": "All models failed: " + "; ".join(errors)}
@@ -0,0 +1,39 @@
+"""
+Environment configuration, loaded on first use.
+
+Importing a pipeline module has no side effects: the .env file is read
+(into os.environ, never overriding variables that are already set) only
+when load_env() or api_key() is first called. Entry points call
+load_env() before importing the pipeline, so module-level settings such
+as OPENROUTER_MAX_WORKERS see the .env values too.
+"""
+import os
+import threading
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_env():
+    """Read the .env file next to the package into os.environ (once)."""
+    global _loaded
+    with _lock:
+        if _loaded:
+            return
+        _loaded = True
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
+
+def api_key():
+    """
+    The OpenRouter API key.
+
+    Raises:
+        ValueError: No key in the environment or the .env file.
+    """
+    load_env()
+    key = os.getenv("OPENROUTER_API_KEY")
+    if not key:
+        raise ValueError("OPENROUTER_API_KEY not found. Please create a .env file and add your key.")
+    return key
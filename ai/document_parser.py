@@ -1,38 +1,12 @@
-import PyPDF2
-import requests
-from bs4 import BeautifulSoup
+try:
+    from . import text_extractor
+except ImportError:
+    import text_extractor
 
 def extract_text_from_pdf(file_stream):
     """Extracts text from a PDF file stream."""
-    try:
-        reader = PyPDF2.PdfReader(file_stream)
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        return text
-    except Exception as e:
-        print(f"Error reading PDF: {e}")
-        return None
+    return text_extractor.from_pdf(file_stream)
 
 def fetch_text_from_url(url):
     """Fetches and extracts clean text from a URL."""
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status() 
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-   
-        for script_or_style in soup(["script", "style"]):
-            script_or_style.decompose()
-            
-        # Get text and clean it up
-        text = soup.get_text()
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
-        return text
-    except requests.RequestException as e:
-        print(f"Error fetching URL {url}: {e}")
-        return None
\ No newline at end of file
+    return text_extractor.from_url(url)
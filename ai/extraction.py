@@ -0,0 +1,196 @@
+"""
+Document text extraction.
+
+One entry point, extract(), turns an uploaded file (bytes or a path) into
+normalized text plus a page map. Each format is a plug-in registered with
+@extractor; a plug-in takes the raw bytes and returns a list of
+(page_no, text) tuples.
+"""
+import io
+import os
+import re
+import zipfile
+from xml.etree import ElementTree
+
+try:
+    from .fetcher import html_to_text
+    from .text_extractor import pdf_pages
+except ImportError:
+    from fetcher import html_to_text
+    from text_extractor import pdf_pages
+
+EXTRACTORS = {}
+MIME_TYPES = {}
+EXTENSIONS = {}
+
+# Leading bytes that identify a format when no usable MIME type or name is given
+MAGIC = [
+    (b"%PDF", "pdf"),
+    (b"PK\x03\x04", "docx"),
+    (b"\x89PNG", "image"),
+    (b"\xff\xd8\xff", "image"),
+    (b"RIFF", "image"),
+]
+
+# Same result as the backend's former replace() chain (CRLF -> LF, blank
+# lines collapsed, runs of spaces/tabs -> one space, form feeds dropped),
+# in a single pass
+WHITESPACE = re.compile(r"(?P<newline>[\r\f]*\n(?:[\r\f]*\n)*[\r\f]*)|(?P<space>[ \t]+)|(?P<drop>[\r\f]+)")
+REPLACEMENTS = {"newline": "\n", "space": " ", "drop": ""}
+
+
+class ExtractionError(Exception):
+    """The document is unsupported, unreadable or contains no text."""
+
+
+def extractor(name, mime_types=(), extensions=()):
+    """Register a plug-in for a document format."""
+    def register(func):
+        EXTRACTORS[name] = func
+        for mime_type in mime_types:
+            MIME_TYPES[mime_type] = name
+        for extension in extensions:
+            EXTENSIONS[extension] = name
+        return func
+    return register
+
+
+def normalize(text):
+    """Collapse whitespace the way contract text is fed to the models."""
+    return WHITESPACE.sub(lambda m: REPLACEMENTS[m.lastgroup], text).strip()
+
+
+def detect_format(data, mime_type=None, filename=None):
+    """
+    Pick the plug-in for a document: by MIME type, then file extension,
+    then leading bytes. Unknown documents are treated as plain text.
+    """
+    if mime_type:
+        mime_type = mime_type.split(";")[0].strip().lower()
+        if mime_type in MIME_TYPES:
+            return MIME_TYPES[mime_type]
+        if mime_type.startswith("image/"):
+            return "image"
+    if filename:
+        extension = os.path.splitext(filename)[1].lower()
+        if extension in EXTENSIONS:
+            return EXTENSIONS[extension]
+    for prefix, name in MAGIC:
+        if data.startswith(prefix):
+            return name
+    if data[:512].lstrip().lower().startswith((b"<!doctype html", b"<html")):
+        return "html"
+    return "text"
+
+
+@extractor("pdf", mime_types=["application/pdf"], extensions=[".pdf"])
+def extract_pdf(data):
+    pages = pdf_pages(data)
+    if pages is None:
+        raise ExtractionError("Could not read the PDF")
+    return pages
+
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+@extractor("docx",
+           mime_types=["application/vnd.openxmlformats-officedocument.wordprocessingml.document"],
+           extensions=[".docx"])
+def extract_docx(data):
+    """Paragraph text of a .docx, split into pages at explicit page breaks."""
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            document = archive.read("word/document.xml")
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise ExtractionError(f"Could not read the DOCX: {e}")
+
+    pages = [[]]
+    for paragraph in ElementTree.fromstring(document).iter(WORD_NS + "p"):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == WORD_NS + "t" and node.text:
+                parts.append(node.text)
+            elif node.tag == WORD_NS + "tab":
+                parts.append("\t")
+            elif node.tag == WORD_NS + "br" and node.get(WORD_NS + "type") == "page":
+                pages[-1].append("".join(parts))
+                pages.append([])
+                parts = []
+            elif node.tag == WORD_NS + "br":
+                parts.append("\n")
+        pages[-1].append("".join(parts))
+    return [(page_no, "\n".join(paragraphs)) for page_no, paragraphs in enumerate(pages, 1)]
+
+
+@extractor("html", mime_types=["text/html", "application/xhtml+xml"], extensions=[".html", ".htm"])
+def extract_html(data):
+    return [(1, html_to_text(data))]
+
+
+@extractor("text", mime_types=["text/plain", "text/markdown"], extensions=[".txt", ".md"])
+def extract_text(data):
+    """UTF-8 text; form feeds separate pages."""
+    text = data.decode("utf-8", errors="replace")
+    return list(enumerate(text.split("\f"), 1))
+
+
+@extractor("image", mime_types=["image/png", "image/jpeg", "image/jpg", "image/webp"],
+           extensions=[".png", ".jpg", ".jpeg", ".webp"])
+def extract_image(data):
+    """OCR with Tesseract (needs the optional pytesseract and Pillow packages)."""
+    try:
+        import pytesseract
+        from PIL import Image
+    except ImportError:
+        raise ExtractionError("Image OCR requires the pytesseract and Pillow packages")
+    try:
+        return [(1, pytesseract.image_to_string(Image.open(io.BytesIO(data)), lang="eng"))]
+    except Exception as e:
+        raise ExtractionError(f"OCR failed: {e}")
+
+
+def extract(source, mime_type=None, filename=None):
+    """
+    Extract normalized text from a document.
+
+    Args:
+        source: File contents as bytes, or a path to the file.
+        mime_type: Optional MIME type reported by the uploader.
+        filename: Optional original file name.
+
+    Returns:
+        {"text": ..., "page_starts": [...], "format": ...} where
+        page_starts[i] is the offset at which page i + 1 begins (pages
+        without text start where the next page does), or {"error": ...}.
+    """
+    try:
+        if isinstance(source, str):
+            filename = filename or source
+            with open(source, "rb") as document:
+                source = document.read()
+        fmt = detect_format(source, mime_type, filename)
+        pages = EXTRACTORS[fmt](source)
+    except (ExtractionError, OSError) as e:
+        return {"error": str(e)}
+
+    parts = []
+    page_starts = []
+    offset = 0
+    for page_no, page_text in pages:
+        page_text = normalize(page_text)
+        # Pages without text (or skipped by the plug-in) begin at the next page
+        while len(page_starts) < page_no:
+            page_starts.append(offset + 1 if parts else 0)
+        if not page_text:
+            continue
+        if parts:
+            offset += 1
+        page_starts[-1] = offset
+        parts.append(page_text)
+        offset += len(page_text)
+
+    text = "\n".join(parts)
+    if not text:
+        return {"error": "No text could be extracted from the document"}
+    return {"text": text, "page_starts": page_starts, "format": fmt}
@@ -0,0 +1,156 @@
+import importlib.util
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# requests and bs4 are imported on first use: they dominate the start-up
+# time of a worker that may never fetch or parse HTML
+
+try:
+    from .result_cache import ResultCache
+except ImportError:
+    from result_cache import ResultCache
+
+# --- Configuration ---
+USER_AGENT = "Mozilla/5.0"
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "15"))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "8"))
+FETCH_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "fetch.sqlite3")
+
+# lxml parses several times faster than the pure-Python html.parser
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+# Page furniture that never contains contract terms
+STRIP_ELEMENTS = ["script", "style", "nav", "footer", "header"]
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class FetchError(Exception):
+    """A page could not be fetched or was too large."""
+
+
+def html_to_text(html):
+    """Extract readable text from an HTML document (bytes or str)."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, HTML_PARSER)
+    for element in soup(STRIP_ELEMENTS):
+        element.decompose()
+    return soup.get_text(separator='\n', strip=True)
+
+
+class Fetcher:
+    """
+    Fetches web pages over pooled keep-alive connections and extracts
+    their text.
+
+    Responses carrying an ETag or Last-Modified header are remembered with
+    their extracted text; the next fetch of the same URL is a conditional
+    GET, and a 304 answer returns the cached text without downloading or
+    parsing the page again.
+
+    Args:
+        cache: ResultCache for validators and text, or None to disable.
+        max_bytes: Largest body that will be downloaded.
+        timeout: Connect/read timeout in seconds.
+        pool_size: Keep-alive connections kept per host.
+    """
+
+    def __init__(self, cache=None, max_bytes=FETCH_MAX_BYTES, timeout=FETCH_TIMEOUT, pool_size=FETCH_MAX_WORKERS):
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _read_body(self, response):
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            raise FetchError(f"body of {declared} bytes exceeds the {self.max_bytes} byte limit")
+
+        parts = []
+        received = 0
+        for part in response.iter_content(READ_CHUNK_BYTES):
+            received += len(part)
+            if received > self.max_bytes:
+                raise FetchError(f"body exceeds the {self.max_bytes} byte limit")
+            parts.append(part)
+        return b"".join(parts)
+
+    def fetch_text(self, url):
+        """
+        Fetch a URL and return its extracted text.
+
+        Raises:
+            FetchError: The request failed or the body was too large.
+        """
+        cached = self.cache.get(url) if self.cache is not None else None
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        import requests
+        try:
+            with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 304 and cached:
+                    return cached["text"]
+                response.raise_for_status()
+                body = self._read_body(response)
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except requests.RequestException as e:
+            raise FetchError(str(e)) from e
+
+        text = html_to_text(body)
+        if self.cache is not None and (etag or last_modified):
+            self.cache.set(url, {"etag": etag, "last_modified": last_modified, "text": text})
+        return text
+
+    def fetch_many(self, urls, max_workers=FETCH_MAX_WORKERS):
+        """
+        Fetch several URLs concurrently.
+
+        Returns:
+            List of extracted texts in the order of `urls`; None for pages
+            that failed.
+        """
+        def fetch_one(url):
+            try:
+                return self.fetch_text(url) or None
+            except FetchError as e:
+                print(f"Error fetching URL {url}: {e}")
+                return None
+
+        if not urls:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as executor:
+            return list(executor.map(fetch_one, urls))
+
+
+_shared_fetcher = None
+_shared_lock = threading.Lock()
+
+
+def shared_fetcher():
+    """
+    Process-wide fetcher configured from the environment: FETCH_CACHE_PATH
+    (empty string keeps the cache in memory only), FETCH_MAX_BYTES,
+    FETCH_TIMEOUT and FETCH_MAX_WORKERS. FETCH_CACHE_DISABLED turns the
+    conditional-GET cache off.
+    """
+    global _shared_fetcher
+    with _shared_lock:
+        if _shared_fetcher is None:
+            cache = None
+            if not os.getenv("FETCH_CACHE_DISABLED"):
+                cache = ResultCache(path=os.getenv("FETCH_CACHE_PATH", FETCH_CACHE_PATH) or None, memory_items=256)
+            _shared_fetcher = Fetcher(cache=cache)
+        return _shared_fetcher
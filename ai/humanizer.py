@@ -1,20 +1,40 @@
-import os
 import sys
-import requests
 import json
-from dotenv import load_dotenv
-import re
+import uuid
 
-# Load environment variables from .env file
-load_dotenv()
+# Run as a script: read .env before the settings below are evaluated
+if __name__ == "__main__":
+    try:
+        from .config import load_env
+    except ImportError:
+        from config import load_env
+    load_env()
+
+try:
+    from .result_cache import shared_cache, make_key
+    from .chunker import chunk_spans, estimate_tokens, token_budget, CHARS_PER_TOKEN
+    from .backends import DEFAULT_MODEL
+    from .completions import model_chain, request_json
+    from . import telemetry
+except ImportError:
+    from result_cache import shared_cache, make_key
+    from chunker import chunk_spans, estimate_tokens, token_budget, CHARS_PER_TOKEN
+    from backends import DEFAULT_MODEL
+    from completions import model_chain, request_json
+    import telemetry
 
 # --- Configuration ---
-API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not API_KEY:
-    raise ValueError("OPENROUTER_API_KEY not found. Please create a .env file and add your key.")
+# Requests go to the configured backend (LLM_BACKEND, see backends.py); the
+# API key and the .env file are read on first use (see config.py)
+MODEL = DEFAULT_MODEL
+# Tried in order when a model keeps failing (OPENROUTER_FALLBACK_MODELS)
+MODELS = model_chain(MODEL)
+TEMPERATURE = 0.7
 
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
-MODEL = "meta-llama/llama-3.3-70b-instruct: free"
+# Answer size limit, and the expected answer tokens per contract token
+# (the rewrite is about as long as the original, plus the key points)
+MAX_OUTPUT_TOKENS = 4000
+OUTPUT_RATIO = 1.1
 
 # --- Prompt Engineering ---
 HUMANIZER_PROMPT_TEMPLATE = """
@@ -47,209 +67,224 @@ Return your response as a JSON object with this structure:
 }}
 """
 
-def chunk_text(text, chunk_size=15000, overlap=500):
-    """
-    Split text into overlapping chunks to ensure content isn't cut off.
-    
-    Args:
-        text: The text to chunk
-        chunk_size: Maximum size of each chunk
-        overlap: Number of characters to overlap between chunks
-    
-    Returns:
-        List of text chunks
-    """
-    if len(text) <= chunk_size:
-        return [text]
-    
-    chunks = []
-    start = 0
-    
-    while start < len(text):
-        end = start + chunk_size
-        
-        # If this isn't the last chunk, try to break at a sentence or paragraph
-        if end < len(text):
-            # Look for sentence endings in the last 200 chars of the chunk
-            last_period = text.rfind('.', end - 200, end)
-            last_newline = text.rfind('\n', end - 200, end)
-            break_point = max(last_period, last_newline)
-            
-            if break_point > start:
-                end = break_point + 1
-        
-        chunks.append(text[start:end])
-        start = end - overlap  # Overlap to avoid missing content at boundaries
-    
-    return chunks
+# Several short clauses in one request; each comes back under its id
+CLAUSES_PROMPT_TEMPLATE = """
+You are a Legal Translator. Your job is to convert complex legal language into simple, everyday English that anyone can understand.
 
-def humanize_chunk(chunk, chunk_num, total_chunks):
+Below are several separate contract clauses, each starting with its id in square brackets. Rewrite EACH clause in plain language.  Follow these rules:
+1. Replace legal jargon with simple words
+2. Break down long sentences into shorter, clearer ones
+3. Explain what the clause actually means in practice
+4. Keep the same meaning but make it conversational
+5. Use "you" and "we" instead of "the party" and "the other party"
+
+Clauses to humanize:
+---
+{clauses}
+---
+
+IMPORTANT: Return ONLY a valid JSON object. Use \\n for newlines in strings. Do not include any text before or after the JSON.
+Return exactly one entry per clause, using the clause's id unchanged.
+
+Return your response as a JSON object with this structure:
+{{
+  "clauses": [
+    {{
+      "id": "<clause id, e.g. c1>",
+      "humanized_text": "<the simplified clause>",
+      "key_points": ["<most important thing to know>", "<second most important thing>"]
+    }}
+  ]
+}}
+"""
+
+# Rounds of re-issuing clauses that came back missing or malformed
+MAX_CLAUSE_ROUNDS = 3
+
+def humanize_chunk(chunk, chunk_num, total_chunks, on_key_point=None):
     """
     Humanize a single chunk of contract text.
     
+    The completion is streamed and parsed incrementally; output that isn't
+    the requested JSON object is rejected as soon as that is certain.
+    Retries, backoff and model fallback happen in completions.request_json.
+    
     Args:
         chunk: The text chunk to humanize
         chunk_num: Current chunk number (1-indexed)
         total_chunks: Total number of chunks
+        on_key_point: Optional callback receiving each key point as soon as
+            the model has finished writing it
     
     Returns:
         Dictionary with humanized results or error
     """
     sys.stderr.write(f"Humanizing chunk {chunk_num}/{total_chunks} ({len(chunk)} characters)...\n")
     
+    # Identical chunk + prompt + model was humanized before: skip the API call
+    cache = shared_cache()
+    cache_key = make_key(HUMANIZER_PROMPT_TEMPLATE, ",".join(MODELS), TEMPERATURE, chunk)
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            telemetry.count("ai_cache_hits_total", stage="humanize")
+            sys.stderr.write(f"Chunk {chunk_num}: Cache hit\n")
+            return cached
+    
     prompt = HUMANIZER_PROMPT_TEMPLATE.format(contract_text=chunk)
 
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
-
     payload = {
-        "model": MODEL,
         "messages": [
             {"role": "user", "content": prompt}
         ],
-        "max_tokens": 4000,
-        "temperature": 0.7
+        "max_tokens": MAX_OUTPUT_TOKENS,
+        "temperature": TEMPERATURE
     }
 
     try:
-        response = requests.post(OPENROUTER_URL, headers=headers, json=payload, timeout=90)
-        response.raise_for_status()
-        
-        response_data = response.json()
-        
-        if "choices" not in response_data or len(response_data["choices"]) == 0:
-            sys.stderr.write(f"Chunk {chunk_num}: Invalid response structure\n")
-            return {"error": "Invalid API response structure"}
-        
-        ai_response = response_data["choices"][0]["message"]["content"]
-        
-        if not ai_response or ai_response.strip() == "":
-            if "error" in response_data:
-                return {"error": f"API Error: {response_data['error']}"}
-            return {"error": "AI returned empty response"}
-        
-        sys.stderr.write(f"Chunk {chunk_num}: Received {len(ai_response)} character response\n")
-        sys.stderr.write(f"Chunk {chunk_num}: Response preview: {ai_response[:300]}\n")
-        
-        # Extract JSON from response - try multiple strategies
-        parsed_result = None
+        parsed_result = request_json(
+            payload, MODELS,
+            stream_keys=("key_points",),
+            on_item=(lambda key, point: on_key_point(point)) if on_key_point is not None else None,
+            estimated_tokens=len(prompt) // 4 + payload["max_tokens"],
+            label=f"Chunk {chunk_num}",
+        )
         
-        # Strategy 1: Try parsing the response directly (in case it's pure JSON)
-        try:
-            parsed_result = json.loads(ai_response)
-            sys.stderr.write(f"Chunk {chunk_num}: Parsed JSON successfully (Strategy 1)\n")
-        except json.JSONDecodeError:
-            pass
-        
-        # Strategy 2: Extract JSON from code blocks
-        if not parsed_result:
-            try:
-                # Remove markdown code blocks
-                cleaned = ai_response.strip()
-                if cleaned.startswith("```"):
-                    cleaned = re.sub(r'^```(?:json)?\s*', '', cleaned, flags=re.MULTILINE)
-                    cleaned = re.sub(r'\s*```$', '', cleaned, flags=re.MULTILINE)
-                
-                parsed_result = json.loads(cleaned)
-                sys.stderr.write(f"Chunk {chunk_num}: Parsed JSON successfully (Strategy 2)\n")
-            except (json.JSONDecodeError, AttributeError):
-                pass
-        
-        # Strategy 3: Find JSON object boundaries
-        if not parsed_result:
-            try:
-                # Find the outermost braces
-                start = ai_response.find('{')
-                end = ai_response.rfind('}')
-                if start != -1 and end != -1:
-                    json_str = ai_response[start:end+1]
-                    parsed_result = json.loads(json_str)
-                    sys.stderr.write(f"Chunk {chunk_num}: Parsed JSON successfully (Strategy 3)\n")
-            except (json.JSONDecodeError, ValueError):
-                pass
-        
-        # Strategy 4: Fallback - manually construct response from AI text
-        if not parsed_result:
-            sys.stderr.write(f"Chunk {chunk_num}: All JSON parsing failed, using fallback construction\n")
-            sys.stderr.write(f"Full AI response:\n{ai_response}\n")
-            
-            # Create a valid response using the AI's text even if it's not JSON
-            parsed_result = {
-                "humanized_text": ai_response.strip(),
-                "original_length": len(chunk.split()),
-                "simplified_length": len(ai_response.split()),
-                "key_points": ["AI did not return structured JSON - showing raw response"]
-            }
-            sys.stderr.write(f"Chunk {chunk_num}: Created fallback response\n")
+        if "error" in parsed_result:
+            sys.stderr.write(f"Chunk {chunk_num}: {parsed_result['error']}\n")
+            return parsed_result
         
         if "humanized_text" not in parsed_result:
             return {"error": "AI response missing 'humanized_text' field"}
         
         sys.stderr.write(f"Chunk {chunk_num}: Successfully humanized\n")
+        if cache is not None:
+            cache.set(cache_key, parsed_result)
         return parsed_result
         
-    except json.JSONDecodeError as e:
-        sys.stderr.write(f"Chunk {chunk_num}: JSON decode error: {e}\n")
-        sys.stderr.write(f"Raw AI response: {ai_response[:300] if 'ai_response' in locals() else 'N/A'}\n")
-        return {"error": f"Invalid JSON: {str(e)}"}
-    except requests.exceptions.Timeout:
-        sys.stderr.write(f"Chunk {chunk_num}: Request timed out\n")
-        return {"error": "Request timed out"}
-    except requests.exceptions.RequestException as e:
-        sys.stderr.write(f"Chunk {chunk_num}: Request failed: {e}\n")
-        return {"error": f"API request failed: {str(e)}"}
     except Exception as e:
         sys.stderr.write(f"Chunk {chunk_num}: Unexpected error: {e}\n")
         return {"error": f"Unexpected error: {str(e)}"}
 
-def simplify(text_content: str) -> dict:
+def dedup_key_points(points, seen_points, limit=5):
     """
-    Converts complex legal text into simple, everyday language.
-    Automatically chunks large contracts and combines results.
+    Keep key points not seen before, up to `limit` in total.
+    `seen_points` is updated in place so it can be reused across chunks.
+    """
+    unique_key_points = []
+    for point in points:
+        if len(seen_points) >= limit:
+            break
+        point_normalized = point.lower().strip()
+        if point_normalized and point_normalized not in seen_points:
+            seen_points.add(point_normalized)
+            unique_key_points.append(point)
+    return unique_key_points
 
-    Args:
-        text_content: The legal text to simplify.
+def chunk_event(result, chunk_num, total_chunks, seen_points):
+    """Turn one chunk's result into a simplify_iter() "chunk" or "error" event."""
+    if "error" in result:
+        return {"event": "error", "chunk": chunk_num, "total_chunks": total_chunks, "error": result["error"]}
+    
+    key_points = result["key_points"] if isinstance(result.get("key_points"), list) else []
+    return {
+        "event": "chunk",
+        "chunk": chunk_num,
+        "total_chunks": total_chunks,
+        "humanized_text": result["humanized_text"],
+        "key_points": dedup_key_points(key_points, seen_points),
+        "original_length": result.get("original_length", 0),
+        "simplified_length": result.get("simplified_length", 0)
+    }
 
-    Returns:
-        A dictionary containing the humanized text and key points, or an error.
+def chunk_budget(text_tokens, workers=1):
+    """Chunk size for `text_tokens` of contract text (see chunker.token_budget)."""
+    return token_budget(MODEL, text_tokens, MAX_OUTPUT_TOKENS, OUTPUT_RATIO, workers)
+
+def simplify_iter(text_content: str):
+    """
+    Streaming version of simplify(): yields each chunk's plain-English text
+    as soon as it is ready.
+
+    Yields dictionaries with an "event" key:
+        {"event": "start", "total_chunks": n}
+        {"event": "chunk", "chunk": i, "total_chunks": n, "humanized_text": "...",
+         "key_points": [...], "original_length": w, "simplified_length": w}
+            (key_points only holds points not yielded before, max 5 overall)
+        {"event": "error", "chunk": i, "total_chunks": n, "error": "..."}
+        {"event": "done", "chunks_done": k, "warnings": [...]}
+    or a single {"event": "error", "error": "..."} for invalid input.
     """
     if not text_content or not text_content.strip():
-        return {"error": "Input text is empty or contains only whitespace."}
+        yield {"event": "error", "error": "Input text is empty or contains only whitespace."}
+        return
     
     sys.stderr.write(f"Humanizing contract with {len(text_content)} characters\n")
     
-    # Split into chunks if text is large
-    chunks = chunk_text(text_content, chunk_size=15000, overlap=500)
-    total_chunks = len(chunks)
+    # Split into clause-aligned chunks sized for the model's token budget;
+    # the chunks are humanized one after the other
+    with telemetry.span("chunk", chars=len(text_content)):
+        spans = chunk_spans(text_content, chunk_budget(estimate_tokens(text_content)))
+    total_chunks = len(spans)
     
     sys.stderr.write(f"Split into {total_chunks} chunk(s)\n")
+    yield {"event": "start", "total_chunks": total_chunks}
+    
+    seen_points = set()
+    chunks_done = 0
+    errors = []
     
-    # Humanize each chunk
+    for i, (start, end) in enumerate(spans, 1):
+        result = humanize_chunk(text_content[start:end], i, total_chunks)
+        event = chunk_event(result, i, total_chunks, seen_points)
+        if event["event"] == "error":
+            errors.append(f"Chunk {i}: {result['error']}")
+        else:
+            chunks_done += 1
+        yield event
+    
+    sys.stderr.write(f"Successfully humanized {chunks_done} chunk(s)\n")
+    yield {"event": "done", "chunks_done": chunks_done, "warnings": errors}
+
+def simplify(text_content: str) -> dict:
+    """
+    Converts complex legal text into simple, everyday language.
+    Automatically chunks large contracts and combines results.
+
+    Args:
+        text_content: The legal text to simplify.
+
+    Returns:
+        A dictionary containing the humanized text and key points, or an error.
+    """
+    return collect(simplify_iter(text_content), text_content)
+
+def collect(events, text_content):
+    """
+    Build simplify()'s result from simplify_iter() events: the chunks'
+    text joined in order, their key points and word counts, plus warnings
+    for chunks that failed.
+    """
     humanized_parts = []
-    all_key_points = []
+    unique_key_points = []
     total_original_words = 0
     total_simplified_words = 0
     errors = []
     
-    for i, chunk in enumerate(chunks, 1):
-        result = humanize_chunk(chunk, i, total_chunks)
-        
-        if "error" in result:
-            errors.append(f"Chunk {i}: {result['error']}")
-            continue
-        
-        if "humanized_text" in result:
-            humanized_parts.append(result["humanized_text"])
+    for event in events:
+        if event["event"] == "error":
+            if "chunk" not in event:
+                return {"error": event["error"]}
+            errors.append(f"Chunk {event['chunk']}: {event['error']}")
+        elif event["event"] == "chunk":
+            humanized_parts.append(event["humanized_text"])
+            unique_key_points.extend(event["key_points"])
             
             # Aggregate metadata
-            if "original_length" in result:
-                total_original_words += result["original_length"]
-            if "simplified_length" in result:
-                total_simplified_words += result["simplified_length"]
-            if "key_points" in result and isinstance(result["key_points"], list):
-                all_key_points.extend(result["key_points"])
+            if isinstance(event["original_length"], int):
+                total_original_words += event["original_length"]
+            if isinstance(event["simplified_length"], int):
+                total_simplified_words += event["simplified_length"]
     
     # If all chunks failed, return error
     if errors and not humanized_parts:
@@ -258,20 +293,6 @@ def simplify(text_content: str) -> dict:
     # Combine all humanized parts
     combined_text = "\n\n".join(humanized_parts)
     
-    # Deduplicate key points (keep unique ones)
-    unique_key_points = []
-    seen_points = set()
-    for point in all_key_points:
-        point_normalized = point.lower().strip()
-        if point_normalized and point_normalized not in seen_points:
-            seen_points.add(point_normalized)
-            unique_key_points.append(point)
-    
-    # Limit to most important 5 key points
-    unique_key_points = unique_key_points[:5]
-    
-    sys.stderr.write(f"Successfully humanized {len(humanized_parts)} chunk(s)\n")
-    
     result = {
         "original_length": total_original_words if total_original_words > 0 else len(text_content.split()),
         "simplified_length": total_simplified_words if total_simplified_words > 0 else len(combined_text.split()),
@@ -285,6 +306,264 @@ def simplify(text_content: str) -> dict:
     
     return result
 
+def write_result(events, text_content, out):
+    """
+    Write simplify()'s result for simplify_iter() events to `out` as JSON,
+    writing each chunk's text as soon as it arrives instead of joining all
+    of them into one string first. The fields are simplify()'s, with
+    "humanized_text" first.
+
+    Nothing is written before the first chunk succeeds. A failure after it
+    (an exception from `events`, or an error event for the whole text)
+    still closes the object, with the message in an "error" field, so the
+    output is always one valid JSON object.
+    """
+    key_points = []
+    total_original_words = 0
+    total_simplified_words = 0
+    counted_words = 0
+    errors = []
+    failure = None
+    started = False
+    
+    try:
+        for event in events:
+            if event["event"] == "error":
+                if "chunk" not in event:
+                    failure = event["error"]
+                    break
+                errors.append(f"Chunk {event['chunk']}: {event['error']}")
+            elif event["event"] == "chunk":
+                # Parts are joined by a blank line, written as the JSON escape
+                out.write("\\n\\n" if started else '{"humanized_text": "')
+                out.write(json.dumps(event["humanized_text"])[1:-1])
+                started = True
+                counted_words += len(event["humanized_text"].split())
+                key_points.extend(event["key_points"])
+                if isinstance(event["original_length"], int):
+                    total_original_words += event["original_length"]
+                if isinstance(event["simplified_length"], int):
+                    total_simplified_words += event["simplified_length"]
+    except Exception as e:
+        if not started:
+            raise
+        failure = f"Unexpected error: {str(e)}"
+    
+    if not started:
+        json.dump({"error": failure or f"Humanization failed: {'; '.join(errors)}"}, out)
+        return
+    
+    rest = {
+        "original_length": total_original_words if total_original_words > 0 else len(text_content.split()),
+        "simplified_length": total_simplified_words if total_simplified_words > 0 else counted_words,
+        "key_points": key_points
+    }
+    if errors:
+        rest["warnings"] = errors
+    if failure:
+        rest["error"] = failure
+    out.write('", ' + json.dumps(rest)[1:])
+
+async def asimplify(text_content: str, tenant=None, priority="interactive", scheduler=None, weight=1.0) -> dict:
+    """
+    Asyncio version of simplify(); the chunks are queued on the fair
+    scheduler like analyzer.arun()'s.
+
+    Args:
+        text_content: The legal text to simplify.
+        tenant: Tenant the requests are billed to (default: DEFAULT_TENANT).
+        priority: "interactive" or "batch".
+        scheduler: Scheduler to use (default: shared_scheduler()).
+        weight: Share of this document among the tenant's documents in
+            flight (see Scheduler.submit()).
+
+    Returns:
+        The same dictionary as simplify().
+    """
+    if not text_content or not text_content.strip():
+        return simplify(text_content)
+    
+    sys.stderr.write(f"Humanizing contract with {len(text_content)} characters\n")
+    
+    import asyncio
+    try:
+        from .scheduler import DEFAULT_TENANT, shared_scheduler
+    except ImportError:
+        from scheduler import DEFAULT_TENANT, shared_scheduler
+    
+    scheduler = scheduler or shared_scheduler()
+    with telemetry.span("chunk", chars=len(text_content)):
+        spans = chunk_spans(text_content, chunk_budget(estimate_tokens(text_content), scheduler.max_concurrency))
+    total_chunks = len(spans)
+    request_id = uuid.uuid4().hex
+    results = await asyncio.gather(*(
+        scheduler.submit(humanize_chunk, text_content[start:end], i, total_chunks,
+                         tenant=tenant or DEFAULT_TENANT, request_id=request_id, priority=priority,
+                         cost=estimate_tokens(end - start), weight=weight)
+        for i, (start, end) in enumerate(spans, 1)
+    ))
+    
+    seen_points = set()
+    events = [chunk_event(result, i, total_chunks, seen_points) for i, result in enumerate(results, 1)]
+    return collect(events, text_content)
+
+def pack_clauses(clauses, ids, max_chars):
+    """
+    Group clause ids into batches whose clause text fits `max_chars`.
+    Clauses too long for any batch are returned separately.
+
+    Returns:
+        (batches, oversized) - lists of ids
+    """
+    batches = []
+    oversized = []
+    size = max_chars
+    for clause_id in ids:
+        length = len(clauses[clause_id]) + len(clause_id) + 4
+        if length > max_chars:
+            oversized.append(clause_id)
+            continue
+        if size + length > max_chars:
+            batches.append([])
+            size = 0
+        batches[-1].append(clause_id)
+        size += length
+    return batches, oversized
+
+def humanize_batch(clauses, batch, label):
+    """
+    Humanize one batch of clauses in a single request.
+
+    Args:
+        clauses: Mapping of clause id to clause text.
+        batch: Ids of the clauses to send.
+        label: Prefix for log lines.
+
+    Returns:
+        Mapping of clause id to {"humanized_text", "key_points"} for the
+        clauses that came back well-formed, or {"error": ...}.
+    """
+    body = "\n\n".join(f"[{clause_id}] {clauses[clause_id]}" for clause_id in batch)
+    prompt = CLAUSES_PROMPT_TEMPLATE.format(clauses=body)
+
+    payload = {
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": MAX_OUTPUT_TOKENS,
+        "temperature": TEMPERATURE
+    }
+
+    try:
+        parsed_result = request_json(
+            payload, MODELS,
+            estimated_tokens=estimate_tokens(prompt) + payload["max_tokens"],
+            label=label,
+        )
+    except ValueError as e:
+        # No API key configured
+        return {"error": str(e)}
+    if "error" in parsed_result:
+        return parsed_result
+
+    wanted = set(batch)
+    results = {}
+    entries = parsed_result.get("clauses")
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        clause_id = str(entry.get("id", "")).strip("[] ")
+        text = entry.get("humanized_text")
+        if clause_id not in wanted or clause_id in results or not isinstance(text, str) or not text.strip():
+            continue
+        key_points = entry.get("key_points")
+        results[clause_id] = {
+            "humanized_text": text,
+            "key_points": [p for p in key_points if isinstance(p, str)] if isinstance(key_points, list) else []
+        }
+    return results
+
+def humanize_clauses(clause_texts):
+    """
+    Humanizes many (typically short) clauses with as few requests as
+    possible: clauses are packed into prompts up to the model's token
+    budget, tagged with stable ids ("c1", "c2", ... by position), and the
+    structured answer is split back per clause. Clauses that come back
+    missing or malformed are re-issued (up to MAX_CLAUSE_ROUNDS rounds);
+    clauses too long for one prompt go through simplify().
+
+    Args:
+        clause_texts: List of clause strings.
+
+    Returns:
+        List in input order; each entry is {"humanized_text", "key_points",
+        "original_length", "simplified_length"} or {"error": ...}.
+    """
+    clauses = {f"c{i}": text for i, text in enumerate(clause_texts, 1)}
+    results = {}
+    cache = shared_cache()
+    models_key = ",".join(MODELS)
+
+    pending = []
+    for clause_id, text in clauses.items():
+        if not isinstance(text, str) or not text.strip():
+            results[clause_id] = {"error": "Clause is empty"}
+            continue
+        cached = cache.get(make_key(CLAUSES_PROMPT_TEMPLATE, models_key, TEMPERATURE, text)) if cache is not None else None
+        if cached is not None:
+            telemetry.count("ai_cache_hits_total", stage="humanize_clauses")
+            results[clause_id] = cached
+        else:
+            pending.append(clause_id)
+
+    sys.stderr.write(f"Humanizing {len(pending)} of {len(clauses)} clause(s)\n")
+    pending_tokens = sum(estimate_tokens(clauses[clause_id]) for clause_id in pending)
+    max_chars = int(chunk_budget(pending_tokens) * CHARS_PER_TOKEN)
+    with telemetry.span("chunk", clauses=len(pending)):
+        batches, oversized = pack_clauses(clauses, pending, max_chars)
+
+    for clause_id in oversized:
+        result = simplify(clauses[clause_id])
+        results[clause_id] = result if "error" in result else {
+            "humanized_text": result["humanized_text"],
+            "key_points": result["key_points"]
+        }
+
+    errors = {}
+    for round_num in range(1, MAX_CLAUSE_ROUNDS + 1):
+        if not batches:
+            break
+        sys.stderr.write(f"Round {round_num}: {len(batches)} request(s) for {sum(map(len, batches))} clause(s)\n")
+        missing = []
+        for n, batch in enumerate(batches, 1):
+            answers = humanize_batch(clauses, batch, f"Round {round_num} batch {n}")
+            if "error" in answers:
+                for clause_id in batch:
+                    errors[clause_id] = answers["error"]
+                missing.extend(batch)
+                continue
+            for clause_id in batch:
+                if clause_id in answers:
+                    results[clause_id] = answers[clause_id]
+                    if cache is not None:
+                        cache.set(make_key(CLAUSES_PROMPT_TEMPLATE, models_key, TEMPERATURE, clauses[clause_id]), answers[clause_id])
+                else:
+                    errors[clause_id] = "Clause missing or malformed in the AI response"
+                    missing.append(clause_id)
+        batches, _ = pack_clauses(clauses, missing, max_chars)
+
+    ordered = []
+    for clause_id, text in clauses.items():
+        result = results.get(clause_id) or {"error": errors.get(clause_id, "Clause was not humanized")}
+        if "error" not in result:
+            result = dict(
+                result,
+                original_length=len(text.split()),
+                simplified_length=len(result["humanized_text"].split())
+            )
+        ordered.append(result)
+    return ordered
+
 def humanize_clause(clause_text: str) -> dict:
     """
     Simplified wrapper for humanizing a single clause. 
@@ -295,9 +574,10 @@ def humanize_clause(clause_text: str) -> dict:
     Returns:
         A dictionary with the simplified version. 
     """
-    return simplify(clause_text)
+    return humanize_clauses([clause_text])[0]
 
 # Main execution block - reads from stdin and outputs to stdout
+# (pass --ndjson to stream per-chunk events instead of one final object)
 if __name__ == "__main__":
     try:
         # Read input from stdin
@@ -308,8 +588,9 @@ if __name__ == "__main__":
             sys.stdout.flush()
             sys.exit(1)
         
-        # Parse the JSON input
+        # Parse the JSON input; only the parsed text is kept from here on
         request_data = json.loads(input_data)
+        del input_data
         contract_text = request_data.get("contract_text", "")
         
         if not contract_text:
@@ -317,12 +598,16 @@ if __name__ == "__main__":
             sys.stdout.flush()
             sys.exit(1)
         
-        # Run the humanization
-        result = simplify(contract_text)
+        # NDJSON mode: one JSON event per line as each chunk completes
+        if "--ndjson" in sys.argv[1:]:
+            for event in simplify_iter(contract_text):
+                print(json.dumps(event))
+                sys.stdout.flush()
+            sys.exit(0)
         
-        # Output the result as JSON to stdout
-        output = json.dumps(result)
-        print(output)
+        # Run the humanization, writing the result to stdout as it is produced
+        write_result(simplify_iter(contract_text), contract_text, sys.stdout)
+        print()
         sys.stdout.flush()
         
     except json.JSONDecodeError as e:
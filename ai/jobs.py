@@ -0,0 +1,473 @@
+"""
+Durable job queue for analyses that outlive an HTTP request.
+
+Analyzing or humanizing a long contract takes minutes, and waiting for it
+ties up a connection and a worker for all of that time. With jobs, a
+request only stores the upload and returns a job id:
+
+  - submit() queues the upload (or text) in SQLite and returns at once.
+  - A pool of worker processes (python jobs.py serve) drains the queue
+    oldest first. A worker claims a job under a lease of LEASE seconds and
+    renews it while the job runs; the job of a worker that died is queued
+    again once its lease expires, and failed after MAX_ATTEMPTS runs.
+  - Every "chunk" / "error" event of analyzer.run_iter,
+    humanizer.simplify_iter or combined.run_iter is stored as it happens,
+    so status() reports progress (chunks done out of total) and the
+    partial result; the collected result is stored when the job ends and
+    can be fetched with result() until RETENTION has passed.
+
+A job is "queued", "running", "done" or "failed". Writes of a worker are
+tied to its attempt, so a worker whose lease was taken over can't overwrite
+the progress of the run that replaced it.
+
+Usage:
+    python jobs.py serve [--workers N] [--max-jobs N]
+    python jobs.py submit contract.pdf [--task analyze|humanize|combined]
+    python jobs.py status JOB_ID [--after SEQ] [--result]
+"""
+import argparse
+import contextlib
+import json
+import mimetypes
+import multiprocessing
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+# Read .env before any module evaluates its settings
+if __name__ == "__main__":
+    try:
+        from .config import load_env
+    except ImportError:
+        from config import load_env
+    load_env()
+
+try:
+    from .worker import MIN_TEXT_CHARS, STREAM_TASKS, pipeline
+except ImportError:
+    from worker import MIN_TEXT_CHARS, STREAM_TASKS, pipeline
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "jobs.sqlite3")
+
+# --- Configuration ---
+# Worker processes of `python jobs.py serve`
+WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Seconds a claimed job stays with its worker without a renewal
+LEASE = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# Runs of a job (the first plus retries after a worker died)
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Finished jobs (and their results) are deleted after this long
+RETENTION = float(os.getenv("JOB_RETENTION_HOURS", "168")) * 3600
+# Seconds an idle worker waits before looking for a job again
+POLL_INTERVAL = 0.5
+# Seconds between purges of expired jobs by the supervisor
+PURGE_INTERVAL = 600
+
+
+class LeaseLost(Exception):
+    """The job was taken over by another worker (or deleted) while running."""
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue, shared by any number of processes.
+
+    Args:
+        path: SQLite file. None keeps the queue in memory (one process only).
+        lease: Seconds a claimed job stays with its worker without renewal.
+        max_attempts: Runs of a job before it is failed.
+        retention: Seconds finished jobs are kept.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, lease=LEASE, max_attempts=MAX_ATTEMPTS, retention=RETENTION):
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self._lock = threading.Lock()
+
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, task TEXT NOT NULL, status TEXT NOT NULL, options TEXT NOT NULL,"
+            " text TEXT, file BLOB, mime_type TEXT, filename TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0, lease_until REAL,"
+            " total_chunks INTEGER, chunks_done INTEGER NOT NULL DEFAULT 0, events INTEGER NOT NULL DEFAULT 0,"
+            " result TEXT, error TEXT, code TEXT,"
+            " created REAL NOT NULL, started REAL, finished REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            " job_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL, PRIMARY KEY (job_id, seq)) WITHOUT ROWID"
+        )
+
+    @contextlib.contextmanager
+    def _write(self):
+        """One write transaction; IMMEDIATE so two workers never claim the same job."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def submit(self, task, text=None, file=None, mime_type=None, filename=None, options=None):
+        """
+        Queue a job.
+
+        Args:
+            task: "analyze", "humanize" or "combined".
+            text: Contract text, or
+            file: the raw bytes of an upload (see extraction.extract) with
+                its mime_type and filename.
+            options: {"rules_only": bool, "document_id": str} (analyze only).
+
+        Returns:
+            The job id.
+
+        Raises:
+            ValueError: Unknown task, or neither text nor file.
+        """
+        if task not in STREAM_TASKS:
+            raise ValueError(f"Unknown task: {task}")
+        if not text and not file:
+            raise ValueError("No text or file provided")
+        job_id = uuid.uuid4().hex
+        with self._write():
+            self._db.execute(
+                "INSERT INTO jobs (id, task, status, options, text, file, mime_type, filename, created)"
+                " VALUES (?, ?, 'queued', ?, ?, ?, ?, ?, ?)",
+                (job_id, task, json.dumps(options or {}), text, file, mime_type, filename, time.time()),
+            )
+        return job_id
+
+    def claim(self):
+        """
+        Take the oldest queued job, first re-queuing the jobs of workers
+        whose lease expired.
+
+        Returns:
+            The job's input ({"id", "task", "options", "text", "file",
+            "mime_type", "filename", "attempt"}), or None if the queue is
+            empty.
+        """
+        now = time.time()
+        with self._write():
+            self._db.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, text = NULL, file = NULL,"
+                " error = 'Job abandoned: its worker stopped ' || attempts || ' time(s)'"
+                " WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            self._db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running' AND lease_until < ?", (now,))
+            row = self._db.execute(
+                "SELECT id, task, options, text, file, mime_type, filename, attempts FROM jobs"
+                " WHERE status = 'queued' ORDER BY created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            job_id = row[0]
+            # A retried job starts over
+            self._db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, started = ?,"
+                " total_chunks = NULL, chunks_done = 0, events = 0 WHERE id = ?",
+                (now + self.lease, now, job_id),
+            )
+            self._db.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+        return {
+            "id": job_id, "task": row[1], "options": json.loads(row[2]), "text": row[3], "file": row[4],
+            "mime_type": row[5], "filename": row[6], "attempt": row[7] + 1,
+        }
+
+    def _update(self, job, assignments, params=()):
+        """Update a running job if it still belongs to this attempt; raises LeaseLost otherwise."""
+        cursor = self._db.execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ? AND attempts = ? AND status = 'running'",
+            (*params, job["id"], job["attempt"]),
+        )
+        if cursor.rowcount == 0:
+            raise LeaseLost(job["id"])
+
+    def renew(self, job):
+        """Extend the lease of a running job. Returns False if it was lost."""
+        try:
+            with self._write():
+                self._update(job, "lease_until = ?", (time.time() + self.lease,))
+        except LeaseLost:
+            return False
+        return True
+
+    def record(self, job, event):
+        """
+        Store one pipeline event of a running job: "start" sets the number
+        of chunks, "chunk" and chunk "error" events count as done and are
+        kept as the partial result. Returns the event.
+        """
+        kind = event.get("event")
+        with self._write():
+            if kind == "start":
+                self._update(job, "total_chunks = ?", (event["total_chunks"],))
+            elif kind in ("chunk", "error") and "chunk" in event:
+                self._update(job, "chunks_done = chunks_done + 1, events = events + 1, lease_until = ?",
+                             (time.time() + self.lease,))
+                seq = self._db.execute("SELECT events FROM jobs WHERE id = ?", (job["id"],)).fetchone()[0]
+                self._db.execute("INSERT INTO job_events (job_id, seq, event) VALUES (?, ?, ?)",
+                                 (job["id"], seq, json.dumps(event)))
+        return event
+
+    def finish(self, job, result=None, error=None, code=None):
+        """Store the outcome of a running job and drop its input."""
+        now = time.time()
+        with self._write():
+            if error is None:
+                self._update(job, "status = 'done', result = ?, finished = ?, text = NULL, file = NULL",
+                             (json.dumps(result), now))
+            else:
+                self._update(job, "status = 'failed', error = ?, code = ?, finished = ?, text = NULL, file = NULL",
+                             (error, code, now))
+
+    def status(self, job_id, after=0):
+        """
+        State of a job.
+
+        Args:
+            after: Only return partial-result events with a higher "seq"
+                (pass the "next" of the previous poll).
+
+        Returns:
+            {"id", "task", "status", "total_chunks", "chunks_done",
+            "attempts", "created", "started", "finished", "events": [...],
+            "next"}, plus "error" and "code" for failed jobs; None for an
+            unknown (or purged) job.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT task, status, total_chunks, chunks_done, events, attempts, created, started, finished,"
+                " error, code FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            events = [
+                {"seq": seq, **json.loads(event)}
+                for seq, event in self._db.execute(
+                    "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+                )
+            ]
+        task, status, total_chunks, chunks_done, count, attempts, created, started, finished, error, code = row
+        state = {
+            "id": job_id, "task": task, "status": status, "total_chunks": total_chunks, "chunks_done": chunks_done,
+            "attempts": attempts, "created": created, "started": started, "finished": finished,
+            "events": events, "next": max(count, after),
+        }
+        if status == "failed":
+            state["error"] = error
+            state["code"] = code
+        return state
+
+    def result(self, job_id):
+        """
+        Outcome of a job: {"id", "task", "status"}, plus "result" once it is
+        done or "error" / "code" if it failed. None for an unknown job.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT task, status, result, error, code FROM jobs WHERE id = ?",
+                                   (job_id,)).fetchone()
+        if row is None:
+            return None
+        task, status, result, error, code = row
+        outcome = {"id": job_id, "task": task, "status": status}
+        if status == "done":
+            outcome["result"] = json.loads(result)
+        elif status == "failed":
+            outcome["error"] = error
+            outcome["code"] = code
+        return outcome
+
+    def purge(self):
+        """Delete jobs finished more than `retention` seconds ago. Returns how many."""
+        cutoff = time.time() - self.retention
+        with self._write():
+            expired = self._db.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished < ?", (cutoff,)
+            ).fetchall()
+            self._db.executemany("DELETE FROM job_events WHERE job_id = ?", expired)
+            self._db.executemany("DELETE FROM jobs WHERE id = ?", expired)
+        return len(expired)
+
+    def stats(self):
+        """Number of jobs per status."""
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+_shared_queue = None
+_shared_lock = threading.Lock()
+
+
+def shared_queue():
+    """
+    Process-wide queue at JOB_QUEUE_PATH (default .cache/jobs.sqlite3),
+    the file the backend and `python jobs.py serve` share.
+    """
+    global _shared_queue
+    with _shared_lock:
+        if _shared_queue is None:
+            _shared_queue = JobQueue(os.getenv("JOB_QUEUE_PATH") or DEFAULT_QUEUE_PATH)
+        return _shared_queue
+
+
+def execute(queue, job):
+    """Run one claimed job, storing its progress and then its outcome."""
+    task = job["task"]
+    options = job["options"]
+    text, page_starts = job["text"] or "", None
+    if job["file"] is not None:
+        extracted = pipeline("extraction").extract(job["file"], job["mime_type"], job["filename"])
+        if "error" in extracted:
+            return queue.finish(job, error=extracted["error"], code="invalid_input")
+        text, page_starts = extracted["text"], extracted["page_starts"]
+    if len(text.strip()) < MIN_TEXT_CHARS[task]:
+        return queue.finish(job, error="Text is too short or missing", code="invalid_input")
+
+    kwargs = {"rules_only": True} if task == "analyze" and options.get("rules_only") else {}
+    if task in ("analyze", "combined") and page_starts:
+        kwargs["page_starts"] = page_starts
+    if task == "analyze" and options.get("document_id"):
+        # Revisions re-analyze only the changed clauses, without chunk events
+        result = pipeline("analyzer").run_revision(text, str(options["document_id"]), page_starts)
+    else:
+        module_name, name = STREAM_TASKS[task]
+        module = pipeline(module_name)
+        events = (queue.record(job, event) for event in getattr(module, name)(text, **kwargs))
+        result = module.collect(events) if task == "analyze" else module.collect(events, text)
+
+    if "error" in result:
+        return queue.finish(job, error=result["error"])
+    return queue.finish(job, result=result)
+
+
+def keep_lease(queue, job, stop):
+    """Renew a job's lease until `stop` is set (runs in a thread beside the job)."""
+    while not stop.wait(queue.lease / 3):
+        if not queue.renew(job):
+            return
+
+
+def work(path=DEFAULT_QUEUE_PATH, max_jobs=0):
+    """
+    Worker loop: run queued jobs one at a time (until `max_jobs` are done,
+    or the supervisor that started it is gone).
+    """
+    queue = JobQueue(path)
+    parent = os.getppid()
+    jobs_done = 0
+    while not max_jobs or jobs_done < max_jobs:
+        job = queue.claim()
+        if job is None:
+            if os.getppid() != parent:
+                sys.stderr.write("Job worker: Supervisor is gone, exiting\n")
+                return
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        sys.stderr.write(f"Job {job['id']}: {job['task']} (attempt {job['attempt']})\n")
+        stop = threading.Event()
+        threading.Thread(target=keep_lease, args=(queue, job, stop), daemon=True).start()
+        try:
+            execute(queue, job)
+        except LeaseLost:
+            sys.stderr.write(f"Job {job['id']}: Lease lost, another worker runs it now\n")
+        except Exception as e:
+            sys.stderr.write(f"Job {job['id']}: Unexpected error: {e}\n")
+            with contextlib.suppress(LeaseLost):
+                queue.finish(job, error=f"Unexpected error: {str(e)}")
+        finally:
+            stop.set()
+        jobs_done += 1
+    sys.stderr.write(f"Job worker: Finished {jobs_done} jobs, exiting for recycle\n")
+
+
+def serve(workers=WORKERS, max_jobs=0, path=DEFAULT_QUEUE_PATH):
+    """
+    Keep `workers` worker processes draining the queue, replacing any that
+    exit, and purge expired jobs. Runs until interrupted or terminated.
+    """
+    # Workers are spawned, not forked, so none inherits an open SQLite connection
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    queue = JobQueue(path)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    sys.stderr.write(f"Job queue {path}: serving with {workers} worker(s)\n")
+
+    last_purge = 0.0
+    try:
+        while True:
+            for process in processes:
+                if not process.is_alive() and process.exitcode:
+                    sys.stderr.write(f"Job worker {process.pid} exited with code {process.exitcode}\n")
+            processes = [process for process in processes if process.is_alive()]
+            while len(processes) < workers:
+                process = context.Process(target=work, args=(path, max_jobs), daemon=True)
+                process.start()
+                processes.append(process)
+
+            if time.time() - last_purge >= PURGE_INTERVAL:
+                purged = queue.purge()
+                if purged:
+                    sys.stderr.write(f"Job queue: Purged {purged} expired job(s)\n")
+                last_purge = time.time()
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Running jobs are picked up again once their lease expires
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Durable analysis job queue")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run worker processes draining the queue")
+    serve_parser.add_argument("--workers", type=int, default=WORKERS, help="Worker processes")
+    serve_parser.add_argument("--max-jobs", type=int, default=0,
+                              help="Replace each worker after this many jobs (0 = never)")
+
+    submit_parser = commands.add_parser("submit", help="Queue a document and print the job id")
+    submit_parser.add_argument("path", help="Contract file (.pdf, .txt, .md, .html)")
+    submit_parser.add_argument("--task", choices=sorted(STREAM_TASKS), default="analyze")
+
+    status_parser = commands.add_parser("status", help="Print a job's state as JSON")
+    status_parser.add_argument("job_id")
+    status_parser.add_argument("--after", type=int, default=0, help="Only events after this seq")
+    status_parser.add_argument("--result", action="store_true", help="Print the stored result instead")
+
+    args = parser.parse_args()
+    queue_path = os.getenv("JOB_QUEUE_PATH") or DEFAULT_QUEUE_PATH
+    if args.command == "serve":
+        sys.exit(serve(args.workers, args.max_jobs, queue_path))
+    if args.command == "submit":
+        with open(args.path, "rb") as f:
+            data = f.read()
+        print(shared_queue().submit(args.task, file=data, mime_type=mimetypes.guess_type(args.path)[0],
+                                    filename=os.path.basename(args.path)))
+        sys.exit(0)
+    state = shared_queue().result(args.job_id) if args.result else shared_queue().status(args.job_id, args.after)
+    if state is None:
+        print(json.dumps({"error": f"Unknown job: {args.job_id}"}))
+        sys.exit(1)
+    print(json.dumps(state, indent=2))
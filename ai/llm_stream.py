@@ -0,0 +1,329 @@
+"""
+Streamed (SSE) chat completions parsed as they arrive.
+
+The model is asked for a single JSON object. Instead of waiting for the
+whole completion and then searching it for JSON, the content deltas are fed
+to JsonStreamParser, which
+
+  - hands out each element of selected top-level arrays (e.g. "analysis")
+    as soon as its closing bracket arrives,
+  - stops reading once the top-level object is closed, and
+  - rejects output that cannot be the expected JSON object (no "{" near the
+    start, mismatched brackets, unquoted keys, missing or trailing commas,
+    invalid values) as soon as the offending character arrives, like
+    json.loads() would reject the whole text.
+"""
+import json
+import time
+
+try:
+    from . import telemetry
+except ImportError:
+    import telemetry
+
+# Text a model may put before the JSON object ("```json", "Here is ...")
+MAX_PREAMBLE_CHARS = 200
+
+WHITESPACE = " \t\r\n"
+
+
+class MalformedResponse(ValueError):
+    """The model's output is not (or can no longer become) the expected JSON object."""
+
+
+class StreamError(Exception):
+    """The provider reported an error inside the event stream."""
+
+
+class JsonStreamParser:
+    """
+    Incremental parser for one JSON object arriving in arbitrary pieces.
+
+    Args:
+        stream_keys: Top-level keys whose array elements are reported by
+            feed() one by one as they complete.
+        max_preamble: Characters tolerated before the opening "{".
+
+    Top-level values are decoded with json.loads() as soon as they end, so
+    only the value currently being received is buffered.
+    """
+
+    def __init__(self, stream_keys=(), max_preamble=MAX_PREAMBLE_CHARS):
+        self.stream_keys = set(stream_keys)
+        self.max_preamble = max_preamble
+        self.result = {}
+        self.complete = False
+        self.received = 0
+        self.first_output = None  # time.perf_counter() of the first piece
+
+        self._text = ""
+        self._offset = 0          # absolute position of self._text[0]
+        self._pos = 0             # absolute position of the next character to scan
+        self._stack = []          # [bracket, key, state] per open container, see feed()
+        self._key = None          # last top-level key read
+        self._in_string = False
+        self._escape = False
+        self._in_scalar = False   # inside a number, true, false or null
+        self._string_start = None
+        self._string_is_key = False
+        self._value_start = None  # start of the top-level value / stream item being read
+        self._value_kind = None   # "scalar" | "string" | "container"
+        self._value_depth = 0
+
+    def _fail(self, message):
+        raise MalformedResponse(f"{message} (at character {self._pos})")
+
+    def _watched(self):
+        """Is a value beginning at the current depth one we decode?"""
+        depth = len(self._stack)
+        if depth == 1:
+            return True
+        return depth == 2 and self._stack[1][0] == "[" and self._stack[1][1] in self.stream_keys
+
+    def _begin(self, kind):
+        self._value_start = self._pos
+        self._value_kind = kind
+        self._value_depth = len(self._stack)
+
+    def _finish(self, end, events):
+        raw = self._text[self._value_start - self._offset:end - self._offset]
+        self._value_start = None
+        try:
+            value = json.loads(raw, strict=False)
+        except json.JSONDecodeError as e:
+            self._fail(f"Invalid JSON value: {e}")
+        if self._value_depth == 1:
+            self.result[self._key] = value
+        else:
+            key = self._stack[1][1]
+            self.result[key].append(value)
+            events.append((key, value))
+
+    def feed(self, delta):
+        """
+        Add the next piece of output.
+
+        Returns:
+            List of (key, item) for stream_keys array elements completed by
+            this piece.
+
+        Raises:
+            MalformedResponse: The output can't be the expected JSON object.
+        """
+        # A container's state says what may come next: "first" (right after
+        # the opening bracket), "key" (after "," in an object), "colon",
+        # "value" (after ":", or "," in an array) or "next" ("," or the end)
+        events = []
+        if self.complete or not delta:
+            return events
+        if self.first_output is None:
+            self.first_output = time.perf_counter()
+        self.received += len(delta)
+        self._text += delta
+        end = self._offset + len(self._text)
+        text, offset = self._text, self._offset
+
+        while self._pos < end and not self.complete:
+            c = text[self._pos - offset]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        self._stack[-1][2] = "colon"
+                        if len(self._stack) == 1:
+                            self._key = json.loads(text[self._string_start - offset:self._pos + 1 - offset], strict=False)
+                    elif self._value_start is not None and self._value_kind == "string" \
+                            and self._value_depth == len(self._stack):
+                        self._finish(self._pos + 1, events)
+                self._pos += 1
+                continue
+
+            if not self._stack:
+                if c == "{":
+                    self._stack.append(["{", None, "first"])
+                elif self._pos >= self.max_preamble:
+                    self._fail("No JSON object at the start of the response")
+                self._pos += 1
+                continue
+
+            if self._value_start is not None and self._value_kind == "scalar" \
+                    and self._value_depth == len(self._stack) and (c in WHITESPACE or c in ",}]"):
+                self._finish(self._pos, events)
+
+            if self._in_scalar and (c in WHITESPACE or c in ',:{}[]"'):
+                self._in_scalar = False
+
+            frame = self._stack[-1]
+            state = frame[2]
+            if c in WHITESPACE:
+                pass
+            elif frame[0] == "{" and state in ("first", "key") and not (c == "}" and state == "first"):
+                # Only a key (or the end of an empty object) may follow "{" or ","
+                if c != '"':
+                    self._fail(f"Expected a quoted key, got {c!r}")
+                self._in_string, self._string_is_key, self._string_start = True, True, self._pos
+            elif c == ":":
+                if state != "colon":
+                    self._fail("Unexpected ':'")
+                frame[2] = "value"
+            elif state == "colon":
+                self._fail(f"Expected ':', got {c!r}")
+            elif c == ",":
+                if state != "next":
+                    self._fail("Unexpected ','")
+                frame[2] = "key" if frame[0] == "{" else "value"
+            elif c in "}]":
+                if state not in ("first", "next"):
+                    self._fail(f"Expected a value, got {c!r}")
+                self._close(c, events)
+            elif self._in_scalar:
+                pass
+            elif state == "next":
+                self._fail(f"Expected ',' or a closing bracket, got {c!r}")
+            else:
+                frame[2] = "next"
+                if c in "{[":
+                    if self._value_start is None and self._watched():
+                        if len(self._stack) == 1 and c == "[" and self._key in self.stream_keys:
+                            self.result[self._key] = []
+                        else:
+                            self._begin("container")
+                    self._stack.append([c, self._key if len(self._stack) == 1 else None, "first"])
+                elif c == '"':
+                    if self._value_start is None and self._watched():
+                        self._begin("string")
+                    self._in_string, self._string_is_key, self._string_start = True, False, self._pos
+                else:
+                    if self._value_start is None and self._watched():
+                        self._begin("scalar")
+                    self._in_scalar = True
+            self._pos += 1
+
+        # Keep only what an unfinished value or key still needs
+        keep = self._pos
+        if self._value_start is not None:
+            keep = min(keep, self._value_start)
+        if self._in_string:
+            keep = min(keep, self._string_start)
+        self._text = self._text[keep - self._offset:]
+        self._offset = keep
+        return events
+
+    def _close(self, c, events):
+        opening = self._stack.pop()[0]
+        if (opening, c) not in (("{", "}"), ("[", "]")):
+            self._fail(f"Mismatched {c!r}")
+        if self._value_start is not None and self._value_kind == "container" \
+                and self._value_depth == len(self._stack):
+            self._finish(self._pos + 1, events)
+        if not self._stack:
+            self.complete = True
+
+    def close(self):
+        """
+        Finish parsing.
+
+        Returns:
+            The decoded top-level object.
+
+        Raises:
+            MalformedResponse: The output was empty or ended early.
+        """
+        if not self.received:
+            raise MalformedResponse("AI returned empty response")
+        if not self.complete:
+            if not self._stack:
+                raise MalformedResponse("No JSON object in the response")
+            raise MalformedResponse("Response ended before the JSON object was complete")
+        return self.result
+
+
+def iter_content(response):
+    """
+    Yield the content deltas of a chat completion response.
+
+    Handles server-sent events ("data: {...}" lines ending with
+    "data: [DONE]") and, for providers that ignore "stream", a plain JSON
+    completion.
+
+    Raises:
+        StreamError: The provider sent an error instead of content, or a
+            line that isn't JSON.
+    """
+    if "application/json" in response.headers.get("Content-Type", ""):
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise StreamError(f"Malformed response: {e}")
+        if "error" in data:
+            raise StreamError(data["error"])
+        choices = data.get("choices") or []
+        if choices:
+            yield choices[0].get("message", {}).get("content") or ""
+        return
+
+    # SSE bodies are UTF-8; requests would assume Latin-1 for text/* otherwise
+    response.encoding = "utf-8"
+    for line in response.iter_lines(decode_unicode=True):
+        # Blank lines separate events; ":" lines are keep-alive comments
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            event = json.loads(data)
+        except json.JSONDecodeError as e:
+            raise StreamError(f"Malformed event: {e}")
+        if "error" in event:
+            raise StreamError(event["error"])
+        choices = event.get("choices") or []
+        if choices:
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+
+def read_json(response, stream_keys=(), on_item=None, parser=None):
+    """
+    Parse a streamed completion into a JSON object.
+
+    Args:
+        response: requests response opened with stream=True.
+        stream_keys: Top-level array keys whose elements go to `on_item`.
+        on_item: Optional callback(key, item), called as each element of a
+            stream_keys array completes.
+        parser: JsonStreamParser to use instead of a new one, e.g. to read
+            its character count afterwards.
+
+    Returns:
+        The decoded object. Reading stops as soon as it is complete.
+
+    Raises:
+        MalformedResponse, StreamError
+    """
+    if parser is None:
+        parser = JsonStreamParser(stream_keys)
+    # Parsing is interleaved with the network reads; only its own time counts as "parse"
+    timed = telemetry.ENABLED
+    parse_time = 0.0
+    for delta in iter_content(response):
+        if timed:
+            started = time.perf_counter()
+            events = parser.feed(delta)
+            parse_time += time.perf_counter() - started
+        else:
+            events = parser.feed(delta)
+        for key, item in events:
+            if on_item is not None:
+                on_item(key, item)
+        if parser.complete:
+            break
+    if timed:
+        telemetry.record("parse", parse_time, chars=parser.received)
+    return parser.close()
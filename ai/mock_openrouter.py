@@ -0,0 +1,194 @@
+"""
+Local OpenAI-compatible chat completions stub for offline benchmarks and
+manual testing.
+
+Answers analyzer, humanizer, combined and multi-clause prompts with canned JSON built
+from the prompt itself (risky sentences are quoted back, so anchoring and
+dedup see realistic input), streamed as server-sent events when the request
+asks for "stream".
+
+Usage:
+    python mock_openrouter.py [--port 8765] [--latency 0.2] [--jitter 0.1]
+                              [--error-rate 0.05] [--responses canned.json]
+
+Point the clients at it with LLM_BACKEND=openai and
+LLM_BASE_URL=http://127.0.0.1:8765/v1, or in-process with
+    backends.configure_shared_backend(backends.OpenAICompatibleBackend(server.url))
+backends.StubBackend answers with the same canned JSON without a server.
+"""
+import argparse
+import gzip
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Phrases whose sentences the stub reports as risky
+RISKY = re.compile(r"[^.\n]*(?:sole discretion|without notice|non-refundable|indemnify|waive|arbitration)[^.\n]*\.?",
+                   re.IGNORECASE)
+CLAUSE_ID = re.compile(r"^\[(c\d+)\]", re.MULTILINE)
+STREAM_PIECE = 16
+
+
+def contract_of(prompt):
+    """The contract text between the prompt's --- markers."""
+    parts = prompt.split("---")
+    return parts[1] if len(parts) >= 3 else prompt
+
+
+def canned_content(prompt, canned=None):
+    """JSON answer (as a string) for a prompt, shaped like the real model's."""
+    if canned:
+        for marker, content in canned.items():
+            if marker in prompt:
+                return content if isinstance(content, str) else json.dumps(content)
+
+    text = contract_of(prompt)
+    if '"clauses"' in prompt:
+        return json.dumps({"clauses": [
+            {"id": clause_id, "humanized_text": f"In plain words, clause {clause_id} means this.",
+             "key_points": [f"Key point of {clause_id}"]}
+            for clause_id in CLAUSE_ID.findall(text)
+        ]})
+    findings = [
+        {"clause_text": match.group().strip(), "risk_score": 7,
+         "explanation": "This lets the other party act against you.",
+         "recommendation": "Ask for notice and objective criteria."}
+        for match in RISKY.finditer(text)
+    ][:20]
+    if '"humanized_text"' in prompt:
+        words = text.split()
+        return json.dumps({
+            **({"analysis": findings} if '"analysis"' in prompt else {}),
+            "original_length": len(words),
+            "simplified_length": len(words) // 2,
+            "humanized_text": " ".join(words[: len(words) // 2]),
+            "key_points": ["You can be charged fees.", "They can end the contract at any time."],
+        })
+    return json.dumps({"analysis": findings})
+
+
+def stream_events(prompt, content):
+    """Server-sent events (bytes, one per event) streaming `content` like the real API."""
+    usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}
+    for i in range(0, len(content), STREAM_PIECE):
+        event = {"choices": [{"delta": {"content": content[i:i + STREAM_PIECE]}}]}
+        yield b"data: " + json.dumps(event).encode() + b"\n\n"
+    yield b"data: " + json.dumps({"choices": [], "usage": usage}).encode() + b"\n\n"
+    yield b"data: [DONE]\n\n"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        data = self.rfile.read(length)
+        if self.headers.get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        body = json.loads(data or b"{}")
+        server.count_request()
+
+        if server.latency or server.jitter:
+            time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+
+        if random.random() < server.error_rate:
+            self.send_response(random.choice([429, 500, 503]))
+            self.send_header("Content-Length", "0")
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        content = canned_content(prompt, server.canned)
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4}
+
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for event in stream_events(prompt, content):
+                self._chunk(event)
+            self._chunk(b"")
+            return
+
+        data = json.dumps({"choices": [{"message": {"content": content}}], "usage": usage}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Threaded stub server.
+
+    Args:
+        port: Port to listen on (0 picks a free one).
+        latency: Seconds to wait before answering.
+        jitter: Random +/- variation of the latency, in seconds.
+        error_rate: Fraction of requests answered with 429/500/503.
+        canned: Optional {prompt substring: response content} overrides.
+    """
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, port=0, latency=0.0, jitter=0.0, error_rate=0.0, canned=None):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.canned = canned
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clients close streams as soon as the JSON object is complete
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/chat/completions"
+
+
+def start_stub(**options):
+    """Start a StubServer in a background thread and return it."""
+    server = StubServer(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 429/5xx answers")
+    parser.add_argument("--responses", help="JSON file of {prompt substring: response content}")
+    args = parser.parse_args()
+
+    canned = None
+    if args.responses:
+        with open(args.responses, encoding="utf-8") as responses_file:
+            canned = json.load(responses_file)
+
+    server = StubServer(args.port, args.latency, args.jitter, args.error_rate, canned)
+    print(f"Stub listening on {server.url}")
+    server.serve_forever()
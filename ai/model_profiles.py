@@ -0,0 +1,186 @@
+"""
+Per-model profiles and latency-driven chunk sizing.
+
+A profile holds what chunk sizing needs to know about a model: its context
+window, its output limit and how fast it answers (seconds to the first
+output, output tokens per second). The speed figures start from the table
+below and are updated from every completed request (see
+completions._attempt), so they track the provider's current behaviour.
+
+plan_chunk_tokens() picks the chunk size that minimizes the predicted
+time to process a whole document: few large chunks pay the per-request
+latency less often, several smaller ones run in parallel, and no chunk may
+be so large that its answer would not fit the request's max_tokens.
+
+The planned size is then snapped to one of a few fixed sizes, so that
+drifting speed measurements or a slightly edited document rarely move
+chunk boundaries: repeat uploads keep hitting the result cache, which is
+keyed on the chunk text.
+"""
+import math
+import os
+import threading
+
+# --- Configuration ---
+ADAPTIVE = os.getenv("ADAPTIVE_CHUNKING", "1").lower() not in ("0", "false", "no")
+# Bounds for adaptive chunks, in contract tokens
+MIN_CHUNK_TOKENS = int(os.getenv("CHUNK_TOKEN_MIN", "1000"))
+MAX_CHUNK_TOKENS = int(os.getenv("CHUNK_TOKEN_MAX", "8000"))
+# Weight of each new measurement in the running averages
+SMOOTHING = 0.2
+# Completions shorter than this say little about the output speed
+MIN_SAMPLE_TOKENS = 50
+
+# Starting points; the speed figures are replaced by measurements. Suffixes
+# such as ":free" are ignored when looking a model up.
+DEFAULT_PROFILES = {
+    "meta-llama/llama-3.3-70b-instruct": {
+        "context_tokens": 131072, "output_tokens": 16384,
+        "first_token_seconds": 1.5, "tokens_per_second": 40.0,
+    },
+    "tngtech/deepseek-r1t2-chimera": {
+        "context_tokens": 163840, "output_tokens": 16384,
+        "first_token_seconds": 4.0, "tokens_per_second": 30.0,
+    },
+}
+FALLBACK_PROFILE = {
+    "context_tokens": 8192, "output_tokens": 4096,
+    "first_token_seconds": 2.0, "tokens_per_second": 30.0,
+}
+
+
+class ModelProfile:
+    """Limits and measured speed of one model."""
+
+    def __init__(self, name, context_tokens, output_tokens, first_token_seconds, tokens_per_second):
+        self.name = name
+        self.context_tokens = context_tokens
+        self.output_tokens = output_tokens
+        self.first_token_seconds = first_token_seconds
+        self.tokens_per_second = tokens_per_second
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def observe(self, completion_tokens, first_token_seconds, total_seconds):
+        """
+        Fold one completed request into the running averages.
+
+        Args:
+            completion_tokens: Output tokens received.
+            first_token_seconds: Time from sending the request to the first output.
+            total_seconds: Time from sending the request to the end of the output.
+        """
+        output_seconds = total_seconds - first_token_seconds
+        with self._lock:
+            self.samples += 1
+            self.first_token_seconds += SMOOTHING * (first_token_seconds - self.first_token_seconds)
+            if completion_tokens >= MIN_SAMPLE_TOKENS and output_seconds > 0:
+                rate = completion_tokens / output_seconds
+                self.tokens_per_second += SMOOTHING * (rate - self.tokens_per_second)
+
+    def predict_seconds(self, completion_tokens):
+        """Expected duration of a request producing `completion_tokens`."""
+        return self.first_token_seconds + completion_tokens / max(self.tokens_per_second, 1e-6)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "model": self.name,
+                "context_tokens": self.context_tokens,
+                "output_tokens": self.output_tokens,
+                "first_token_seconds": round(self.first_token_seconds, 3),
+                "tokens_per_second": round(self.tokens_per_second, 2),
+                "samples": self.samples,
+            }
+
+
+_profiles = {}
+_profiles_lock = threading.Lock()
+
+
+def model_name(model):
+    """Profile key of a model id: "vendor/model:free" -> "vendor/model"."""
+    return (model or "").split(":")[0].strip()
+
+
+def profile(model):
+    """The process-wide profile of `model`, created on first use."""
+    name = model_name(model)
+    with _profiles_lock:
+        found = _profiles.get(name)
+        if found is None:
+            found = _profiles[name] = ModelProfile(name, **DEFAULT_PROFILES.get(name, FALLBACK_PROFILE))
+        return found
+
+
+def observe(model, completion_tokens, first_token_seconds, total_seconds):
+    """Record a completed request of `model` (see ModelProfile.observe)."""
+    profile(model).observe(completion_tokens, first_token_seconds, total_seconds)
+
+
+def snapshot():
+    """Every profile used so far, as dictionaries."""
+    with _profiles_lock:
+        profiles = list(_profiles.values())
+    return [p.to_dict() for p in profiles]
+
+
+def max_chunk_tokens(model, output_tokens, output_ratio, overhead_tokens):
+    """
+    Largest chunk whose request fits the model: the prompt and answer fit
+    the context window, and the expected answer (output_ratio tokens per
+    contract token) fits the request's max_tokens.
+    """
+    p = profile(model)
+    by_context = p.context_tokens - min(output_tokens, p.output_tokens) - overhead_tokens
+    by_output = min(output_tokens, p.output_tokens) / output_ratio if output_ratio else by_context
+    return max(256, int(min(by_context, by_output, MAX_CHUNK_TOKENS)))
+
+
+def plan_chunk_tokens(model, text_tokens, output_tokens, output_ratio, overhead_tokens, workers=1):
+    """
+    Chunk budget (in contract tokens) minimizing the predicted time to
+    process `text_tokens` with `workers` requests in flight.
+
+    Args:
+        model: Model the chunks are sent to.
+        text_tokens: Size of the text to chunk.
+        output_tokens: The request's max_tokens.
+        output_ratio: Expected answer tokens per contract token.
+        overhead_tokens: Prompt template tokens per request.
+        workers: Chunks processed concurrently.
+    """
+    limit = max_chunk_tokens(model, output_tokens, output_ratio, overhead_tokens)
+    if text_tokens <= MIN_CHUNK_TOKENS:
+        return limit
+
+    p = profile(model)
+    workers = max(1, workers)
+    fewest = math.ceil(text_tokens / limit)
+    most = max(fewest, math.ceil(text_tokens / min(MIN_CHUNK_TOKENS, limit)))
+
+    best_chunks, best_seconds = fewest, None
+    for chunks in range(fewest, most + 1):
+        size = text_tokens / chunks
+        waves = math.ceil(chunks / workers)
+        seconds = waves * p.predict_seconds(size * output_ratio)
+        if best_seconds is None or seconds < best_seconds:
+            best_chunks, best_seconds = chunks, seconds
+
+    # Whole clauses rarely fill a chunk exactly: leave some slack so the
+    # planned number of chunks isn't exceeded
+    return snap_chunk_tokens(text_tokens / best_chunks * 1.15, limit)
+
+
+def snap_chunk_tokens(budget, limit):
+    """
+    The chunk size nearest to `budget` (by ratio) among MIN_CHUNK_TOKENS
+    times a power of two, and `limit` itself.
+    """
+    sizes = []
+    size = MIN_CHUNK_TOKENS
+    while size < limit:
+        sizes.append(size)
+        size *= 2
+    sizes.append(limit)
+    return min(sizes, key=lambda size: abs(math.log(size / budget)))
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    A classic token bucket: holds up to `capacity` units and refills
+    continuously at `capacity` units per minute.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` units are available (0 if available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter combining a requests-per-minute bucket and an
+    optional tokens-per-minute bucket.
+
+    Workers call `acquire()` before every API request. When the provider
+    answers 429, the worker calls `penalize()` with the Retry-After delay
+    and every worker holds off until that moment has passed.
+
+    Args:
+        requests_per_minute: Request quota. 0 or less disables the limit.
+        tokens_per_minute: Token quota. 0 or less disables the limit.
+    """
+
+    def __init__(self, requests_per_minute=20, tokens_per_minute=0):
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._blocked_until = 0.0
+
+    def acquire(self, tokens=0):
+        """
+        Block until one request carrying `tokens` tokens fits the quota.
+
+        Returns:
+            The number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = max(0.0, self._blocked_until - now)
+                if self._requests:
+                    delay = max(delay, self._requests.wait_time(1, now))
+                if self._tokens and tokens:
+                    delay = max(delay, self._tokens.wait_time(tokens, now))
+                if delay <= 0:
+                    if self._requests:
+                        self._requests.take(1)
+                    if self._tokens and tokens:
+                        self._tokens.take(tokens)
+                    return waited
+            time.sleep(delay)
+            waited += delay
+
+    def try_acquire(self, tokens=0):
+        """
+        Take one request carrying `tokens` tokens only if it fits the quota
+        right now. Never blocks.
+
+        Returns:
+            True if the request may be sent.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._blocked_until > now:
+                return False
+            if self._requests and self._requests.wait_time(1, now) > 0:
+                return False
+            if self._tokens and tokens and self._tokens.wait_time(tokens, now) > 0:
+                return False
+            if self._requests:
+                self._requests.take(1)
+            if self._tokens and tokens:
+                self._tokens.take(tokens)
+            return True
+
+    def penalize(self, retry_after):
+        """
+        Pause all callers for `retry_after` seconds, e.g. after a 429.
+        The request bucket is also drained so traffic resumes gradually.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+            if self._requests:
+                self._requests._refill(now)
+                self._requests.level = 0.0
+
+
+def parse_retry_after(value, default=None):
+    """
+    Parse a Retry-After header (delta-seconds or HTTP-date) into seconds.
+    Returns `default` when the header is missing or malformed.
+    """
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def shared_limiter():
+    """
+    Process-wide limiter configured from the environment:
+    OPENROUTER_REQUESTS_PER_MINUTE (default 20) and
+    OPENROUTER_TOKENS_PER_MINUTE (default 0, unlimited).
+    """
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter(
+                requests_per_minute=float(os.getenv("OPENROUTER_REQUESTS_PER_MINUTE", "20")),
+                tokens_per_minute=float(os.getenv("OPENROUTER_TOKENS_PER_MINUTE", "0")),
+            )
+        return _shared_limiter
+
+
+def configure_shared_limiter(requests_per_minute=None, tokens_per_minute=None):
+    """
+    Replace the process-wide limiter, e.g. from command-line options.
+    Arguments left as None fall back to the environment defaults.
+    """
+    global _shared_limiter
+    with _shared_lock:
+        _shared_limiter = RateLimiter(
+            requests_per_minute=requests_per_minute if requests_per_minute is not None
+            else float(os.getenv("OPENROUTER_REQUESTS_PER_MINUTE", "20")),
+            tokens_per_minute=tokens_per_minute if tokens_per_minute is not None
+            else float(os.getenv("OPENROUTER_TOKENS_PER_MINUTE", "0")),
+        )
+        return _shared_limiter
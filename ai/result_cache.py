@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "results.sqlite3")
+
+
+def make_key(template, model, temperature, text):
+    """
+    Content-addressed cache key for one LLM call.
+
+    Any change to the prompt template, model, temperature or chunk text
+    produces a different key, so stale results are never served.
+    """
+    digest = hashlib.sha256()
+    for part in (template, model, repr(temperature), text):
+        data = part.encode("utf-8")
+        # Length-prefix each part so ("ab", "c") and ("a", "bc") differ
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache for chunk results: an in-memory LRU in front of an
+    on-disk SQLite table.
+
+    Args:
+        path: SQLite file. None keeps only the memory tier.
+        memory_items: Maximum number of entries kept in memory.
+        max_disk_bytes: Size budget of the SQLite tier. Least recently used
+            rows are evicted once it is exceeded.
+        ttl: Seconds an entry stays valid. 0 or less means forever.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, memory_items=512, max_disk_bytes=256 * 1024 * 1024, ttl=30 * 24 * 3600):
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._db = None
+        self._disk_bytes = 0
+
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results(accessed)")
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def _expired(self, created, now):
+        return self.ttl > 0 and now - created > self.ttl
+
+    def _remember(self, key, created, value):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached result for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return json.loads(value)
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, size, created FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value, size, created = row
+                    if not self._expired(created, now):
+                        self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+                        self._remember(key, created, value)
+                        self._counters["disk_hits"] += 1
+                        return json.loads(value)
+                    self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._disk_bytes -= size
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key, result):
+        """Store a JSON-serializable result under `key`."""
+        value = json.dumps(result)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self._counters["writes"] += 1
+            if self._db is None:
+                return
+
+            size = len(value) + len(key)
+            old = self._db.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._disk_bytes -= old[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._disk_bytes += size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Drop expired rows first, then least recently used ones until the
+        # table is back under 90% of its budget
+        if self.ttl > 0:
+            self._db.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl,))
+        target = self.max_disk_bytes * 0.9
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if self._disk_bytes <= target:
+            return
+
+        evicted = []
+        for key, size in self._db.execute("SELECT key, size FROM results ORDER BY accessed"):
+            if self._disk_bytes <= target:
+                break
+            evicted.append((key,))
+            self._disk_bytes -= size
+        self._db.executemany("DELETE FROM results WHERE key = ?", evicted)
+        self._counters["evictions"] += len(evicted)
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+            self._disk_bytes = 0
+
+    def stats(self):
+        """Hit/miss counters plus current tier sizes."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_bytes"] = self._disk_bytes
+            lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+            stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+            return stats
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache():
+    """
+    Process-wide cache configured from the environment:
+    RESULT_CACHE_PATH (empty string keeps results in memory only),
+    RESULT_CACHE_MEMORY_ITEMS, RESULT_CACHE_MAX_BYTES and RESULT_CACHE_TTL.
+    Returns None when RESULT_CACHE_DISABLED is set.
+    """
+    global _shared_cache
+    if os.getenv("RESULT_CACHE_DISABLED"):
+        return None
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResultCache(
+                path=os.getenv("RESULT_CACHE_PATH", DEFAULT_CACHE_PATH) or None,
+                memory_items=int(os.getenv("RESULT_CACHE_MEMORY_ITEMS", "512")),
+                max_disk_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+                ttl=float(os.getenv("RESULT_CACHE_TTL", str(30 * 24 * 3600))),
+            )
+        return _shared_cache
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "revisions.sqlite3")
+
+# Leading enumeration ("4.", "Section 12", "(b)") is dropped before hashing so
+# renumbering a contract doesn't make every later clause look modified
+_ENUMERATION = re.compile(r"^\s*(?:(?:section|article|clause)\s+)?(?:\d+(?:\.\d+)*[.)]?|\([a-z0-9]{1,4}\)|[ivxlc]+[.)])\s+",
+                          re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def strip_enumeration(text):
+    """Drop a leading "4.", "Section 12", "(b)" etc. from a clause."""
+    return _ENUMERATION.sub("", text, count=1)
+
+
+def normalize_clause(text):
+    """Lowercase, drop enumeration and collapse whitespace."""
+    return strip_enumeration(_WHITESPACE.sub(" ", text.lower()).strip())
+
+
+def fingerprint(text):
+    """
+    Stable fingerprint of a clause's normalized text. Whitespace, case and
+    numbering changes keep the fingerprint; any wording change alters it.
+    """
+    return hashlib.blake2b(normalize_clause(text).encode("utf-8"), digest_size=12).hexdigest()
+
+
+def locate(text, needle, start=0, end=None):
+    """
+    Find `needle` in text[start:end] ignoring whitespace differences.
+
+    Returns:
+        (start, end) of the match in `text`, or None
+    """
+    end = len(text) if end is None else end
+    words = needle.split()
+    if not words:
+        return None
+    position = text.find(needle.strip(), start, end)
+    if position != -1:
+        return position, position + len(needle.strip())
+    pattern = r"\s+".join(re.escape(word) for word in words)
+    match = re.compile(pattern).search(text, start, end)
+    if match:
+        return match.start(), match.end()
+    return None
+
+
+class RevisionStore:
+    """
+    Remembers, per document, the findings of every clause of the most recent
+    analyzed version, keyed by clause fingerprint.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS revisions ("
+            " document_id TEXT PRIMARY KEY, clauses TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def load(self, document_id):
+        """Return {fingerprint: [findings]} for the previous version, or {}."""
+        with self._lock:
+            row = self._db.execute("SELECT clauses FROM revisions WHERE document_id = ?", (document_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save(self, document_id, clauses):
+        """Replace the stored findings of `document_id`."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO revisions (document_id, clauses, updated) VALUES (?, ?, ?)",
+                (document_id, json.dumps(clauses), time.time()),
+            )
+
+    def delete(self, document_id):
+        with self._lock:
+            self._db.execute("DELETE FROM revisions WHERE document_id = ?", (document_id,))
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def shared_store():
+    """Process-wide store at REVISION_STORE_PATH (default ai/.cache/)."""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = RevisionStore(os.getenv("REVISION_STORE_PATH") or DEFAULT_STORE_PATH)
+        return _shared_store
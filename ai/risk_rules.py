@@ -0,0 +1,163 @@
+import re
+from bisect import bisect_left
+
+# --- Risk Phrase Library ---
+# (name, weight 1-10, pattern, explanation, recommendation)
+# Weights double as the risk_score of rule-based findings.
+RISK_RULES = [
+    ("unilateral_discretion", 7,
+     r"(?:sole|absolute|complete)(?: and (?:absolute|exclusive))? discretion|for any reason or no reason|for any reason whatsoever",
+     "The other party can act purely on its own judgment, without having to justify the decision to you.",
+     "Ask for objective criteria or a requirement to act reasonably and in good faith."),
+    ("without_notice", 8,
+     r"without (?:any |prior |advance |further )?(?:written )?notice",
+     "Action can be taken against you without warning, leaving no time to respond.",
+     "Request a written notice period (e.g. 30 days) before any such action."),
+    ("no_refunds", 7,
+     r"no refunds?|non-?refundable|(?:will|shall) not (?:be )?refund(?:ed)?|not entitled to (?:a |any )?refund",
+     "You may lose money you have already paid.",
+     "Negotiate a pro-rated refund, at least when the other party ends the agreement."),
+    ("indemnification", 7,
+     r"indemnif(?:y|ies|ied|ication)|hold (?:us |the company |us and our affiliates )?harmless|defend,? indemnify",
+     "You could have to pay the other party's legal costs and damages.",
+     "Limit the indemnity to claims caused by your own breach or negligence, and cap it."),
+    ("class_action_waiver", 8,
+     r"class[- ]action (?:waiver|lawsuits?)|(?:waive|waiving) (?:your |any )?right to (?:a )?jury trial|representative (?:action|proceeding)",
+     "You cannot join with others to bring a claim, or cannot have a jury.",
+     "Push to remove the class-action and jury-trial waivers."),
+    ("waiver", 6,
+     r"waives?(?: any| all| your)? (?:rights?|claims?)|waiver of (?:any |all )?(?:rights?|claims?)",
+     "You are giving up legal rights you would otherwise have.",
+     "Ask which rights are waived and strike waivers of statutory rights."),
+    ("arbitration", 7,
+     r"binding arbitration|(?:mandatory|individual) arbitration|submit(?:ted)? to arbitration|arbitration (?:agreement|clause)",
+     "Disputes must go to private arbitration instead of a court.",
+     "Request an opt-out window or the option to use small-claims court."),
+    ("auto_renewal", 6,
+     r"automatic(?:ally)? renew(?:s|ed|al)?|auto-?renew(?:s|al)?|renews? automatically|evergreen",
+     "The contract renews and keeps charging you unless you actively cancel.",
+     "Ask for a renewal reminder and an easy cancellation method before each term."),
+    ("limitation_of_liability", 6,
+     r"in no event (?:shall|will)|limitation of liability|(?:shall|will) not be (?:held )?liable|disclaims? (?:all|any) (?:warranties|liability)|(?:provided|offered) (?:on an )?[\"']?as[ -]is[\"']?",
+     "The other party limits or excludes its responsibility if something goes wrong.",
+     "Ask for a liability cap that is at least the fees paid, and carve-outs for gross negligence."),
+    ("unilateral_changes", 6,
+     r"(?:may|reserves? the right to) (?:change|modify|amend|update|revise) (?:these|this|the|any)(?: terms| agreement| prices?| fees)?|changes? (?:will be|are) effective (?:immediately|upon posting)",
+     "Terms can be changed after you agree, possibly without your consent.",
+     "Require advance notice of changes and the right to terminate if you disagree."),
+    ("termination", 5,
+     r"(?:terminate|suspend|disable|cancel) (?:your|this|the) (?:account|agreement|access|subscription|service)",
+     "Your access or the agreement can be ended by the other party.",
+     "Ask for termination only for material breach, with notice and a chance to fix it."),
+    ("data_sharing", 7,
+     r"(?:sell|share|disclose|transfer|rent) (?:your |such )?(?:personal )?(?:data|information) (?:with|to) (?:third[- ]part|affiliates|partners|advertisers)",
+     "Your personal information may be passed on to other companies.",
+     "Ask for an opt-out and a list of the recipients and purposes."),
+    ("broad_license", 6,
+     r"perpetual|irrevocable|royalty-free|worldwide,? (?:non-exclusive )?licen[cs]e|sublicensable",
+     "You may be granting broad, permanent rights over your content or work.",
+     "Limit the license to what is needed to provide the service, ending when you leave."),
+    ("fees_and_penalties", 5,
+     r"late (?:fee|charge)s?|penalt(?:y|ies)|liquidated damages|(?:price|fee)s? (?:may|will) (?:increase|change)",
+     "You could face extra charges or price increases.",
+     "Ask for caps on fees and advance notice of price changes."),
+    ("non_compete", 6,
+     r"non-?compet(?:e|ition)|(?:shall|will|agree to) not (?:compete|solicit)",
+     "You are restricted from working with competitors or soliciting clients.",
+     "Narrow the scope, duration and geography of the restriction."),
+    ("jurisdiction", 3,
+     r"exclusive jurisdiction|(?:governed by|governing law)|venue (?:shall|will) be",
+     "Disputes may have to be handled in a distant or unfamiliar legal system.",
+     "Ask for your local courts and law to apply."),
+    ("assignment", 4,
+     r"may (?:assign|transfer) (?:this|these|its rights)",
+     "The other party can hand the contract to someone else without your approval.",
+     "Require your consent for assignment, or the right to terminate if it happens."),
+    ("monitoring", 5,
+     r"monitor (?:your )?(?:use|communications|activity|content)|(?:track|record) your (?:activity|usage|location)",
+     "Your activity may be watched or recorded.",
+     "Ask what is collected, how long it is kept and how to opt out."),
+]
+
+# All rules in one alternation; the named group of a match tells which rule
+# fired. The shared leading \b lets the engine reject mid-word positions
+# before trying any branch. Compiled by the first scan (it takes several
+# milliseconds, which import shouldn't pay).
+RISK_SOURCE = r"\b(?:" + "|".join(rf"(?P<r{i}>{pattern})" for i, (_, _, pattern, _, _) in enumerate(RISK_RULES)) + r")\b"
+_risk_pattern = None
+
+_SENTENCE_BREAK = re.compile(r"[.;!?](?=\s)|\n")
+MAX_SENTENCE = 600
+
+
+def scan(text):
+    """
+    Find every risk phrase in the text in a single pass.
+
+    Returns:
+        Sorted list of (start, end, rule_index) tuples.
+    """
+    global _risk_pattern
+    if _risk_pattern is None:
+        _risk_pattern = re.compile(RISK_SOURCE, re.IGNORECASE)
+    return [(m.start(), m.end(), int(m.lastgroup[1:])) for m in _risk_pattern.finditer(text)]
+
+
+def score_span(matches, start, end):
+    """
+    Risk score of text[start:end]: the summed weight of the distinct rules
+    matching inside it. `matches` is the output of scan().
+    """
+    lo = bisect_left(matches, (start,))
+    hi = bisect_left(matches, (end,))
+    rules = {rule for _, _, rule in matches[lo:hi]}
+    return sum(RISK_RULES[rule][1] for rule in rules)
+
+
+def _sentence_bounds(text, position, lower, upper):
+    start = lower
+    for match in _SENTENCE_BREAK.finditer(text, max(lower, position - MAX_SENTENCE), position):
+        start = match.end()
+    following = _SENTENCE_BREAK.search(text, position, min(upper, position + MAX_SENTENCE))
+    end = following.end() if following else min(upper, position + MAX_SENTENCE)
+    # Trim surrounding whitespace so the span is exactly the quoted text
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def rule_findings(text, matches, start=0, end=None):
+    """
+    Turn risk-phrase matches inside text[start:end] into findings shaped
+    like the model's output, one per sentence, with "start"/"end" offsets.
+    """
+    end = len(text) if end is None else end
+    lo = bisect_left(matches, (start,))
+    hi = bisect_left(matches, (end,))
+
+    findings = []
+    current = None
+    for match_start, match_end, rule in matches[lo:hi]:
+        if current is not None and match_start < current["end"]:
+            current["rules"].add(rule)
+            continue
+        sentence_start, sentence_end = _sentence_bounds(text, match_start, start, end)
+        current = {"start": sentence_start, "end": max(sentence_end, match_end), "rules": {rule}}
+        findings.append(current)
+
+    results = []
+    for finding in findings:
+        rules = sorted(finding["rules"], key=lambda rule: -RISK_RULES[rule][1])
+        top = RISK_RULES[rules[0]]
+        results.append({
+            "clause_text": text[finding["start"]:finding["end"]],
+            "risk_score": min(10, top[1] + len(rules) - 1),
+            "explanation": " ".join(RISK_RULES[rule][3] for rule in rules),
+            "recommendation": top[4],
+            "start": finding["start"],
+            "end": finding["end"],
+            "source": "rules",
+        })
+    return results
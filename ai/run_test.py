@@ -1,3 +1,6 @@
+from config import load_env
+load_env()
+
 import analyzer
 import text_extractor
 
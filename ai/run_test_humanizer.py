@@ -1,3 +1,6 @@
+from ai.config import load_env
+load_env()
+
 from ai import humanizer, text_extractor
 import json
 
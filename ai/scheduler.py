@@ -0,0 +1,204 @@
+"""
+Fair scheduling of model requests across documents and tenants.
+
+Work is queued at chunk granularity, so a 500k-character upload can't hold
+the provider quota while single-clause requests wait behind it:
+
+  - Priority classes: every queued "interactive" chunk is started before
+    any "batch" chunk.
+  - Within a class, tenants share the request slots by weighted fair
+    queuing (start-time fair queuing over estimated tokens): a tenant
+    with weight 2 gets about twice the throughput of a tenant with
+    weight 1 while both have work queued, and a tenant that was idle
+    gets no credit for the idle time.
+  - Within a tenant, the documents (requests) in flight share the
+    tenant's slots the same way, so a new short document does not wait
+    for every chunk of an earlier long one.
+  - At most `max_concurrency` chunks run at once; each chunk still goes
+    through the shared rate limiter (the global rate budget) in
+    completions.request_json.
+
+The API is asyncio-native. Chunk functions are blocking (requests), so
+they run on a thread pool sized to the concurrency budget, while any
+number of documents wait on the event loop:
+
+    scheduler = shared_scheduler()
+    result = await scheduler.submit(analyze_chunk, chunk, 1, 1,
+                                    tenant="acme", request_id=doc_id, cost=tokens)
+
+See analyzer.arun() and humanizer.asimplify().
+"""
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Configuration ---
+# Chunks in flight at once per scheduler (the global concurrency budget)
+MAX_CONCURRENCY = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", os.getenv("OPENROUTER_MAX_WORKERS", "4")))
+
+# Tenant weights, e.g. "acme=3,trial=0.5"; unlisted tenants weigh 1
+TENANT_WEIGHTS = {
+    name.strip(): float(weight)
+    for name, _, weight in (
+        entry.partition("=") for entry in os.getenv("SCHEDULER_TENANT_WEIGHTS", "").split(",") if "=" in entry
+    )
+}
+
+# Highest priority first
+PRIORITIES = ("interactive", "batch")
+DEFAULT_TENANT = "default"
+
+
+class _TenantQueue:
+    """Queued chunks of one tenant in one priority class."""
+
+    def __init__(self, weight):
+        self.weight = weight
+        self.finish = 0.0          # tenant's finish tag in its class
+        self.virtual = 0.0         # virtual time among the tenant's requests
+        self.request_finish = {}   # request id -> finish tag of its last chunk
+        self.heap = []             # (finish, seq, start, cost, item)
+
+    def push(self, request_id, cost, weight, seq, item):
+        start = max(self.virtual, self.request_finish.get(request_id, 0.0))
+        finish = start + cost / weight
+        self.request_finish[request_id] = finish
+        heapq.heappush(self.heap, (finish, seq, start, cost, item))
+
+    def head_cost(self):
+        return self.heap[0][3]
+
+    def pop(self):
+        _, _, start, _, item = heapq.heappop(self.heap)
+        self.virtual = max(self.virtual, start)
+        if not self.heap:
+            self.request_finish.clear()
+        return item
+
+
+class Scheduler:
+    """
+    Weighted-fair, priority-aware scheduler for blocking chunk functions.
+
+    Args:
+        max_concurrency: Chunks running at once.
+        tenant_weights: {tenant: weight} overrides for TENANT_WEIGHTS.
+
+    Must be used from a single event loop (see shared_scheduler()).
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, tenant_weights=None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.tenant_weights = dict(TENANT_WEIGHTS, **(tenant_weights or {}))
+        self._queues = [{} for _ in PRIORITIES]   # per class: tenant -> _TenantQueue
+        self._virtual = [0.0 for _ in PRIORITIES]
+        self._running = 0
+        self._seq = itertools.count()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="scheduler")
+
+    async def submit(self, func, *args, tenant=DEFAULT_TENANT, request_id=None, priority="interactive",
+                     cost=1.0, weight=1.0):
+        """
+        Queue `func(*args)` and wait for its result.
+
+        Args:
+            func: Blocking function (e.g. analyzer.analyze_chunk).
+            tenant: Tenant the work is billed to.
+            request_id: Document/request the chunk belongs to; chunks of one
+                request share its fair share.
+            priority: One of PRIORITIES.
+            cost: Size of the work, e.g. estimated tokens.
+            weight: Relative share of this request within its tenant.
+
+        Raises:
+            ValueError: Unknown priority. Exceptions of `func` propagate.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Run under the caller's context (trace, etc.) in the worker thread
+        call = functools.partial(contextvars.copy_context().run, func, *args)
+
+        queues = self._queues[PRIORITIES.index(priority)]
+        queue = queues.get(tenant)
+        if queue is None:
+            queue = queues[tenant] = _TenantQueue(self.tenant_weights.get(tenant, 1.0))
+        queue.push(request_id, max(cost, 1e-9), max(weight, 1e-9), next(self._seq), (call, future))
+        self._dispatch(loop)
+        return await future
+
+    def _next(self):
+        """Pop the next chunk to start: highest class, then lowest tenant tag."""
+        for level, queues in enumerate(self._queues):
+            best, best_tag = None, None
+            for tenant, queue in queues.items():
+                if not queue.heap:
+                    continue
+                tag = max(self._virtual[level], queue.finish) + queue.head_cost() / queue.weight
+                if best_tag is None or tag < best_tag:
+                    best, best_tag = tenant, tag
+            if best is None:
+                continue
+            queue = queues[best]
+            self._virtual[level] = max(self._virtual[level], queue.finish)
+            queue.finish = best_tag
+            item = queue.pop()
+            if not queue.heap:
+                del queues[best]
+            return item
+        return None
+
+    def _dispatch(self, loop):
+        while self._running < self.max_concurrency:
+            item = self._next()
+            if item is None:
+                return
+            call, future = item
+            if future.done():
+                # The waiting coroutine was cancelled
+                continue
+            self._running += 1
+            task = loop.run_in_executor(self._executor, call)
+            task.add_done_callback(functools.partial(self._finished, loop, future))
+
+    def _finished(self, loop, future, task):
+        self._running -= 1
+        if not future.done():
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+        self._dispatch(loop)
+
+    def stats(self):
+        """Queued chunks per priority class and tenant, plus running chunks."""
+        return {
+            "running": self._running,
+            "queued": {
+                priority: {tenant: len(queue.heap) for tenant, queue in queues.items()}
+                for priority, queues in zip(PRIORITIES, self._queues)
+            },
+        }
+
+
+_schedulers = weakref.WeakKeyDictionary()
+
+
+def shared_scheduler():
+    """
+    The running event loop's scheduler, created on first use with
+    SCHEDULER_MAX_CONCURRENCY and SCHEDULER_TENANT_WEIGHTS.
+    """
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = _schedulers[loop] = Scheduler()
+    return scheduler
@@ -0,0 +1,344 @@
+"""
+Structured timing and token instrumentation.
+
+Every job runs inside a trace (trace()) with an id that the backend passes
+along. Pipeline stages are timed with span() - "extract", "chunk",
+"rate_limit", "http", "parse", "merge" - and token counts are added with
+add_tokens(). Each span is kept on the job's trace (returned to the caller
+with the job's response) and folded into process-wide metrics:
+
+    ai_stage_seconds{stage}             histogram
+    ai_tokens_total{model,kind}         counter (kind: prompt | completion)
+    ai_requests_total{model,outcome}    counter
+    ai_jobs_total{task,outcome}         counter
+    ai_cache_hits_total{stage}          counter
+
+exported as Prometheus text (render_prometheus()) or as a JSON sidecar file
+(export(), TELEMETRY_EXPORT). Running this module merges sidecar files:
+
+    python telemetry.py [--format prometheus|json] FILE...
+
+Telemetry is off unless TELEMETRY=1; then span() returns a shared no-op
+context manager and the other calls return immediately.
+"""
+import argparse
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+# --- Configuration ---
+ENABLED = os.getenv("TELEMETRY", "").lower() in ("1", "true", "yes")
+# JSON sidecar written after every job; "{pid}" is replaced by the process id
+EXPORT_PATH = os.getenv("TELEMETRY_EXPORT", "")
+# Spans kept per trace (stage totals always cover every span)
+MAX_SPANS = 500
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+HELP = {
+    "ai_stage_seconds": ("histogram", "Time spent per pipeline stage"),
+    "ai_tokens_total": ("counter", "Prompt and completion tokens (estimated from characters)"),
+    "ai_requests_total": ("counter", "Chat completion attempts by outcome"),
+    "ai_jobs_total": ("counter", "Worker jobs by outcome"),
+    "ai_cache_hits_total": ("counter", "Results served from the result cache"),
+}
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    """Spans and token counts of one job."""
+
+    def __init__(self, trace_id=None, **attrs):
+        self.id = trace_id or uuid.uuid4().hex
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.stages = {}
+        self.tokens = {"prompt": 0, "completion": 0}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, started, duration, attrs):
+        with self._lock:
+            count, total = self.stages.get(name, (0, 0.0))
+            self.stages[name] = (count + 1, total + duration)
+            if len(self.spans) < MAX_SPANS:
+                entry = {"name": name, "start_ms": round((started - self.started) * 1000, 2),
+                         "duration_ms": round(duration * 1000, 2)}
+                if attrs:
+                    entry.update(attrs)
+                self.spans.append(entry)
+
+    def add_tokens(self, kind, count):
+        with self._lock:
+            self.tokens[kind] = self.tokens.get(kind, 0) + count
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "trace_id": self.id,
+                "duration_ms": round((self.duration or time.perf_counter() - self.started) * 1000, 2),
+                "stages": {name: {"count": count, "total_ms": round(total * 1000, 2)}
+                           for name, (count, total) in self.stages.items()},
+                "tokens": dict(self.tokens),
+                "spans": list(self.spans),
+            }
+
+
+class Metrics:
+    """Process-wide counters and histograms, keyed by (name, sorted labels)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {"buckets": [0] * (len(BUCKETS) + 1), "sum": 0.0, "count": 0}
+            histogram["buckets"][bisect_left(BUCKETS, value)] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def snapshot(self):
+        """JSON-serializable copy of every metric."""
+        with self._lock:
+            return {
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in self.counters.items()],
+                "histograms": [{"name": name, "labels": dict(labels), "buckets": list(h["buckets"]),
+                                "sum": h["sum"], "count": h["count"]}
+                               for (name, labels), h in self.histograms.items()],
+            }
+
+    def merge(self, snapshot):
+        """Add a snapshot() (e.g. another process's sidecar) into these metrics."""
+        with self._lock:
+            for entry in snapshot.get("counters", []):
+                key = (entry["name"], tuple(sorted(entry["labels"].items())))
+                self.counters[key] = self.counters.get(key, 0) + entry["value"]
+            for entry in snapshot.get("histograms", []):
+                key = (entry["name"], tuple(sorted(entry["labels"].items())))
+                histogram = self.histograms.setdefault(
+                    key, {"buckets": [0] * (len(BUCKETS) + 1), "sum": 0.0, "count": 0})
+                histogram["buckets"] = [a + b for a, b in zip(histogram["buckets"], entry["buckets"])]
+                histogram["sum"] += entry["sum"]
+                histogram["count"] += entry["count"]
+
+
+metrics = Metrics()
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "started")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.started, self.started, **self.attrs)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def configure(enabled=None, export_path=None):
+    """Turn telemetry on or off at runtime (e.g. from benchmarks)."""
+    global ENABLED, EXPORT_PATH
+    if enabled is not None:
+        ENABLED = enabled
+    if export_path is not None:
+        EXPORT_PATH = export_path
+
+
+def span(name, **attrs):
+    """
+    Context manager timing one stage:
+
+        with telemetry.span("http", model=model):
+            ...
+    """
+    if not ENABLED:
+        return _NOOP
+    return _Span(name, attrs)
+
+
+def record(name, seconds, started=None, **attrs):
+    """Record a stage that was timed by the caller."""
+    if not ENABLED:
+        return
+    metrics.observe("ai_stage_seconds", seconds, stage=name)
+    current = _current.get()
+    if current is not None:
+        current.add_span(name, started if started is not None else time.perf_counter() - seconds, seconds, attrs)
+
+
+def count(name, value=1, **labels):
+    """Increment a counter, e.g. count("ai_cache_hits_total", stage="analyze")."""
+    if ENABLED:
+        metrics.inc(name, value, **labels)
+
+
+def add_tokens(model, prompt=0, completion=0):
+    """Count the tokens of one completion, on the metrics and the current trace."""
+    if not ENABLED:
+        return
+    current = _current.get()
+    for kind, tokens in (("prompt", prompt), ("completion", completion)):
+        if tokens:
+            metrics.inc("ai_tokens_total", tokens, model=model, kind=kind)
+            if current is not None:
+                current.add_tokens(kind, tokens)
+
+
+def current_trace():
+    """The trace of the running job, or None."""
+    return _current.get() if ENABLED else None
+
+
+class trace:
+    """
+    Context manager running a job under a new Trace (None when disabled):
+
+        with telemetry.trace(request_id, task="analyze") as job_trace:
+            ...
+    """
+
+    def __init__(self, trace_id=None, **attrs):
+        self.trace = Trace(trace_id, **attrs) if ENABLED else None
+        self._token = None
+
+    def __enter__(self):
+        if self.trace is not None:
+            self._token = _current.set(self.trace)
+        return self.trace
+
+    def __exit__(self, *exc):
+        if self.trace is not None:
+            self.trace.duration = time.perf_counter() - self.trace.started
+            _current.reset(self._token)
+        return False
+
+
+def bind(func):
+    """
+    Wrap `func` to run under the caller's trace, for work handed to thread
+    pools (context variables don't cross threads by themselves).
+    """
+    current = _current.get() if ENABLED else None
+    if current is None:
+        return func
+
+    def run(*args, **kwargs):
+        token = _current.set(current)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+
+def render_prometheus(source=None):
+    """Metrics in the Prometheus text exposition format."""
+    source = source or metrics
+    snapshot = source.snapshot()
+    lines = []
+    described = set()
+
+    def describe(name):
+        if name not in described and name in HELP:
+            described.add(name)
+            kind, text = HELP[name]
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def label_text(labels, extra=None):
+        items = list(labels.items()) + ([extra] if extra else [])
+        if not items:
+            return ""
+        return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in items) + "}"
+
+    for entry in sorted(snapshot["counters"], key=lambda e: e["name"]):
+        describe(entry["name"])
+        lines.append(f"{entry['name']}{label_text(entry['labels'])} {entry['value']}")
+    for entry in sorted(snapshot["histograms"], key=lambda e: e["name"]):
+        name = entry["name"]
+        describe(name)
+        cumulative = 0
+        for bound, hits in zip(list(BUCKETS) + ["+Inf"], entry["buckets"]):
+            cumulative += hits
+            lines.append(f"{name}_bucket{label_text(entry['labels'], ('le', bound))} {cumulative}")
+        lines.append(f"{name}_sum{label_text(entry['labels'])} {entry['sum']:.6f}")
+        lines.append(f"{name}_count{label_text(entry['labels'])} {entry['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def export(path=None):
+    """
+    Write the metrics snapshot as JSON to `path` (default: TELEMETRY_EXPORT).
+    The file is replaced atomically so readers never see half a snapshot.
+    """
+    path = (path or EXPORT_PATH).replace("{pid}", str(os.getpid()))
+    if not ENABLED or not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as out:
+            json.dump(dict(metrics.snapshot(), pid=os.getpid(), written=time.time()), out)
+        os.replace(temp_path, path)
+    except OSError as e:
+        sys.stderr.write(f"Telemetry: Could not write {path}: {e}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge telemetry sidecar files")
+    parser.add_argument("files", nargs="+", help="JSON files written by export()")
+    parser.add_argument("--format", choices=["prometheus", "json"], default="prometheus")
+    args = parser.parse_args()
+
+    merged = Metrics()
+    for filename in args.files:
+        try:
+            with open(filename, encoding="utf-8") as sidecar:
+                merged.merge(json.load(sidecar))
+        except (OSError, ValueError) as e:
+            sys.stderr.write(f"Skipping {filename}: {e}\n")
+
+    if args.format == "json":
+        print(json.dumps(merged.snapshot(), indent=2))
+    else:
+        sys.stdout.write(render_prometheus(merged))
@@ -0,0 +1,49 @@
+from anchoring import AnchorIndex, SpanDeduper
+
+SHARED = "We may change these fees at any time without notice to you."
+TEXT = (
+    "1. Fees. " + SHARED + " Fees are due monthly.\n"
+    "2. Support. Support is offered by email on business days only.\n"
+    "3. Accounts. " + SHARED + " Accounts are personal.\n"
+)
+# Spans run from the first to the last word of the quote
+FIRST = (TEXT.index(SHARED), TEXT.index(SHARED) + len(SHARED) - 1)
+SECOND = (TEXT.rindex(SHARED), TEXT.rindex(SHARED) + len(SHARED) - 1)
+
+
+def test_locates_exact_and_paraphrased_quotes():
+    index = AnchorIndex(TEXT)
+    start = TEXT.index("Support is offered")
+    assert index.locate("Support is offered by email on business days only.") == (start, TEXT.index(".\n3."))
+    found = index.locate("support is offered by email on business weekdays only")
+    assert found is not None and found[0] == start
+
+
+def test_taken_spans_move_a_repeated_quote_to_its_next_copy():
+    index = AnchorIndex(TEXT)
+    assert index.locate(SHARED) == FIRST
+    taken = {FIRST}
+    assert index.locate(SHARED, taken=taken) == SECOND
+    assert index.locate(SHARED, taken={FIRST, SECOND}) is None
+
+
+def test_near_restricts_the_search():
+    index = AnchorIndex(TEXT)
+    third = (TEXT.index("3. Accounts"), len(TEXT))
+    assert index.locate(SHARED, near=third) == SECOND
+    pieces = [(0, TEXT.index("2. Support")), third]
+    assert index.locate(SHARED, near=pieces, taken={FIRST}) == SECOND
+    assert index.locate("Support is offered by email on business days only.", near=third) is None
+
+
+def test_anchor_adds_offsets_pages_and_fills_taken():
+    index = AnchorIndex(TEXT, page_starts=[0, TEXT.index("3. Accounts")])
+    taken = set()
+    first, second = {"clause_text": SHARED}, {"clause_text": SHARED}
+    assert index.anchor(first, taken=taken) and index.anchor(second, taken=taken)
+    assert [(first["start"], first["end"], first["page"]), (second["start"], second["end"], second["page"])] == \
+        [(*FIRST, 1), (*SECOND, 2)]
+    assert taken == {FIRST, SECOND}
+
+    deduper = SpanDeduper()
+    assert deduper.add(first) and deduper.add(second) and not deduper.add(dict(first))
@@ -0,0 +1,58 @@
+import json
+
+import batch
+
+
+def write_manifest(path, ids):
+    path.write_text("".join(json.dumps({"id": doc_id, "text": f"Contract {doc_id}."}) + "\n" for doc_id in ids))
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_rerun_skips_finished_and_retries_failed(tmp_path, monkeypatch):
+    manifest, output = tmp_path / "manifest.jsonl", tmp_path / "results.jsonl"
+    write_manifest(manifest, ["a", "b", "c"])
+    calls = []
+
+    def flaky_run(text, page_starts=None):
+        calls.append(text)
+        if text == "Contract b." and calls.count(text) == 1:
+            return {"error": "API request failed: 503"}
+        return {"analysis": []}
+
+    monkeypatch.setattr(batch.analyzer, "run", flaky_run)
+    first = batch.run_batch(str(manifest), str(output), workers=1)
+    assert (first["processed"], first["failed"]) == (3, 1)
+    assert (tmp_path / "results.jsonl.checkpoint").read_text().split() == ["a", "c"]
+
+    second = batch.run_batch(str(manifest), str(output), workers=1)
+    assert (second["skipped"], second["processed"], second["failed"]) == (2, 1, 0)
+    assert [(r["id"], "error" in r) for r in read_records(output)][-1] == ("b", False)
+
+    third = batch.run_batch(str(manifest), str(output), workers=1)
+    assert (third["skipped"], third["processed"]) == (3, 0)
+    assert len(calls) == 4
+
+
+def test_files_go_through_extraction(tmp_path, monkeypatch):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "terms.html").write_text("<html><head><script>var x = 1;</script></head>"
+                                     "<body><h1>Terms</h1><p>We may  end your account.</p></body></html>")
+    (docs / "notes.txt").write_text("Page one.\fPage two.")
+    (docs / "logo.svg").write_text("<svg/>")
+    seen = {}
+
+    def fake_run(text, page_starts=None):
+        seen[text] = page_starts
+        return {"analysis": []}
+
+    monkeypatch.setattr(batch.analyzer, "run", fake_run)
+    summary = batch.run_batch(str(docs), str(tmp_path / "results.jsonl"), workers=1)
+    assert (summary["documents"], summary["failed"]) == (2, 0)
+    html_text = next(text for text in seen if "account" in text)
+    assert "<" not in html_text and "var x" not in html_text
+    assert "We may end your account." in html_text
+    assert seen["Page one.\nPage two."] == [0, 10]
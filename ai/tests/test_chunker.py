@@ -0,0 +1,40 @@
+from chunker import PIECE_SEPARATOR, chunk_regions, chunk_spans, estimate_tokens, join_pieces, segment_clauses
+
+CLAUSES = [f"{n}. Clause {n}. " + "The parties agree to these terms in full. " * 6 + "\n" for n in range(1, 41)]
+TEXT = "".join(CLAUSES)
+
+
+def clause_span(n):
+    start = TEXT.index(f"{n}. Clause {n}.")
+    return start, start + len(CLAUSES[n - 1])
+
+
+def test_chunk_spans_cover_the_text_at_clause_starts():
+    spans = chunk_spans(TEXT, 300)
+    assert spans[0][0] == 0 and spans[-1][1] == len(TEXT)
+    assert all(end == start for (_, end), (start, _) in zip(spans, spans[1:]))
+    starts = {start for start, _ in segment_clauses(TEXT)}
+    assert all(start in starts for start, _ in spans)
+
+
+def test_separate_regions_share_a_chunk():
+    regions = [clause_span(2), clause_span(9), clause_span(10), clause_span(30)]
+    chunks = chunk_regions(TEXT, regions, max_tokens=2000)
+    # Clauses 9 and 10 are contiguous and merge into one piece
+    assert chunks == [[clause_span(2), (clause_span(9)[0], clause_span(10)[1]), clause_span(30)]]
+    joined = join_pieces(TEXT, chunks[0])
+    assert joined.count(PIECE_SEPARATOR) == 2
+    assert joined.startswith(CLAUSES[1]) and joined.endswith(CLAUSES[29])
+
+
+def test_regions_beyond_the_budget_start_new_chunks():
+    regions = [clause_span(n) for n in range(1, 41, 3)]
+    budget = 3 * estimate_tokens(CLAUSES[0])
+    chunks = chunk_regions(TEXT, regions, max_tokens=budget)
+    assert len(chunks) > 1
+    assert [piece for chunk in chunks for piece in chunk] == regions
+    assert all(len(join_pieces(TEXT, chunk)) <= 1.1 * budget * len(TEXT) / estimate_tokens(TEXT) for chunk in chunks)
+
+
+def test_no_regions_no_chunks():
+    assert chunk_regions(TEXT, []) == []
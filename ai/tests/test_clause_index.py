@@ -0,0 +1,58 @@
+import clause_index
+from clause_index import ClauseIndex, clause_words, shingles, signature, similarity
+
+INDEMNITY = ("The {0} shall indemnify and hold harmless the {1} against all claims, "
+             "losses and damages arising from the {0}'s use of the services.")
+
+
+def test_clause_words_keeps_roles_and_numbers_names():
+    words = clause_words("1. The Customer shall pay Acme Corp and the Provider shall notify Globex Inc "
+                         "before Acme Corp invoices the Customer.")
+    assert words == [
+        "the", "customer", "shall", "pay", "<name0>", "and", "the", "provider", "shall",
+        "notify", "<name1>", "before", "<name0>", "invoices", "the", "customer",
+    ]
+
+
+def test_clause_words_ends_role_runs():
+    assert clause_words("The Customer shall pay the Provider") == [
+        "the", "customer", "shall", "pay", "the", "provider",
+    ]
+
+
+def test_short_clauses_have_no_shingles():
+    assert shingles("Definitions.") == set()
+    assert signature("Definitions.") is None
+
+
+def test_rebranded_clause_matches():
+    first = signature(INDEMNITY.format("Customer", "Acme Corp"))
+    second = signature(INDEMNITY.format("Customer", "Globex Inc"))
+    assert similarity(first, second) == 1.0
+
+
+def test_swapped_parties_do_not_match():
+    first = signature(INDEMNITY.format("Customer", "Provider"))
+    second = signature(INDEMNITY.format("Provider", "Customer"))
+    assert similarity(first, second) < clause_index.THRESHOLD
+
+
+def test_index_serves_near_duplicates():
+    index = ClauseIndex(path=None)
+    index.add(INDEMNITY.format("Customer", "Acme Corp"), [{"risk": "indemnity"}])
+    assert index.lookup(INDEMNITY.format("Customer", "Globex Inc")) == (1.0, [{"risk": "indemnity"}])
+    assert index.lookup(INDEMNITY.format("Provider", "Customer")) is None
+
+
+def test_benign_entries_expire_and_never_erase_findings(monkeypatch):
+    clause = INDEMNITY.format("Customer", "Acme Corp")
+    now = [1000.0]
+    monkeypatch.setattr(clause_index.time, "time", lambda: now[0])
+    index = ClauseIndex(path=None, benign_ttl=60)
+    index.add(clause, [])
+    assert index.lookup(clause) == (1.0, [])
+    now[0] += 61
+    assert index.lookup(clause) is None
+    index.add(clause, [{"risk": "indemnity"}])
+    index.add(clause, [])
+    assert index.lookup(clause) == (1.0, [{"risk": "indemnity"}])
@@ -0,0 +1,54 @@
+import io
+import json
+
+import pytest
+
+from humanizer import write_result
+
+
+def chunk(n, text):
+    return {"event": "chunk", "chunk": n, "total_chunks": 2, "humanized_text": text, "key_points": [f"point {n}"],
+            "original_length": 10, "simplified_length": len(text.split())}
+
+
+def written(events):
+    out = io.StringIO()
+    write_result(iter(events), "some contract text", out)
+    return json.loads(out.getvalue())
+
+
+def test_writes_joined_chunks():
+    result = written([{"event": "start", "total_chunks": 2}, chunk(1, 'You "pay" fees.'), chunk(2, "We may end it.")])
+    assert result == {"humanized_text": 'You "pay" fees.\n\nWe may end it.', "original_length": 20,
+                      "simplified_length": 7, "key_points": ["point 1", "point 2"]}
+
+
+def test_failed_chunk_becomes_a_warning():
+    result = written([chunk(1, "You pay fees."), {"event": "error", "chunk": 2, "total_chunks": 2, "error": "timeout"}])
+    assert result["humanized_text"] == "You pay fees."
+    assert result["warnings"] == ["Chunk 2: timeout"]
+
+
+def test_failure_after_the_first_chunk_closes_the_object():
+    def events():
+        yield chunk(1, "You pay fees.")
+        raise RuntimeError("worker died")
+
+    result = written(events())
+    assert result["humanized_text"] == "You pay fees."
+    assert result["error"] == "Unexpected error: worker died"
+
+    result = written([chunk(1, "You pay fees."), {"event": "error", "error": "cancelled"}])
+    assert result["error"] == "cancelled"
+
+
+def test_failure_before_any_chunk_writes_nothing():
+    def events():
+        raise RuntimeError("worker died")
+        yield
+
+    out = io.StringIO()
+    with pytest.raises(RuntimeError):
+        write_result(events(), "text", out)
+    assert out.getvalue() == ""
+    assert written([{"event": "error", "error": "Input text is empty"}]) == {"error": "Input text is empty"}
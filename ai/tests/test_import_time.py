@@ -0,0 +1,14 @@
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_time_budgets():
+    # IMPORT_TIME_SCALE loosens the budgets on slow machines
+    completed = subprocess.run(
+        [sys.executable, os.path.join(HERE, "check_import_time.py"), "--scale", os.getenv("IMPORT_TIME_SCALE", "1.0")],
+        capture_output=True, text=True, cwd=HERE,
+    )
+    assert completed.returncode == 0, completed.stdout + completed.stderr
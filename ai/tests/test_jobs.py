@@ -0,0 +1,69 @@
+import pytest
+
+import jobs
+from jobs import JobQueue
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(jobs.time, "time", lambda: now[0])
+    return now
+
+
+def test_claims_oldest_first_and_only_once(tmp_path, clock):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease=60)
+    first = queue.submit("analyze", text="first contract")
+    clock[0] += 1
+    second = queue.submit("humanize", text="second contract")
+
+    job = queue.claim()
+    assert (job["id"], job["task"], job["text"], job["attempt"]) == (first, "analyze", "first contract", 1)
+    assert queue.claim()["id"] == second
+    assert queue.claim() is None
+    assert queue.status(first)["status"] == "running"
+
+
+def test_expired_lease_is_claimed_again_and_old_worker_is_fenced(tmp_path, clock):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease=60)
+    job_id = queue.submit("analyze", text="contract")
+    stale = queue.claim()
+    queue.record(stale, {"event": "start", "total_chunks": 2})
+    queue.record(stale, {"event": "chunk", "chunk": 1, "total_chunks": 2, "analysis": []})
+
+    clock[0] += 30
+    assert queue.renew(stale)
+    assert queue.claim() is None
+    clock[0] += 61
+    retry = queue.claim()
+    assert (retry["id"], retry["attempt"]) == (job_id, 2)
+    # The retry starts over; the worker that lost its lease can't write
+    assert queue.status(job_id)["chunks_done"] == 0
+    assert not queue.renew(stale)
+    with pytest.raises(jobs.LeaseLost):
+        queue.finish(stale, result={"analysis": ["stale"]})
+
+    queue.finish(retry, result={"analysis": []})
+    assert queue.result(job_id)["result"] == {"analysis": []}
+
+
+def test_job_fails_after_max_attempts(tmp_path, clock):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease=10, max_attempts=2)
+    job_id = queue.submit("analyze", text="contract")
+    for _ in range(2):
+        assert queue.claim() is not None
+        clock[0] += 11
+    assert queue.claim() is None
+    state = queue.status(job_id)
+    assert state["status"] == "failed" and "abandoned" in state["error"]
+
+
+def test_status_pages_through_events(tmp_path, clock):
+    queue = JobQueue(None)
+    job_id = queue.submit("analyze", text="contract")
+    job = queue.claim()
+    for n in (1, 2):
+        queue.record(job, {"event": "chunk", "chunk": n, "total_chunks": 2, "analysis": []})
+    state = queue.status(job_id)
+    assert [event["chunk"] for event in state["events"]] == [1, 2]
+    assert queue.status(job_id, after=state["next"])["events"] == []
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from llm_stream import JsonStreamParser, MalformedResponse, StreamError, iter_content
+
+ANSWER = ('Here you go: {"analysis": [{"clause_text": "Fees, taxes ]} and more", "risk_score": 7}, '
+          '{"clause_text": "We may [change] terms", "nested": [1, {"q": null}]}], "summary": "ok", "n": -1.5e3}')
+
+
+def parse(text, step=None, stream_keys=("analysis",)):
+    parser = JsonStreamParser(stream_keys)
+    items = []
+    step = step or len(text)
+    for i in range(0, len(text), step):
+        items.extend(parser.feed(text[i:i + step]))
+    return parser.close(), items
+
+
+@pytest.mark.parametrize("step", [1, 2, 7, None])
+def test_streams_items_in_any_pieces(step):
+    result, items = parse(ANSWER, step)
+    expected = json.loads(ANSWER[ANSWER.index("{"):])
+    assert result == expected
+    assert items == [("analysis", item) for item in expected["analysis"]]
+
+
+def test_stops_after_the_object():
+    parser = JsonStreamParser()
+    parser.feed('{"a": 1} trailing text')
+    assert parser.complete and parser.close() == {"a": 1}
+
+
+@pytest.mark.parametrize("text", [
+    '{"a": 1 2}',
+    '{"a": 1,}',
+    '{"analysis": [1, 2,]}',
+    '{"analysis": [{"x": 1} {"y": 2}]}',
+    '{"a" 1}',
+    '{"a": }',
+    '{,}',
+    '{"a": "x" 1}',
+    '{"a": true false}',
+    '{"a": [1}',
+    '{a: 1}',
+    '{"a": tru}',
+])
+@pytest.mark.parametrize("step", [1, None])
+def test_rejects_what_json_loads_rejects(text, step):
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(text)
+    with pytest.raises(MalformedResponse):
+        parse(text, step)
+
+
+def test_rejects_missing_and_unfinished_objects():
+    with pytest.raises(MalformedResponse):
+        parse("x" * 300)
+    with pytest.raises(MalformedResponse):
+        parse('{"analysis": [{"clause_text": "cut off')
+
+
+class FakeResponse:
+    def __init__(self, lines, content_type="text/event-stream"):
+        self.headers = {"Content-Type": content_type}
+        self.lines = lines
+        self.encoding = None
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+
+def sse(content):
+    return "data: " + json.dumps({"choices": [{"delta": {"content": content}}]})
+
+
+def test_iter_content_reads_sse_deltas():
+    lines = [": keep-alive", sse('{"a"'), "", sse(": 1}"), "data: [DONE]", sse("ignored")]
+    assert list(iter_content(FakeResponse(lines))) == ['{"a"', ": 1}"]
+
+
+def test_iter_content_raises_stream_error_on_malformed_event():
+    with pytest.raises(StreamError):
+        list(iter_content(FakeResponse([sse("{"), 'data: {"choices": [{"delta": {"con'])))
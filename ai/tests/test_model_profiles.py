@@ -0,0 +1,15 @@
+import model_profiles
+from model_profiles import ModelProfile, max_chunk_tokens, plan_chunk_tokens
+
+
+def test_chunk_budget_is_stable_across_speeds_and_small_edits(monkeypatch):
+    limit = max_chunk_tokens("test-model", 4000, 0.35, 300)
+    sizes = {model_profiles.MIN_CHUNK_TOKENS * 2 ** k for k in range(4)} | {limit}
+    budgets = set()
+    for first_token_seconds, tokens_per_second in ((0.3, 200), (1.0, 40), (5.0, 20)):
+        profile = ModelProfile("test-model", 32000, 4000, first_token_seconds, tokens_per_second)
+        monkeypatch.setattr(model_profiles, "profile", lambda model, profile=profile: profile)
+        for text_tokens in (20000, 20400, 20800):
+            budgets.add(plan_chunk_tokens("test-model", text_tokens, 4000, 0.35, 300, workers=4))
+    assert len(budgets) == 1
+    assert budgets <= sizes
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+import pytest
+
+from scheduler import Scheduler
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_results_and_exceptions_reach_the_caller():
+    def fail():
+        raise ValueError("boom")
+
+    async def main():
+        scheduler = Scheduler(max_concurrency=2)
+        assert await scheduler.submit(lambda x: x * 2, 21) == 42
+        with pytest.raises(ValueError):
+            await scheduler.submit(fail)
+
+    run(main())
+
+
+def test_cancelled_task_cancels_the_caller():
+    async def main():
+        scheduler = Scheduler(max_concurrency=1)
+        loop = asyncio.get_running_loop()
+        future, task = loop.create_future(), loop.create_future()
+        task.cancel()
+        scheduler._running = 1
+        scheduler._finished(loop, future, task)
+        assert future.cancelled()
+        assert scheduler._running == 0
+
+    run(main())
+
+
+def test_request_weight_shares_a_tenant():
+    async def main():
+        scheduler = Scheduler(max_concurrency=1)
+        order = []
+        release = threading.Event()
+        blocker = asyncio.ensure_future(scheduler.submit(release.wait))
+        await asyncio.sleep(0.01)
+        jobs = [
+            scheduler.submit(order.append, request_id, request_id=request_id, weight=weight)
+            for request_id, weight in (("light", 1.0), ("heavy", 3.0))
+            for _ in range(4)
+        ]
+        gathered = asyncio.ensure_future(asyncio.gather(*jobs))
+        await asyncio.sleep(0.01)
+        release.set()
+        await blocker
+        await gathered
+        return order
+
+    order = run(main())
+    assert order[:4].count("heavy") == 3
@@ -1,34 +1,174 @@
-import PyPDF2
-import requests
-from bs4 import BeautifulSoup
+import hashlib
+import io
+import os
 
-def from_pdf(file_stream) -> str | None:
-    """Extracts text from a PDF file stream."""
+# PyPDF2 and the process pool are imported on first use, so plain-text and
+# HTML input never pay for them
+
+try:
+    from .fetcher import FETCH_MAX_WORKERS, FetchError, shared_fetcher
+    from .result_cache import ResultCache
+except ImportError:
+    from fetcher import FETCH_MAX_WORKERS, FetchError, shared_fetcher
+    from result_cache import ResultCache
+
+# --- PDF Limits ---
+# Extraction stops after this many pages / this much text (UTF-8 bytes)
+MAX_PDF_PAGES = int(os.getenv("PDF_MAX_PAGES", "500"))
+MAX_PDF_TEXT_BYTES = int(os.getenv("PDF_MAX_TEXT_BYTES", str(8 * 1024 * 1024)))
+
+# Documents with at least this many pages are split across processes
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+PAGE_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "pages.sqlite3")
+_page_cache = None
+
+
+def _get_page_cache():
+    """Extracted pages keyed by file hash, shared by every caller in the process."""
+    global _page_cache
+    if _page_cache is None and not os.getenv("PAGE_CACHE_DISABLED"):
+        _page_cache = ResultCache(path=os.getenv("PAGE_CACHE_PATH", PAGE_CACHE_PATH) or None, memory_items=32)
+    return _page_cache
+
+
+def _read_bytes(source):
+    """Accept raw bytes, a path or a binary file stream."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, str):
+        with open(source, "rb") as pdf_file:
+            return pdf_file.read()
+    return source.read()
+
+
+def iter_pdf_pages(file_stream, first=0, last=None, max_pages=MAX_PDF_PAGES, max_bytes=MAX_PDF_TEXT_BYTES):
+    """
+    Yield (page_no, text) for each page of a PDF, one page at a time.
+
+    Args:
+        file_stream: Binary file stream of the PDF.
+        first: Index of the first page to extract (0-based).
+        last: Index after the last page to extract (default: end).
+        max_pages: Stop after this many pages.
+        max_bytes: Stop once this much text has been produced.
+
+    Yields:
+        (page_no, text) with 1-based page numbers. Pages without text
+        are skipped.
+    """
+    import PyPDF2
+    reader = PyPDF2.PdfReader(file_stream)
+    last = len(reader.pages) if last is None else min(last, len(reader.pages))
+    last = min(last, first + max_pages) if max_pages else last
+
+    produced = 0
+    for index in range(first, last):
+        page_text = reader.pages[index].extract_text()
+        if not page_text:
+            continue
+        yield index + 1, page_text
+        produced += len(page_text.encode("utf-8"))
+        if max_bytes and produced >= max_bytes:
+            return
+
+
+def _extract_range(data, first, last):
+    """Process-pool task: extract pages [first, last) of a PDF."""
+    return list(iter_pdf_pages(io.BytesIO(data), first, last, max_pages=0, max_bytes=0))
+
+
+def _extract_pages(data, workers):
+    import PyPDF2
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    page_count = min(len(reader.pages), MAX_PDF_PAGES) if MAX_PDF_PAGES else len(reader.pages)
+    if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+        return list(iter_pdf_pages(io.BytesIO(data)))
+
+    step = -(-page_count // workers)
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        parts = executor.map(_extract_range, [data] * len(ranges), *zip(*ranges))
+        pages = [page for part in parts for page in part]
+
+    # Apply the text cap the sequential path applies while streaming
+    kept, produced = [], 0
+    for page in pages:
+        kept.append(page)
+        produced += len(page[1].encode("utf-8"))
+        if MAX_PDF_TEXT_BYTES and produced >= MAX_PDF_TEXT_BYTES:
+            break
+    return kept
+
+
+def pdf_pages(source, workers=PDF_WORKERS):
+    """
+    Extract all pages of a PDF, using several processes for long documents.
+    Results are cached by file hash, so extracting the same file again
+    (re-upload, or analyze + humanize of one upload) doesn't re-parse it.
+
+    Args:
+        source: PDF as bytes, a file path or a binary file stream.
+        workers: Processes to use for documents of PARALLEL_MIN_PAGES or more.
+
+    Returns:
+        List of (page_no, text) tuples, or None if the PDF can't be read.
+    """
     try:
-        reader = PyPDF2.PdfReader(file_stream)
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        return text if text else None
+        data = _read_bytes(source)
+        cache = _get_page_cache()
+        key = hashlib.sha256(data).hexdigest() + f":{MAX_PDF_PAGES}:{MAX_PDF_TEXT_BYTES}"
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return [tuple(page) for page in cached]
+
+        pages = _extract_pages(data, workers)
+        if cache is not None:
+            cache.set(key, pages)
+        return pages
     except Exception as e:
         print(f"Error reading PDF: {e}")
         return None
 
+
+def join_pages(pages):
+    """
+    Join extracted pages into one text.
+
+    Returns:
+        (text, page_starts) where page_starts[i] is the offset at which
+        page i + 1 begins (usable as analyzer page_starts). Pages skipped
+        for having no text begin where the next page does.
+    """
+    page_starts = []
+    offset = 0
+    for page_no, page_text in pages:
+        while len(page_starts) < page_no:
+            page_starts.append(offset)
+        offset += len(page_text) + 1
+    return "".join(page_text + "\n" for _, page_text in pages), page_starts
+
+
+def from_pdf(file_stream) -> str | None:
+    """Extracts text from a PDF file stream."""
+    pages = pdf_pages(file_stream)
+    if not pages:
+        return None
+    text, _ = join_pages(pages)
+    return text
+
 def from_url(url: str) -> str | None:
     """Fetches and extracts clean text from a URL."""
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        for element in soup(["script", "style", "nav", "footer", "header"]):
-            element.decompose()
-            
-        text = soup.get_text(separator='\n', strip=True)
+        text = shared_fetcher().fetch_text(url)
         return text if text else None
-    except requests.RequestException as e:
+    except FetchError as e:
         print(f"Error fetching URL {url}: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def from_urls(urls: list[str], max_workers: int = FETCH_MAX_WORKERS) -> list[str | None]:
+    """Fetches several URLs concurrently; None marks pages that failed."""
+    return shared_fetcher().fetch_many(urls, max_workers=max_workers)
@@ -0,0 +1,308 @@
+"""
+Long-lived worker process for the AI package.
+
+Instead of starting a fresh interpreter for every HTTP request, the backend
+keeps a few of these workers running and sends them jobs over stdio.
+
+Protocol (both directions): each frame is a 4-byte big-endian length
+followed by that many bytes of UTF-8 JSON.
+
+Request:  {"id": <any>, "task": "analyze" | "humanize" | "combined" | "humanize_clauses"
+                              | "extract" | "ping" | "stats" | "metrics"
+                              | "job_submit" | "job_status" | "job_result",
+           "text": "...",
+           "clauses": ["...", ...] (humanize_clauses only, instead of "text"),
+           "file": {"mime_type": "...", "filename": "..."} (optional, instead of "text"),
+           "document_id": "..." (optional, analyze only: re-analyze changed clauses),
+           "stream": true (optional: send per-chunk events before the result),
+           "rules_only": true (optional, analyze only: no API calls),
+           "trace_id": "..." (optional, see telemetry.py)}
+Response: {"id": <same>, "result": {...}}  or  {"id": <same>, "error": "..."}
+
+With telemetry enabled (TELEMETRY=1) every response also carries
+"trace": the job's per-stage timings and token counts, and "metrics"
+returns the worker's counters and histograms in Prometheus text format.
+"stats" also reports the LLM backend in use (see backends.py), the
+near-duplicate clause index (see clause_index.py) and the measured model
+speeds used for chunk sizing (see model_profiles.py).
+
+A request with "file" is followed by one more frame holding the raw file
+bytes. The worker extracts and normalizes the text itself (see
+extraction.extract), so uploads cross the process boundary once, unparsed.
+Errors caused by the input (unreadable file, too little text) carry
+"code": "invalid_input".
+
+"job_submit" queues "text" or "file" as a durable job ("job_task":
+"analyze" | "humanize" | "combined", plus "document_id" / "rules_only")
+and returns {"job_id", "status"} at once; "job_status" ("job_id", "after")
+and "job_result" ("job_id") report its progress and outcome, or fail with
+"code": "not_found". `python jobs.py serve` runs the jobs (see jobs.py).
+
+"combined" analyzes and humanizes the text in one pass (see combined.py)
+and returns {"analysis": {...}, "humanized": {...}}.
+
+With "stream", zero or more {"id": <same>, "event": {...}} frames (see
+analyzer.run_iter / humanizer.simplify_iter / combined.run_iter) precede the final response,
+whose result is the closing "done" event.
+
+Usage:
+    python worker.py [--max-jobs N]
+
+With --max-jobs the worker exits cleanly after N jobs so the parent can
+replace it (guards against slow leaks in long-running processes).
+"""
+import argparse
+import importlib
+import json
+import struct
+import sys
+
+# Read .env before any module evaluates its settings
+if __name__ == "__main__":
+    try:
+        from .config import load_env
+    except ImportError:
+        from config import load_env
+    load_env()
+
+try:
+    from . import model_profiles, telemetry
+    from .backends import shared_backend
+    from .result_cache import shared_cache
+    from .clause_index import shared_index
+except ImportError:
+    import model_profiles
+    import telemetry
+    from backends import shared_backend
+    from result_cache import shared_cache
+    from clause_index import shared_index
+
+HEADER = struct.Struct(">I")
+
+# (module, function) per task; pipeline modules are imported by the first
+# job that needs them, so the worker starts (and answers "ping") quickly
+TASKS = {
+    "analyze": ("analyzer", "run"),
+    "humanize": ("humanizer", "simplify"),
+    "combined": ("combined", "run"),
+}
+
+STREAM_TASKS = {
+    "analyze": ("analyzer", "run_iter"),
+    "humanize": ("humanizer", "simplify_iter"),
+    "combined": ("combined", "run_iter"),
+}
+
+# Queue operations of the durable job subsystem (see jobs.py)
+JOB_TASKS = ("job_submit", "job_status", "job_result")
+
+# Least amount of extracted text worth sending to the model
+MIN_TEXT_CHARS = {
+    "analyze": 50,
+    "humanize": 10,
+    "combined": 50,
+}
+
+
+def pipeline(name):
+    """Import a pipeline module (analyzer, humanizer, extraction) on first use."""
+    return importlib.import_module(f"{__package__}.{name}" if __package__ else name)
+
+
+def read_raw_frame(stream):
+    """Read one frame's bytes from a binary stream. Returns None on clean EOF."""
+    header = stream.read(HEADER.size)
+    if not header:
+        return None
+    if len(header) < HEADER.size:
+        raise EOFError("Truncated frame header")
+    (length,) = HEADER.unpack(header)
+    body = stream.read(length)
+    if len(body) < length:
+        raise EOFError("Truncated frame body")
+    return body
+
+
+def read_frame(stream):
+    """Read one JSON frame (and its file frame, if any). Returns None on clean EOF."""
+    body = read_raw_frame(stream)
+    if body is None:
+        return None
+    request = json.loads(body.decode("utf-8"))
+    if isinstance(request.get("file"), dict):
+        data = read_raw_frame(stream)
+        if data is None:
+            raise EOFError("Missing file frame")
+        request["file"]["data"] = data
+    return request
+
+
+def write_frame(stream, message):
+    """Write one JSON message as a frame and flush it."""
+    body = json.dumps(message).encode("utf-8")
+    # Header and body are written separately to avoid copying a large body
+    stream.write(HEADER.pack(len(body)))
+    stream.write(body)
+    stream.flush()
+
+
+def handle(request, emit=None):
+    """
+    Run a single job and build its response frame. Streaming jobs pass
+    every event except the last to `emit`.
+    """
+    task = request.get("task")
+    with telemetry.trace(request.get("trace_id"), task=task) as job_trace:
+        response = run_job(request, emit)
+    if job_trace is not None:
+        response["trace"] = job_trace.to_dict()
+        telemetry.count("ai_jobs_total", task=str(task), outcome="error" if "error" in response else "ok")
+        telemetry.export()
+    return response
+
+
+def run_job(request, emit=None):
+    """Build the response frame of one job (see handle())."""
+    job_id = request.get("id")
+    task = request.get("task")
+
+    if task == "ping":
+        return {"id": job_id, "result": {"status": "ok"}}
+
+    if task == "stats":
+        cache = shared_cache()
+        index = shared_index()
+        return {"id": job_id, "result": {"cache": cache.stats() if cache is not None else None,
+                                         "similar_clauses": index.stats() if index is not None else None,
+                                         "backend": shared_backend().describe(),
+                                         "models": model_profiles.snapshot()}}
+
+    if task == "metrics":
+        return {"id": job_id, "result": {"enabled": telemetry.ENABLED, "prometheus": telemetry.render_prometheus()}}
+
+    if task in JOB_TASKS:
+        return run_job_task(request)
+
+    if task == "humanize_clauses":
+        clauses = request.get("clauses")
+        if not isinstance(clauses, list) or not clauses:
+            return {"id": job_id, "error": "No clauses provided", "code": "invalid_input"}
+        try:
+            return {"id": job_id, "result": {"clauses": pipeline("humanizer").humanize_clauses(clauses)}}
+        except Exception as e:
+            sys.stderr.write(f"Job {job_id}: Unexpected error: {e}\n")
+            return {"id": job_id, "error": f"Unexpected error: {str(e)}"}
+
+    if task not in TASKS and task != "extract":
+        return {"id": job_id, "error": f"Unknown task: {task}"}
+
+    text = request.get("text", "")
+    page_starts = None
+    upload = request.get("file")
+    if upload:
+        with telemetry.span("extract", bytes=len(upload["data"])):
+            extracted = pipeline("extraction").extract(upload["data"], upload.get("mime_type"), upload.get("filename"))
+        if "error" in extracted:
+            return {"id": job_id, "error": extracted["error"], "code": "invalid_input"}
+        if task == "extract":
+            return {"id": job_id, "result": extracted}
+        text, page_starts = extracted["text"], extracted["page_starts"]
+        if len(text) < MIN_TEXT_CHARS[task]:
+            return {"id": job_id, "error": "Text is too short or missing", "code": "invalid_input"}
+    elif task == "extract":
+        return {"id": job_id, "error": "No file provided", "code": "invalid_input"}
+
+    if not text:
+        return {"id": job_id, "error": "No text provided"}
+
+    try:
+        options = {"rules_only": True} if task == "analyze" and request.get("rules_only") else {}
+        if task in ("analyze", "combined") and page_starts:
+            options["page_starts"] = page_starts
+        if request.get("stream") and emit is not None:
+            last = None
+            module, name = STREAM_TASKS[task]
+            for event in getattr(pipeline(module), name)(text, **options):
+                if last is not None:
+                    emit({"id": job_id, "event": last})
+                last = event
+            if last is not None and last["event"] == "error" and "chunk" not in last:
+                return {"id": job_id, "error": last["error"]}
+            return {"id": job_id, "result": last}
+        if task == "analyze" and request.get("document_id"):
+            return {"id": job_id, "result": pipeline("analyzer").run_revision(text, str(request["document_id"]), page_starts)}
+        module, name = TASKS[task]
+        return {"id": job_id, "result": getattr(pipeline(module), name)(text, **options)}
+    except Exception as e:
+        sys.stderr.write(f"Job {job_id}: Unexpected error: {e}\n")
+        return {"id": job_id, "error": f"Unexpected error: {str(e)}"}
+
+
+def run_job_task(request):
+    """
+    Queue a job, or report a queued job's progress or outcome (see jobs.py).
+    These return at once; `python jobs.py serve` runs the jobs.
+    """
+    job_id = request.get("id")
+    task = request.get("task")
+    queue = pipeline("jobs").shared_queue()
+
+    if task == "job_submit":
+        upload = request.get("file")
+        options = {key: request[key] for key in ("document_id", "rules_only") if request.get(key)}
+        try:
+            queued = queue.submit(
+                request.get("job_task", "analyze"),
+                text=request.get("text") if not upload else None,
+                file=upload["data"] if upload else None,
+                mime_type=upload.get("mime_type") if upload else None,
+                filename=upload.get("filename") if upload else None,
+                options=options,
+            )
+        except ValueError as e:
+            return {"id": job_id, "error": str(e), "code": "invalid_input"}
+        return {"id": job_id, "result": {"job_id": queued, "status": "queued"}}
+
+    queued = str(request.get("job_id", ""))
+    if task == "job_status":
+        state = queue.status(queued, int(request.get("after") or 0))
+    else:
+        state = queue.result(queued)
+    if state is None:
+        return {"id": job_id, "error": f"Unknown job: {queued}", "code": "not_found"}
+    return {"id": job_id, "result": state}
+
+
+def serve(max_jobs=0):
+    """
+    Serve jobs from stdin until EOF (or until `max_jobs` jobs are done).
+    """
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+    # Anything printed by library code must not corrupt the frame stream
+    sys.stdout = sys.stderr
+
+    jobs_done = 0
+    while True:
+        try:
+            request = read_frame(stdin)
+        except (EOFError, json.JSONDecodeError, UnicodeDecodeError) as e:
+            sys.stderr.write(f"Worker: Bad frame, shutting down: {e}\n")
+            return 1
+        if request is None:
+            return 0
+
+        write_frame(stdout, handle(request, emit=lambda message: write_frame(stdout, message)))
+
+        jobs_done += 1
+        if max_jobs and jobs_done >= max_jobs:
+            sys.stderr.write(f"Worker: Finished {jobs_done} jobs, exiting for recycle\n")
+            return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Persistent analyzer/humanizer worker")
+    parser.add_argument("--max-jobs", type=int, default=0,
+                        help="Exit after this many jobs (0 = never)")
+    args = parser.parse_args()
+    sys.exit(serve(args.max_jobs))